@@ -0,0 +1,46 @@
+"""Compare the placement algorithms of `calculate` on time and people placed.
+
+Run from the repository root, with the package installed (``pip install -e .``)::
+
+    python benchmarks/bench_algorithms.py
+"""
+import time
+
+from shapely.geometry import Polygon, box
+
+from web_app.algorithm import ALGORITHMS, calculate
+
+SOCIAL_DISTANCE = 1.5
+REPEATS = 3
+
+SHAPES = {
+    "square 1 ha": box(0, 0, 100, 100),
+    "square 4 ha": box(0, 0, 200, 200),
+    "L-shape": Polygon([(0, 0), (200, 0), (200, 30), (30, 30), (30, 200), (0, 200)]),
+    "square with hole": Polygon(
+        [(0, 0), (0, 100), (100, 100), (100, 0)],
+        [[(25, 25), (75, 25), (75, 75), (25, 75)]],
+    ),
+}
+
+
+def main():
+    print(f"{'shape':>18} {'algorithm':>10} {'placed':>8} {'time (s)':>9}")
+    for name, polygon in SHAPES.items():
+        for algorithm in ALGORITHMS:
+            placed, elapsed = 0, 0.0
+            for _ in range(REPEATS):
+                start = time.perf_counter()
+                result = calculate(
+                    polygon, social_distance=SOCIAL_DISTANCE, algorithm=algorithm
+                )
+                elapsed += time.perf_counter() - start
+                placed += result.n_humans
+            print(
+                f"{name:>18} {algorithm:>10} {placed / REPEATS:8.0f} "
+                f"{elapsed / REPEATS:9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
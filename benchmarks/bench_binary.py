@@ -0,0 +1,113 @@
+"""Payload size and encode time of the binary formats against GeoJSON.
+
+Run from the repository root, with the package installed (``pip install -e .``)::
+
+    python benchmarks/bench_binary.py
+
+Encode time covers everything after placement: reprojecting the markers and
+building the boundaries, plus `json.dumps` for GeoJSON or `encode_result` for
+the binary formats. Sizes are given raw and gzipped, as most responses are
+compressed on the way. The error is the largest distance between a decoded
+marker and its GeoJSON coordinates.
+"""
+import gzip
+import json
+import time
+
+import numpy as np
+import shapely.ops
+from shapely.geometry import Point, Polygon, box
+
+from web_app.algorithm import (
+    TRANSFORMER_MAPPING,
+    calc_result_boundaries,
+    calc_result_to_serializable,
+    calculate,
+    metered_centers_to_wgs84,
+)
+from web_app.binary import ENCODINGS, decode_result, encode_result, sort_for_delta
+
+COORD_SYSTEM = "epsg:4083"
+# Plaza del Charco, Puerto de la Cruz.
+ORIGIN = Point(-16.5524, 28.4155)
+REPEATS = 5
+# meters per degree of latitude, to report errors in meters.
+METERS_PER_DEGREE = 111_320
+
+
+def corpus(x, y):
+    """Metered polygons of typical drawings, from a small square to 15 ha."""
+    return [
+        ("square 50 m", box(x, y, x + 50, y + 50)),
+        ("square 100 m", box(x, y, x + 100, y + 100)),
+        ("square 200 m", box(x, y, x + 200, y + 200)),
+        ("square 387 m", box(x, y, x + 387, y + 387)),
+        (
+            "L 150 m",
+            Polygon(
+                [(x, y), (x + 150, y), (x + 150, y + 40), (x + 40, y + 40)]
+                + [(x + 40, y + 150), (x, y + 150)]
+            ),
+        ),
+        (
+            "square 200 m, hole",
+            box(x, y, x + 200, y + 200).difference(
+                box(x + 60, y + 60, x + 140, y + 140)
+            ),
+        ),
+    ]
+
+
+def timed(func, *args):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        out = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return out, best
+
+
+def encode_json(result):
+    return json.dumps(calc_result_to_serializable(result, COORD_SYSTEM, 0)).encode()
+
+
+def encode_binary(result, encoding):
+    header = {
+        "type": "FeatureCollection",
+        "properties": {"n_humans": result.n_humans},
+        "features": calc_result_boundaries(result, COORD_SYSTEM, 0),
+    }
+    lonlat = metered_centers_to_wgs84(result.centers, COORD_SYSTEM)
+    return encode_result(header, [(0, lonlat)], encoding)
+
+
+def main():
+    origin = shapely.ops.transform(TRANSFORMER_MAPPING[COORD_SYSTEM].transform, ORIGIN)
+    print(
+        f"{'polygon':>20} {'markers':>8} {'format':>8} {'bytes':>9} {'gzip':>8} "
+        f"{'ratio':>6} {'encode (ms)':>12} {'error (m)':>10}"
+    )
+    for name, polygon in corpus(origin.x, origin.y):
+        result = calculate(polygon, seed=0)
+        lonlat = metered_centers_to_wgs84(result.centers, COORD_SYSTEM)
+        payload, json_time = timed(encode_json, result)
+        reference = len(payload)
+        print(
+            f"{name:>20} {result.n_humans:8d} {'json':>8} {reference:9d} "
+            f"{len(gzip.compress(payload)):8d} {1:6.2f} {json_time * 1e3:12.2f} "
+            f"{0:10.4f}"
+        )
+        for encoding in ENCODINGS:
+            payload, binary_time = timed(encode_binary, result, encoding)
+            _, decoded = decode_result(payload)
+            expected = lonlat[sort_for_delta(lonlat)] if encoding == "delta" else lonlat
+            error = np.abs(decoded - expected).max() if len(expected) else 0.0
+            print(
+                f"{'':>20} {'':>8} {encoding:>8} {len(payload):9d} "
+                f"{len(gzip.compress(payload)):8d} {len(payload) / reference:6.2f} "
+                f"{binary_time * 1e3:12.2f} {error * METERS_PER_DEGREE:10.4f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
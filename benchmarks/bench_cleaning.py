@@ -0,0 +1,128 @@
+"""Cleaning of drawn polygons, buffer-based vs polygonize-based, on awkward drawings.
+
+Run from the repository root, with the package installed (``pip install -e .``)::
+
+    python benchmarks/bench_cleaning.py
+
+"legacy" is the former `correct_line_intersection`: buffer the outline, cut it
+out of its bounding box and keep the fragment overlapping the buffered polygon
+most. "clean" is `clean_polygon` without simplification, "simplified" with the
+default tolerance of the API for a person radius of 1.5 m. Area is relative to
+the legacy result, which is shrunk by its 0.1 m buffer.
+"""
+import math
+import time
+
+import numpy as np
+from shapely.geometry import LineString, Polygon, box
+
+from web_app.algorithm import clean_polygon
+from web_app.pipeline import SIMPLIFY_TOLERANCE
+
+REPEATS = 5
+PERSON_RADIUS = 1.5
+
+
+def legacy_clean(coords):
+    polyline = LineString(coords)
+    polyline_buffer = polyline.buffer(0.1)
+    bbox = box(*polyline_buffer.bounds)
+    list_polygons = bbox.difference(polyline_buffer).geoms
+    return max(
+        list_polygons, key=lambda a: a.intersection(Polygon(polyline).buffer(0)).area
+    )
+
+
+def circle(n, radius=50.0, noise=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * math.pi, n, endpoint=False)
+    radii = radius + rng.normal(0, noise, n) if noise else np.full(n, radius)
+    return list(zip(radii * np.cos(angles), radii * np.sin(angles)))
+
+
+def corpus():
+    """Rings, in meters, as users draw them on a map."""
+    return [
+        ("square", [(0, 0), (100, 0), (100, 100), (0, 100)]),
+        ("square, clockwise", [(0, 0), (0, 100), (100, 100), (100, 0)]),
+        (
+            "duplicate vertices",
+            [(0, 0), (0, 0), (100, 0), (100, 0), (100, 100), (0, 100), (0, 100)],
+        ),
+        ("doubled back", [(0, 0), (100, 0), (100, 100), (0, 100), (100, 100)]),
+        ("bowtie", [(0, 0), (100, 100), (100, 0), (0, 100)]),
+        (
+            "spike",
+            [(0, 0), (100, 0), (100, 50), (150, 50), (100, 50), (100, 100), (0, 100)],
+        ),
+        (
+            "overshot closing",
+            [(0, 0), (100, 0), (100, 100), (0, 100), (0, -5), (5, -5), (5, 5)],
+        ),
+        (
+            "small loop",
+            [(0, 0), (100, 0), (100, 100), (110, 110), (110, 90), (90, 110), (0, 100)],
+        ),
+        (
+            "touching itself",
+            [(0, 0), (100, 0), (100, 100), (50, 0), (0, 100)],
+        ),
+        ("circle, 64 vertices", circle(64)),
+        ("freehand, 2000 vertices", circle(2000, noise=0.02)),
+        ("freehand, 20000 vertices", circle(20000, noise=0.02)),
+        (
+            "freehand, crossing",
+            circle(2000, noise=0.02) + [(-60.0, 0.0), (60.0, 0.0)],
+        ),
+        ("collinear", [(0, 0), (50, 50), (100, 100)]),
+        ("two points", [(0, 0), (100, 100), (0, 0)]),
+    ]
+
+
+def timed(func, *args):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        try:
+            out = func(*args)
+        except Exception as err:
+            out = err
+        best = min(best, time.perf_counter() - start)
+    return out, best
+
+
+def describe(polygon, reference):
+    if isinstance(polygon, Exception):
+        return f"{type(polygon).__name__:>24}"
+    area = (
+        polygon.area / reference.area
+        if isinstance(reference, Polygon) and reference.area
+        else float("nan")
+    )
+    return f"{len(polygon.exterior.coords):8d} {area:7.3f} {str(polygon.is_valid):>8}"
+
+
+def main():
+    tolerance = SIMPLIFY_TOLERANCE * PERSON_RADIUS
+    print(
+        f"{'drawing':>26} {'method':>11} {'time (ms)':>10} {'vertices':>8} "
+        f"{'area':>7} {'valid':>8}"
+    )
+    for name, coords in corpus():
+        # rings of the API are closed, as they come from `Polygon.exterior`.
+        coords = list(coords) + [coords[0]]
+        reference, legacy_time = timed(legacy_clean, coords)
+        print(
+            f"{name:>26} {'legacy':>11} {legacy_time * 1e3:10.3f} "
+            f"{describe(reference, reference)}"
+        )
+        for method, args in [("clean", ()), ("simplified", (tolerance,))]:
+            polygon, clean_time = timed(clean_polygon, coords, *args)
+            print(
+                f"{'':>26} {method:>11} {clean_time * 1e3:10.3f} "
+                f"{describe(polygon, reference)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Coordinate system selection: lookup time, transformer cache, and distortion.
+
+Run from the repository root, with the package installed (``pip install -e .``)::
+
+    python benchmarks/bench_crs.py
+
+Every location gets a 100 m square drawn on the ground, alone and with 100
+small holes. "legacy" is the conversion before `web_app.crs`: a ``within``
+check against every bounding box for every polygon, only defined in Europe and
+the Canaries, and transformers that took longitudes for latitudes. "convert"
+is `multi_convert_to_meter_system` with a cached transformer, "cold" the same
+with an empty transformer cache. The errors are those of the converted square's
+area and side lengths against the geodesic ones, i.e. how far the placement's
+meters are off on the ground.
+"""
+import math
+import time
+
+import pyproj
+import shapely.ops
+from pyproj import Geod
+from shapely.geometry import Polygon, box
+
+from web_app.algorithm import multi_convert_to_meter_system
+from web_app.crs import transformer
+from web_app.exceptions import OutsideSupportedArea
+
+REPEATS = 20
+SIDE = 100.0
+N_HOLES = 100
+GEOD = Geod(ellps="WGS84")
+LEGACY_REGIONS = {
+    "epsg:5634": box(-21.73, 24.6, -11.75, 32.76),
+    "epsg:3035": box(-16.1, 32.88, 40.18, 84.17),
+}
+LEGACY_TRANSFORMERS = {
+    name: pyproj.Transformer.from_proj(pyproj.Proj("epsg:4326"), pyproj.Proj(name))
+    for name in LEGACY_REGIONS
+}
+
+LOCATIONS = [
+    ("Puerto de la Cruz", -16.5524, 28.4155),
+    ("Madrid", -3.7038, 40.4168),
+    ("Tromso", 18.9553, 69.6492),
+    ("New York", -73.9857, 40.7484),
+    ("Montreal, zone edge", -72.0001, 45.5),
+    ("Sydney", 151.2093, -33.8688),
+    ("Quito", -78.4678, -0.1807),
+    ("South Pole", 0.0, -89.99),
+]
+
+
+def ground_square(lon, lat, side=SIDE):
+    """Square of side meters on the ground, its corners in WGS84."""
+    corners = [(lon, lat)]
+    for azimuth in (90, 0, 270):
+        lon, lat, _ = GEOD.fwd(lon, lat, azimuth, side)
+        corners.append((lon, lat))
+    return Polygon(corners)
+
+
+def holes_in(square, n=N_HOLES):
+    minx, miny, maxx, maxy = square.bounds
+    per_row = math.ceil(math.sqrt(n))
+    dx, dy = (maxx - minx) / (per_row + 1), (maxy - miny) / (per_row + 1)
+    return [
+        shapely.ops.transform(
+            lambda x, y: (x * 0.2 + cx * 0.8, y * 0.2 + cy * 0.8), square
+        )
+        for cx, cy in (
+            (minx + (i + 1) * dx, miny + (j + 1) * dy)
+            for i in range(per_row)
+            for j in range(per_row)
+        )
+    ][:n]
+
+
+def legacy_convert(polygons):
+    converted = []
+    names = []
+    for polygon in polygons:
+        for name, region in LEGACY_REGIONS.items():
+            if polygon.within(region):
+                names.append(name)
+                converted.append(
+                    shapely.ops.transform(LEGACY_TRANSFORMERS[name].transform, polygon)
+                )
+                break
+        else:
+            raise OutsideSupportedArea(name)
+    return names[0], converted
+
+
+def timed(func, *args):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        out = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return out, best
+
+
+def cold(polygons):
+    transformer.cache_clear()
+    start = time.perf_counter()
+    multi_convert_to_meter_system(polygons)
+    return time.perf_counter() - start
+
+
+def distortion(square, metered):
+    geodesic_area, _ = GEOD.geometry_area_perimeter(square)
+    area_error = metered.area / abs(geodesic_area) - 1
+    ground = list(square.exterior.coords)
+    plane = list(metered.exterior.coords)
+    side_error = max(
+        abs(
+            math.dist(plane[i], plane[i + 1]) / GEOD.inv(*ground[i], *ground[i + 1])[2]
+            - 1
+        )
+        for i in range(len(ground) - 1)
+    )
+    return area_error, side_error
+
+
+def main():
+    print(
+        f"{'location':>20} {'holes':>5} {'legacy (ms)':>11} {'side err':>9} "
+        f"{'coordinate system':>18} {'convert (ms)':>12} {'cold (ms)':>9} "
+        f"{'area err':>9} {'side err':>9}"
+    )
+    for name, lon, lat in LOCATIONS:
+        square = ground_square(lon, lat)
+        for polygons in ([square], [square] + holes_in(square)):
+            try:
+                (_, legacy_metered), legacy_time = timed(legacy_convert, polygons)
+                _, legacy_error = distortion(square, legacy_metered[0])
+                legacy = f"{legacy_time * 1e3:11.3f} {legacy_error:9.2%}"
+            except OutsideSupportedArea:
+                legacy = f"{'-':>11} {'-':>9}"
+            (coordinate_system, metered), convert_time = timed(
+                multi_convert_to_meter_system, polygons
+            )
+            area_error, side_error = distortion(square, metered[0])
+            print(
+                f"{name:>20} {len(polygons) - 1:5d} {legacy} {coordinate_system:>18} "
+                f"{convert_time * 1e3:12.3f} {cold(polygons) * 1e3:9.3f} "
+                f"{area_error:9.2%} {side_error:9.2%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Compare the disk insertion engines as the polygon area grows.
+
+Run from the repository root, with the package installed (``pip install -e .``)::
+
+    python benchmarks/bench_insertion.py
+
+Both engines receive the same candidates, so they place the same people; only
+the runtime differs.
+"""
+import time
+
+import numpy as np
+from shapely.geometry import box
+
+from web_app.algorithm import grid_disk_insertion, random_disk_insertion
+
+SOCIAL_DISTANCE = 1.5
+# side lengths in meters; 387m is roughly the 15 ha TILE_THRESHOLD.
+SIDES = [25, 50, 100, 200, 387]
+# the brute force engine is quadratic, don't wait for it on the largest areas.
+MAX_BRUTE_FORCE_AREA = 5e4
+
+
+def candidates_for(side: float) -> np.ndarray:
+    polygon = box(0, 0, side, side)
+    n_iters = round(
+        min(20 * (polygon.area / (SOCIAL_DISTANCE * SOCIAL_DISTANCE)), 500000)
+    )
+    rng = np.random.RandomState(0)
+    return rng.uniform(0, side, (n_iters, 2))
+
+
+def time_engine(engine, candidates: np.ndarray):
+    pts = np.zeros(shape=candidates.shape)
+    start = time.perf_counter()
+    accept, _ = engine(candidates.shape[0], pts, candidates, SOCIAL_DISTANCE)
+    return accept, time.perf_counter() - start
+
+
+def main():
+    print(
+        f"{'area (m^2)':>12} {'candidates':>11} {'placed':>8} "
+        f"{'brute (s)':>10} {'grid (s)':>9}"
+    )
+    for side in SIDES:
+        candidates = candidates_for(side)
+        area = side * side
+        grid_accept, grid_time = time_engine(grid_disk_insertion, candidates)
+        if area <= MAX_BRUTE_FORCE_AREA:
+            brute_accept, brute_time = time_engine(random_disk_insertion, candidates)
+            assert brute_accept == grid_accept
+            brute = f"{brute_time:10.3f}"
+        else:
+            brute = f"{'skipped':>10}"
+        print(
+            f"{area:12.0f} {candidates.shape[0]:11d} {grid_accept:8d} "
+            f"{brute} {grid_time:9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+"""Throughput and tail latency of /api/calculate served by gunicorn.
+
+Run from the repository root, with the package and gunicorn installed
+(``pip install -e . -r requirements.txt``)::
+
+    python benchmarks/bench_load.py [--workers 1,2,4] [--worker-class sync,gthread]
+        [--concurrency 1,4,16] [--duration 30] [--payloads traffic.ndjson]
+
+Every combination of worker count and worker class starts its own gunicorn
+on localhost, with the settings of `web_app.gunicorn_conf`, and every
+concurrency replays the payloads against it for ``--duration`` seconds, from
+as many client connections, each sending its next request when the last one
+is answered. Payloads are request bodies: ``.geojson`` files, ``.ndjson``
+files of one body per line, e.g. recorded traffic, or directories of them,
+by default the corpus of `bench_suite`. They are replayed in a seeded
+shuffled order, so every run sends the same mix.
+
+Latencies are those of successful responses. Errors are responses with an
+error status and failed connections, timeouts are requests unanswered after
+``--timeout`` seconds. CPU is the share of one core used by each worker and
+its area processes over the run, RSS their peak resident memory summed, which
+counts shared pages once per process. The table shows the busiest worker,
+``--output`` all of them. Both are read from /proc, so this only runs on
+Linux. The clients run on the same host and take some of its cores too.
+The result cache is off unless ``--cache`` is given, since replayed payloads
+would otherwise be answered from it.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "corpus", "v1")
+WORKERS = "1,2,4"
+WORKER_CLASSES = "sync,gthread"
+CONCURRENCY = "1,4,16"
+THREADS = 4
+DURATION = 30.0  # in seconds.
+WARM_UP = 3.0  # in seconds.
+TIMEOUT = 30.0  # in seconds.
+SAMPLE_INTERVAL = 0.5  # in seconds.
+START_TIMEOUT = 60.0  # in seconds.
+SEED = 0
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def load_payloads(paths):
+    """Encoded request bodies of .geojson and .ndjson files and directories."""
+    payloads = []
+    for path in paths:
+        if os.path.isdir(path):
+            payloads.extend(
+                load_payloads(
+                    [os.path.join(path, name) for name in sorted(os.listdir(path))]
+                )
+            )
+        elif path.endswith(".ndjson"):
+            with open(path, "rb") as handle:
+                payloads.extend(line.strip() for line in handle if line.strip())
+        elif path.endswith((".geojson", ".json")):
+            with open(path, "rb") as handle:
+                payloads.append(json.dumps(json.load(handle)).encode())
+    return payloads
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def children():
+    """Child pids by parent pid, over all processes."""
+    by_parent = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as handle:
+                # the command name may hold spaces, the fields after it do not.
+                parent = int(handle.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        by_parent.setdefault(parent, []).append(int(name))
+    return by_parent
+
+
+def descendants(pid, by_parent):
+    found = [pid]
+    for child in by_parent.get(pid, []):
+        found.extend(descendants(child, by_parent))
+    return found
+
+
+def cpu_and_rss(pids):
+    """CPU seconds and resident bytes of processes, summed."""
+    seconds, rss = 0.0, 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as handle:
+                fields = handle.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue  # exited in the meantime.
+        # utime, stime and rss are fields 14, 15 and 24 of proc(5).
+        seconds += (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+        rss += int(fields[21]) * PAGE_SIZE
+    return seconds, rss
+
+
+class WorkerSampler:
+    """Samples the CPU time and memory of the workers of a gunicorn master.
+
+    :param master: pid of the gunicorn master.
+    """
+
+    def __init__(self, master):
+        self.master = master
+        self.cpu_start = {}
+        self.cpu_end = {}
+        self.peak_rss = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        by_parent = children()
+        sampled = {}
+        for worker in by_parent.get(self.master, []):
+            sampled[worker] = cpu_and_rss(descendants(worker, by_parent))
+            self.peak_rss[worker] = max(
+                self.peak_rss.get(worker, 0), sampled[worker][1]
+            )
+        return sampled
+
+    def _run(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            for worker, (seconds, _) in self._sample().items():
+                self.cpu_end[worker] = seconds
+
+    def start(self):
+        self.started = time.perf_counter()
+        for worker, (seconds, _) in self._sample().items():
+            self.cpu_start[worker] = seconds
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        for worker, (seconds, _) in self._sample().items():
+            self.cpu_end[worker] = seconds
+        elapsed = time.perf_counter() - self.started
+        return [
+            {
+                "pid": worker,
+                "cpu": (self.cpu_end[worker] - self.cpu_start.get(worker, 0.0))
+                / elapsed,
+                "rss": self.peak_rss[worker],
+            }
+            for worker in sorted(self.cpu_end)
+        ]
+
+
+class Gunicorn:
+    """A gunicorn serving the app on localhost, for a with block."""
+
+    def __init__(self, workers, worker_class, threads, cache):
+        self.port = free_port()
+        self.directory = tempfile.TemporaryDirectory()
+        env = dict(
+            os.environ,
+            WEB_CONCURRENCY=str(workers),
+            WEB_APP_JOBS_PATH=os.path.join(self.directory.name, "jobs.sqlite3"),
+            WEB_APP_METRICS_PATH=os.path.join(self.directory.name, "metrics.sqlite3"),
+            WEB_APP_CACHE_PATH=(
+                os.path.join(self.directory.name, "cache.sqlite3") if cache else ""
+            ),
+        )
+        self.process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "gunicorn",
+                "--config",
+                "python:web_app.gunicorn_conf",
+                "--workers",
+                str(workers),
+                "--worker-class",
+                worker_class,
+                # gunicorn turns sync workers with several threads into gthread.
+                "--threads",
+                str(threads if worker_class == "gthread" else 1),
+                "--bind",
+                f"127.0.0.1:{self.port}",
+                "--log-level",
+                "warning",
+                "web_app.app:app",
+            ],
+            env=env,
+        )
+
+    def __enter__(self):
+        deadline = time.monotonic() + START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("gunicorn exited, see its log above.")
+            connection = http.client.HTTPConnection("127.0.0.1", self.port)
+            try:
+                connection.request("GET", "/api/cache")
+                if connection.getresponse().status == 200:
+                    return self
+            except (OSError, http.client.HTTPException):
+                pass
+            finally:
+                connection.close()
+            time.sleep(0.2)
+        raise RuntimeError("gunicorn did not start in time.")
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.wait()
+        self.directory.cleanup()
+
+
+def client(port, payloads, offset, stop_at, timeout, record):
+    """Send payloads one after the other until stop_at, a `time.monotonic`."""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    index = offset
+    while time.monotonic() < stop_at:
+        body = payloads[index % len(payloads)]
+        index += 1
+        start = time.perf_counter()
+        try:
+            connection.request(
+                "POST",
+                "/api/calculate",
+                body,
+                {"Content-Type": "application/json"},
+            )
+            response = connection.getresponse()
+            response.read()
+            outcome = "ok" if response.status < 400 else "error"
+        except socket.timeout:
+            outcome = "timeout"
+        except (OSError, http.client.HTTPException):
+            outcome = "error"
+        if outcome != "ok":
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+        record(outcome, time.perf_counter() - start)
+    connection.close()
+
+
+def run_load(port, payloads, concurrency, duration, timeout):
+    """Outcomes and latencies of the requests sent in duration seconds."""
+    results = []
+    lock = threading.Lock()
+
+    def record(outcome, seconds):
+        with lock:
+            results.append((outcome, seconds))
+
+    stop_at = time.monotonic() + duration
+    threads = [
+        threading.Thread(
+            target=client,
+            args=(
+                port,
+                payloads,
+                index * len(payloads) // concurrency,
+                stop_at,
+                timeout,
+                record,
+            ),
+        )
+        for index in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def summarize(results, elapsed):
+    latencies = np.array([seconds for outcome, seconds in results if outcome == "ok"])
+    n = len(results)
+    p50, p95, p99 = (
+        np.percentile(latencies, [50, 95, 99]).tolist()
+        if latencies.size
+        else [None] * 3
+    )
+    return {
+        "requests": n,
+        "throughput": latencies.size / elapsed,
+        "p50": p50,
+        "p95": p95,
+        "p99": p99,
+        "errors": sum(outcome == "error" for outcome, _ in results) / max(n, 1),
+        "timeouts": sum(outcome == "timeout" for outcome, _ in results) / max(n, 1),
+    }
+
+
+def milliseconds(seconds):
+    return f"{'-':>9}" if seconds is None else f"{seconds * 1e3:9.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default=WORKERS, help="comma separated")
+    parser.add_argument(
+        "--worker-class", default=WORKER_CLASSES, help="comma separated"
+    )
+    parser.add_argument("--threads", type=int, default=THREADS, help="of gthread")
+    parser.add_argument("--concurrency", default=CONCURRENCY, help="comma separated")
+    parser.add_argument("--duration", type=float, default=DURATION)
+    parser.add_argument("--warm-up", type=float, default=WARM_UP)
+    parser.add_argument("--timeout", type=float, default=TIMEOUT)
+    parser.add_argument("--payloads", action="append", help="files or directories")
+    parser.add_argument("--cache", action="store_true", help="keep the result cache")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.payloads or [CORPUS_PATH])
+    if not payloads:
+        sys.exit("No payloads found.")
+    random.Random(SEED).shuffle(payloads)
+
+    print(
+        f"{'class':>8} {'workers':>7} {'clients':>7} {'req/s':>7} {'p50 (ms)':>9} "
+        f"{'p95 (ms)':>9} {'p99 (ms)':>9} {'errors':>7} {'timeouts':>8} "
+        f"{'CPU/worker':>10} {'RSS/worker (MB)':>15}"
+    )
+    rows = []
+    for worker_class in args.worker_class.split(","):
+        for workers in map(int, args.workers.split(",")):
+            with Gunicorn(workers, worker_class, args.threads, args.cache) as server:
+                for concurrency in map(int, args.concurrency.split(",")):
+                    run_load(
+                        server.port, payloads, concurrency, args.warm_up, args.timeout
+                    )
+                    sampler = WorkerSampler(server.process.pid)
+                    sampler.start()
+                    results, elapsed = run_load(
+                        server.port,
+                        payloads,
+                        concurrency,
+                        args.duration,
+                        args.timeout,
+                    )
+                    per_worker = sampler.stop()
+                    row = {
+                        "worker_class": worker_class,
+                        "workers": workers,
+                        "threads": args.threads if worker_class == "gthread" else 1,
+                        "concurrency": concurrency,
+                        **summarize(results, elapsed),
+                        "per_worker": per_worker,
+                    }
+                    rows.append(row)
+                    cpu = max(worker["cpu"] for worker in per_worker)
+                    rss = max(worker["rss"] for worker in per_worker) / 2**20
+                    print(
+                        f"{worker_class:>8} {workers:7d} {concurrency:7d} "
+                        f"{row['throughput']:7.2f} {milliseconds(row['p50'])} "
+                        f"{milliseconds(row['p95'])} {milliseconds(row['p99'])} "
+                        f"{row['errors']:7.1%} {row['timeouts']:8.1%} "
+                        f"{cpu:10.0%} {rss:15.0f}",
+                        flush=True,
+                    )
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(
+                {"payloads": len(payloads), "duration": args.duration, "rows": rows},
+                handle,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Placement time as the number of obstacles of a venue grows.
+
+Run from the repository root, with the package installed (``pip install -e .``)::
+
+    python benchmarks/bench_obstacles.py [max_obstacles]
+
+The venue is a 150 m square with kiosks, 2 m squares, or trees of 0.5 m radius
+spread over it, with a buffer zone of 0.5 m. "composite" places people in the
+polygon with every obstacle cut out, trees as 32-gons, the way it was done
+before obstacles were indexed. "index" lets the placement engines use an
+`ObstacleIndex`, which takes trees as point obstacles. Violations count the
+people closer to an obstacle than the buffer zone. Composite runs of more than
+`COMPOSITE_MAX` obstacles are skipped, they take minutes.
+"""
+import math
+import sys
+import time
+
+import numpy as np
+import shapely.ops
+import shapely.vectorized
+from shapely.geometry import Point, box
+
+import web_app.algorithm
+from web_app.algorithm import ALGORITHMS, calculate
+
+SOCIAL_DISTANCE = 1.5
+BUFFER_ZONE = 0.5
+SIDE = 150
+KIOSK_SIDE = 2.0
+TREE_RADIUS = 0.5
+COUNTS = [0, 25, 100, 400, 1600]
+COMPOSITE_MAX = 400
+DEFAULT_MIN_HOLES = web_app.algorithm.OBSTACLE_INDEX_MIN_HOLES
+
+
+def obstacle_centers(n, seed=0):
+    """n points on a jittered grid, so obstacles rarely overlap."""
+    if not n:
+        return np.zeros(shape=(0, 2))
+    rng = np.random.default_rng(seed)
+    per_row = math.ceil(math.sqrt(n))
+    step = (SIDE - 10) / per_row
+    cells = np.array([(i, j) for i in range(per_row) for j in range(per_row)])[:n]
+    return 5 + (cells + rng.uniform(0.25, 0.75, size=cells.shape)) * step
+
+
+def venue(kind, n):
+    """The venue polygon, its obstacles as polygons, and its point obstacles."""
+    centers = obstacle_centers(n)
+    if kind == "kiosks":
+        half = KIOSK_SIDE / 2
+        polygons = [box(x - half, y - half, x + half, y + half) for x, y in centers]
+    else:
+        polygons = [Point(x, y).buffer(TREE_RADIUS, 8) for x, y in centers]
+    circles = np.column_stack([centers, np.full(n, TREE_RADIUS)])
+    return box(0, 0, SIDE, SIDE), polygons, circles
+
+
+def violations(centers, polygons):
+    if not polygons or not centers.shape[0]:
+        return 0
+    grown = shapely.ops.unary_union(polygons).buffer(BUFFER_ZONE - 1e-6)
+    return int(shapely.vectorized.contains(grown, centers[:, 0], centers[:, 1]).sum())
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    out = func(*args, **kwargs)
+    return out, time.perf_counter() - start
+
+
+def run(mode, kind, algorithm, n):
+    outline, polygons, circles = venue(kind, n)
+    if mode == "composite":
+        web_app.algorithm.OBSTACLE_INDEX_MIN_HOLES = math.inf
+        polygon = outline.difference(shapely.ops.unary_union(polygons))
+        kwargs = {}
+    else:
+        web_app.algorithm.OBSTACLE_INDEX_MIN_HOLES = DEFAULT_MIN_HOLES
+        polygon = (
+            outline.difference(shapely.ops.unary_union(polygons))
+            if kind == "kiosks"
+            else outline
+        )
+        kwargs = {} if kind == "kiosks" else {"point_obstacles": circles}
+    result, seconds = timed(
+        calculate,
+        polygon,
+        SOCIAL_DISTANCE,
+        BUFFER_ZONE,
+        algorithm,
+        seed=0,
+        **kwargs,
+    )
+    return result, seconds, violations(result.centers, polygons)
+
+
+def main():
+    max_obstacles = int(sys.argv[1]) if len(sys.argv) > 1 else COUNTS[-1]
+    print(
+        f"{'obstacles':>10} {'n':>5} {'algorithm':>10} {'mode':>10} "
+        f"{'time (s)':>9} {'n_humans':>9} {'violations':>10}"
+    )
+    for kind in ("kiosks", "trees"):
+        for n in [count for count in COUNTS if count <= max_obstacles]:
+            for algorithm in ALGORITHMS:
+                for mode in ("composite", "index"):
+                    if mode == "composite" and n > COMPOSITE_MAX:
+                        print(f"{kind:>10} {n:5d} {algorithm:>10} {mode:>10} {'-':>9}")
+                        continue
+                    result, seconds, n_violations = run(mode, kind, algorithm, n)
+                    print(
+                        f"{kind:>10} {n:5d} {algorithm:>10} {mode:>10} "
+                        f"{seconds:9.3f} {result.n_humans:9d} {n_violations:10d}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Candidate sampling: bounding-box rejection vs triangulation, on concave shapes.
+
+Run from the repository root, with the package installed (``pip install -e .``)::
+
+    python benchmarks/bench_sampling.py
+
+For each shape both samplers have to deliver the same number of candidates
+inside the polygon. "drawn" is the number of random points generated for that,
+which is what the scratch memory scales with.
+"""
+import time
+
+import numpy as np
+import shapely.affinity
+import shapely.vectorized
+from shapely.geometry import LineString, Point, Polygon, box
+
+from web_app.algorithm import sample_in_polygon
+
+N_CANDIDATES = 200000
+
+
+def comb(teeth: int = 10) -> Polygon:
+    spine = box(0, 0, 400, 10)
+    for i in range(teeth):
+        spine = spine.union(box(i * 40, 0, i * 40 + 8, 200))
+    return spine
+
+
+SHAPES = {
+    "square": box(0, 0, 200, 200),
+    "thin L": Polygon([(0, 0), (400, 0), (400, 8), (8, 8), (8, 400), (0, 400)]),
+    "diagonal street": shapely.affinity.rotate(box(0, 0, 500, 12), 45),
+    "comb": comb(),
+    "ring": Point(0, 0).buffer(150).difference(Point(0, 0).buffer(140)),
+    "many holes": box(0, 0, 200, 200).difference(
+        LineString([(x, y) for x in range(10, 200, 20) for y in (10, 190)]).buffer(7)
+    ),
+}
+
+
+def bbox_rejection(polygon: Polygon, n: int):
+    """The former candidate generation of populate_square, until n are inside."""
+    minx, miny, maxx, maxy = polygon.bounds
+    drawn, batches, inside = 0, [], 0
+    while inside < n:
+        xs = np.random.uniform(minx, maxx, 2 * n)
+        ys = np.random.uniform(miny, maxy, 2 * n)
+        mask = shapely.vectorized.contains(polygon, xs, ys)
+        drawn += 2 * n
+        inside += int(mask.sum())
+        batches.append(np.column_stack((xs[mask], ys[mask])))
+    return np.concatenate(batches)[:n], drawn
+
+
+def triangulated(polygon: Polygon, n: int):
+    pts = sample_in_polygon(polygon, n)
+    return pts, n
+
+
+def main():
+    print(
+        f"{'shape':>16} {'fill':>5} {'bbox drawn':>11} {'bbox (s)':>9} "
+        f"{'tri drawn':>10} {'tri (s)':>8}"
+    )
+    for name, polygon in SHAPES.items():
+        fill = polygon.area / box(*polygon.bounds).area
+        row = [f"{name:>16} {fill:5.0%}"]
+        for sampler in (bbox_rejection, triangulated):
+            start = time.perf_counter()
+            _, drawn = sampler(polygon, N_CANDIDATES)
+            row.append(f"{drawn:>10d} {time.perf_counter() - start:8.3f}")
+        print(" ".join(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Share of request time spent serializing the result, per-point vs batched.
+
+Run from the repository root, with the package installed (``pip install -e .``)::
+
+    python benchmarks/bench_serialization.py
+
+"legacy" is the former per-point path: one `shapely.ops.transform` and one
+`mapping` call per marker.
+"""
+import time
+
+import shapely.ops
+from shapely.geometry import Point, box
+from shapely.geometry import mapping as geojson_mapping
+
+from web_app.algorithm import (
+    REVERSE_TRANSFORMER_MAPPING,
+    TRANSFORMER_MAPPING,
+    calc_result_to_serializable,
+    calculate,
+)
+
+COORD_SYSTEM = "epsg:4083"
+# Plaza del Charco, Puerto de la Cruz.
+ORIGIN = Point(-16.5524, 28.4155)
+SIDES = [50, 100, 200, 387]
+
+
+def legacy_serializable(calc_result, coord_system, polygon_id):
+    transformer = REVERSE_TRANSFORMER_MAPPING[coord_system]
+    return [
+        {
+            "type": "Feature",
+            "geometry": geojson_mapping(
+                shapely.ops.transform(transformer.transform, p)
+            ),
+            "properties": {"polygon_id": polygon_id, "type": "marker"},
+        }
+        for p in calc_result.points
+    ]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    origin = shapely.ops.transform(TRANSFORMER_MAPPING[COORD_SYSTEM].transform, ORIGIN)
+    print(
+        f"{'area (m^2)':>12} {'markers':>8} {'calculate (s)':>14} "
+        f"{'legacy (s)':>11} {'share':>6} {'batched (s)':>12} {'share':>6}"
+    )
+    for side in SIDES:
+        polygon = box(origin.x, origin.y, origin.x + side, origin.y + side)
+        start = time.perf_counter()
+        result = calculate(polygon)
+        calc_time = time.perf_counter() - start
+        legacy = timed(legacy_serializable, result, COORD_SYSTEM, 0)
+        batched = timed(calc_result_to_serializable, result, COORD_SYSTEM, 0)
+        print(
+            f"{side * side:12.0f} {result.n_humans:8d} {calc_time:14.3f} "
+            f"{legacy:11.3f} {legacy / (calc_time + legacy):6.1%} "
+            f"{batched:12.3f} {batched / (calc_time + batched):6.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Worker startup: import time, memory and latency of the first request.
+
+Run from the repository root, with the package installed (``pip install -e .``)::
+
+    python benchmarks/bench_startup.py [n_workers]
+
+Every measurement runs in a fresh interpreter. "import" is the time and peak
+RSS of importing `web_app.app`. The worker rows emulate gunicorn: without
+preload every forked worker imports the app itself, with preload the master
+imports it first, and with warm-up it also runs `warm_up` and `gc.freeze`, as
+`web_app.gunicorn_conf` does. Each worker then answers one calculate request,
+its time includes importing the app when the worker has to.
+USS is the memory private to a worker, PSS counts shared pages pro rata, both
+read from /proc, so this only runs on Linux.
+"""
+import json
+import subprocess
+import sys
+
+N_WORKERS = 4
+
+IMPORT = """
+import json, resource, sys, time
+start = time.perf_counter()
+import web_app.app
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "matplotlib": "matplotlib" in sys.modules,
+}))
+"""
+
+WORKERS = """
+import gc, json, os, time
+os.environ["WEB_APP_CACHE_PATH"] = ""
+PRELOAD, WARM_UP, N_WORKERS = {preload}, {warm_up}, {n_workers}
+BODY = {{"type": "FeatureCollection", "features": [{{"type": "Feature",
+    "properties": {{}}, "geometry": {{"type": "Polygon", "coordinates": [[
+    [-16.8177, 28.3654], [-16.8170, 28.3654], [-16.8170, 28.3657],
+    [-16.8177, 28.3657], [-16.8177, 28.3654]]]}}}}]}}
+
+
+def memory():
+    fields = {{}}
+    with open("/proc/self/smaps_rollup") as handle:
+        for line in handle:
+            name, *values = line.split()
+            if values and values[0].isdigit():
+                fields[name.rstrip(":")] = int(values[0]) / 1024
+    return fields["Private_Clean"] + fields["Private_Dirty"], fields["Pss"]
+
+
+if PRELOAD:
+    import web_app.app
+    if WARM_UP:
+        from web_app.algorithm import warm_up
+        warm_up()
+        gc.freeze()
+# workers stay alive until all are measured, so PSS shares pages with all.
+go_read, go_write = os.pipe()
+results = []
+for _ in range(N_WORKERS):
+    read, write = os.pipe()
+    if os.fork() == 0:
+        os.close(go_write)
+        try:
+            start = time.perf_counter()
+            import web_app.app
+            client = web_app.app.app.test_client()
+            client.post("/api/calculate", json=BODY)
+            first = time.perf_counter() - start
+            os.write(write, json.dumps([first, *memory()]).encode())
+            os.read(go_read, 1)
+        finally:
+            os._exit(0)
+    os.close(write)
+    results.append(read)
+print(json.dumps([json.loads(os.read(read, 1024)) for read in results]))
+os.close(go_write)
+"""
+
+
+def run(code):
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", code],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(out.stdout)
+
+
+def main():
+    n_workers = int(sys.argv[1]) if len(sys.argv) > 1 else N_WORKERS
+    result = run(IMPORT)
+    print(
+        f"import {result['seconds']:.3f} s, peak RSS {result['rss']:.0f} MB, "
+        f"matplotlib {'loaded' if result['matplotlib'] else 'not loaded'}"
+    )
+    print(f"{'workers':>20} {'first request (s)':>18} {'USS (MB)':>9} {'PSS (MB)':>9}")
+    for name, preload, warm_up in [
+        ("no preload", False, False),
+        ("preload", True, False),
+        ("preload, warm-up", True, True),
+    ]:
+        workers = run(
+            WORKERS.format(preload=preload, warm_up=warm_up, n_workers=n_workers)
+        )
+        first, uss, pss = (sum(values) / len(values) for values in zip(*workers))
+        print(f"{name:>20} {first:18.3f} {uss:9.1f} {pss:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
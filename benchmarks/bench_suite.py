@@ -0,0 +1,240 @@
+"""Time every stage of `web_app.algorithm` on a corpus of venues.
+
+Run from the repository root, with the package installed (``pip install -e .``)::
+
+    python benchmarks/bench_suite.py [--output results.json] [--compare old.json]
+
+The corpus in ``benchmarks/corpus/v1`` holds request bodies of realistic
+venues, in the Canaries and in mainland Europe: a small plaza, a 15 ha park, a
+concave promenade, a plaza with many holes and trees, a drawing whose outline
+crosses itself, and two areas sharing an obstacle. Its files never change, new
+or changed venues go into a new version directory. Every venue is calculated
+with every algorithm, without and with a barrier, split into the stages of
+the pipeline: projection to meters, cleaning, composite building, placement
+and serialization. Each stage reports the best of ``--repeat`` runs, placement
+is seeded, so people placed only change with the code.
+
+``--output`` writes the results, the corpus version, commit and library
+versions as JSON. ``--compare`` prints the ratio of this run's times to those
+of a previous output, and the change in people placed.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pyproj
+import shapely
+
+from web_app.algorithm import (
+    ALGORITHMS,
+    calc_result_to_serializable,
+    calculate,
+    clean_polygon,
+    create_composite_polygon,
+    multi_convert_to_meter_system,
+    polygons_from_geojson_features,
+    wgs84_circles_to_meter_system,
+)
+
+CORPUS_VERSION = "v1"
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "corpus", CORPUS_VERSION)
+REPEATS = 3
+SOCIAL_DISTANCE = 1.5
+BARRIERS = (0.0, 1.0)
+# share of the person radius drawings are simplified to, as the API does.
+SIMPLIFY_TOLERANCE = 0.01
+SEED = 0
+STAGES = ("projection", "cleaning", "composite", "placement", "serialization")
+
+
+def load_corpus(names=None):
+    """Request bodies of the corpus by venue name, in name order."""
+    corpus = {}
+    for file_name in sorted(os.listdir(CORPUS_PATH)):
+        name, extension = os.path.splitext(file_name)
+        if extension != ".geojson" or (names and name not in names):
+            continue
+        with open(os.path.join(CORPUS_PATH, file_name)) as handle:
+            corpus[name] = json.load(handle)
+    return corpus
+
+
+def areas_of(body):
+    """Main polygon feature, hole features and point obstacles of every area,
+    split as `web_app.pipeline.prepare_calculation` does.
+    """
+    features = body["features"]
+    polygons = [f for f in features if f["geometry"]["type"] == "Polygon"]
+    mains = [f for f in polygons if not f["properties"].get("hole", False)]
+    holes = [f for f in polygons if f["properties"].get("hole", False)]
+    circles = np.array(
+        [
+            [*f["geometry"]["coordinates"][:2], f["properties"]["radius"]]
+            for f in features
+            if f["geometry"]["type"] == "Point"
+        ],
+        dtype=float,
+    ).reshape(-1, 3)
+    return [(main, holes, circles) for main in mains]
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    out = func(*args, **kwargs)
+    return out, time.perf_counter() - start
+
+
+def run_area(main, holes, circles, algorithm, barrier):
+    """Seconds of every stage and people placed in one area."""
+    seconds = {}
+    polygons = polygons_from_geojson_features(main, holes)
+    (coord_system, metered), seconds["projection"] = timed(
+        multi_convert_to_meter_system, polygons
+    )
+    metered_circles = wgs84_circles_to_meter_system(circles, coord_system)
+    cleaned, seconds["cleaning"] = timed(
+        lambda: [
+            clean_polygon(polygon.exterior.coords, SIMPLIFY_TOLERANCE * SOCIAL_DISTANCE)
+            for polygon in metered
+        ]
+    )
+    composite, seconds["composite"] = timed(create_composite_polygon, cleaned)
+    result, seconds["placement"] = timed(
+        calculate,
+        composite,
+        social_distance=SOCIAL_DISTANCE,
+        buffer_zone_size=barrier or None,
+        algorithm=algorithm,
+        seed=SEED,
+        point_obstacles=metered_circles,
+    )
+    _, seconds["serialization"] = timed(
+        lambda: json.dumps(
+            calc_result_to_serializable(
+                result, coord_system, main["properties"].get("id", 0)
+            )
+        )
+    )
+    return seconds, result.n_humans, composite.area
+
+
+def run_case(body, algorithm, barrier, repeats):
+    """Best seconds of every stage over repeats, summed over the areas."""
+    best = {name: float("inf") for name in STAGES}
+    for _ in range(repeats):
+        seconds = dict.fromkeys(STAGES, 0.0)
+        n_humans, area = 0, 0.0
+        for main, holes, circles in areas_of(body):
+            area_seconds, area_humans, area_size = run_area(
+                main, holes, circles, algorithm, barrier
+            )
+            for name in STAGES:
+                seconds[name] += area_seconds[name]
+            n_humans += area_humans
+            area += area_size
+        best = {name: min(best[name], seconds[name]) for name in STAGES}
+    return best, n_humans, area
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "corpus": CORPUS_VERSION,
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "shapely": shapely.__version__,
+        "numpy": np.__version__,
+        "pyproj": pyproj.__version__,
+    }
+
+
+def row_key(row):
+    return row["venue"], row["algorithm"], row["barrier"]
+
+
+def print_row(row, previous=None):
+    seconds = row["seconds"]
+    line = (
+        f"{row['venue']:>18} {row['algorithm']:>10} {row['barrier']:7.1f} "
+        + " ".join(f"{seconds[name] * 1e3:13.2f}" for name in STAGES)
+        + f" {row['n_humans']:8d}"
+    )
+    if previous is not None:
+        total = sum(seconds.values()) / sum(previous["seconds"].values())
+        placement = seconds["placement"] / previous["seconds"]["placement"]
+        line += (
+            f" {total:8.2f}x {placement:10.2f}x "
+            f"{row['n_humans'] - previous['n_humans']:+8d}"
+        )
+    print(line, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of a previous run")
+    parser.add_argument("--repeat", type=int, default=REPEATS)
+    parser.add_argument("--venue", action="append", help="only run these venues")
+    parser.add_argument(
+        "--algorithm", action="append", choices=ALGORITHMS, help="only these"
+    )
+    args = parser.parse_args()
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as handle:
+            compared = json.load(handle)
+        if compared["environment"]["corpus"] != CORPUS_VERSION:
+            sys.exit(f"{args.compare} was measured on another corpus version.")
+        previous = {row_key(row): row for row in compared["results"]}
+
+    print(
+        f"{'venue':>18} {'algorithm':>10} {'barrier':>7} "
+        + " ".join(f"{name + ' (ms)':>13}" for name in STAGES)
+        + f" {'n_humans':>8}"
+        + (f" {'total':>9} {'placement':>11} {'n_humans':>8}" if previous else "")
+    )
+    results = []
+    for venue, body in load_corpus(args.venue).items():
+        for algorithm in args.algorithm or ALGORITHMS:
+            for barrier in BARRIERS:
+                seconds, n_humans, area = run_case(
+                    body, algorithm, barrier, args.repeat
+                )
+                row = {
+                    "venue": venue,
+                    "algorithm": algorithm,
+                    "barrier": barrier,
+                    "area": area,
+                    "seconds": seconds,
+                    "n_humans": n_humans,
+                }
+                print_row(row, previous.get(row_key(row)))
+                results.append(row)
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(
+                {"environment": environment(), "results": results}, handle, indent=2
+            )
+
+
+if __name__ == "__main__":
+    main()
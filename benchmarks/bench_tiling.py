@@ -0,0 +1,72 @@
+"""Throughput of tiled placement on a process pool, in m^2 per second per core.
+
+Run from the repository root, with the package installed (``pip install -e .``)::
+
+    python benchmarks/bench_tiling.py [n_workers]
+
+The measured throughput is what WEB_APP_PLACEMENT_THROUGHPUT should be set to
+on the machine it ran on.
+"""
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from shapely.geometry import box
+
+from web_app.algorithm import ALGORITHMS, calculate
+
+SOCIAL_DISTANCE = 1.5
+# side lengths in meters, 15 ha up to 1 km^2.
+SIDES = [387, 700, 1000]
+
+
+def check_spacing(centers: np.ndarray) -> bool:
+    """Whether all centers are more than 2r apart, using the grid engine's cells."""
+    cells = {}
+    for x, y in centers.tolist():
+        key = (int(x // (2 * SOCIAL_DISTANCE)), int(y // (2 * SOCIAL_DISTANCE)))
+        cells.setdefault(key, []).append((x, y))
+    for (i, j), points in cells.items():
+        for x, y in points:
+            for di in (-1, 0, 1):
+                for dj in (-1, 0, 1):
+                    for ox, oy in cells.get((i + di, j + dj), ()):
+                        dist_square = (ox - x) ** 2 + (oy - y) ** 2
+                        if 0 < dist_square <= 4 * SOCIAL_DISTANCE**2:
+                            return False
+    return True
+
+
+def main():
+    n_workers = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        n_workers = executor._max_workers
+        # warm up the pool.
+        list(executor.map(abs, range(n_workers)))
+        print(f"{n_workers} workers")
+        print(
+            f"{'area (m^2)':>12} {'algorithm':>10} {'placed':>8} {'time (s)':>9} "
+            f"{'m^2/s/core':>11} {'spacing':>8}"
+        )
+        for side in SIDES:
+            polygon = box(0, 0, side, side)
+            for algorithm in ALGORITHMS:
+                start = time.perf_counter()
+                result = calculate(
+                    polygon,
+                    social_distance=SOCIAL_DISTANCE,
+                    algorithm=algorithm,
+                    map_func=executor.map,
+                )
+                elapsed = time.perf_counter() - start
+                spacing = "ok" if check_spacing(result.centers) else "VIOLATED"
+                print(
+                    f"{polygon.area:12.0f} {algorithm:>10} {result.n_humans:8d} "
+                    f"{elapsed:9.2f} {polygon.area / elapsed / n_workers:11.0f} "
+                    f"{spacing:>8}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Fit the coefficients of `estimate_capacity` and report its error.
+
+Every algorithm places the people of a corpus of shapes with `calculate`, and
+a least squares fit of n_humans on the features of `capacity_features` gives
+the coefficients to put in ESTIMATE_COEFFICIENTS. The error of the estimate is
+reported per shape, and as the mean and maximum relative error over the corpus,
+both for the fitted coefficients and leaving each shape out of the fit.
+
+Run from the repository root, with the package installed (``pip install -e .``)::
+
+    python benchmarks/calibrate_estimate.py
+"""
+import time
+
+import numpy as np
+from shapely.geometry import Point, Polygon, box
+
+from web_app.algorithm import (
+    ALGORITHMS,
+    ESTIMATE_COEFFICIENTS,
+    calculate,
+    capacity_features,
+    estimate_capacity,
+)
+
+# (name, polygon, social distance, buffer zone size)
+CORPUS = [
+    ("square 10 m", box(0, 0, 10, 10), 1.5, None),
+    ("square 25 m", box(0, 0, 25, 25), 1.5, None),
+    ("square 50 m", box(0, 0, 50, 50), 1.5, None),
+    ("square 100 m", box(0, 0, 100, 100), 1.5, None),
+    ("square 100 m, r=1", box(0, 0, 100, 100), 1.0, None),
+    ("square 100 m, r=2", box(0, 0, 100, 100), 2.0, None),
+    ("square 100 m, barrier 3 m", box(0, 0, 100, 100), 1.5, 3.0),
+    ("square 200 m", box(0, 0, 200, 200), 1.5, None),
+    ("rectangle 60x140 m", box(0, 0, 60, 140), 1.5, None),
+    ("street 8x200 m", box(0, 0, 8, 200), 1.5, None),
+    ("street 15x200 m", box(0, 0, 15, 200), 1.5, None),
+    ("strip 30x300 m", box(0, 0, 30, 300), 1.5, None),
+    (
+        "L-shape",
+        Polygon([(0, 0), (120, 0), (120, 30), (30, 30), (30, 120), (0, 120)]),
+        1.5,
+        None,
+    ),
+    ("circle 40 m", Point(0, 0).buffer(40), 1.5, None),
+    ("triangle", Polygon([(0, 0), (120, 0), (40, 90)]), 1.5, None),
+    (
+        "square with hole",
+        Polygon(
+            [(0, 0), (0, 100), (100, 100), (100, 0)],
+            [[(25, 25), (75, 25), (75, 75), (25, 75)]],
+        ),
+        1.5,
+        None,
+    ),
+    (
+        "square with 9 holes",
+        box(0, 0, 90, 90).difference(
+            Point(15, 15)
+            .buffer(4)
+            .union(Point(45, 15).buffer(4))
+            .union(Point(75, 15).buffer(4))
+            .union(Point(15, 45).buffer(4))
+            .union(Point(45, 45).buffer(4))
+            .union(Point(75, 45).buffer(4))
+            .union(Point(15, 75).buffer(4))
+            .union(Point(45, 75).buffer(4))
+            .union(Point(75, 75).buffer(4))
+        ),
+        1.5,
+        None,
+    ),
+]
+
+
+def features(polygon, social_distance, buffer_zone_size) -> np.ndarray:
+    area, perimeter, rings = capacity_features(polygon, buffer_zone_size)
+    return np.array(
+        [area / social_distance**2, perimeter / social_distance, rings], dtype=float
+    )
+
+
+def relative_errors(estimates: np.ndarray, placed: np.ndarray) -> np.ndarray:
+    return np.abs(estimates - placed) / np.maximum(placed, 1)
+
+
+def main():
+    x = np.array([features(p, r, b) for _, p, r, b in CORPUS])
+    for algorithm in ALGORITHMS:
+        placed = np.array(
+            [
+                calculate(
+                    polygon,
+                    social_distance=r,
+                    buffer_zone_size=b,
+                    algorithm=algorithm,
+                    seed=0,
+                ).n_humans
+                for _, polygon, r, b in CORPUS
+            ],
+            dtype=float,
+        )
+        coefficients, *_ = np.linalg.lstsq(x, placed, rcond=None)
+        errors = relative_errors(x @ coefficients, placed)
+        left_out = []
+        for i in range(len(CORPUS)):
+            keep = np.arange(len(CORPUS)) != i
+            fitted, *_ = np.linalg.lstsq(x[keep], placed[keep], rcond=None)
+            left_out.append(x[i] @ fitted)
+        loo_errors = relative_errors(np.array(left_out), placed)
+        current = np.array(
+            [estimate_capacity(polygon, r, b, algorithm) for _, polygon, r, b in CORPUS]
+        )
+        current_errors = relative_errors(current, placed)
+
+        print(f"\n{algorithm}: ({', '.join(f'{c:.4g}' for c in coefficients)})")
+        print(
+            f"{'shape':>26} {'placed':>7} {'fitted':>7} {'error':>6} "
+            f"{'current':>7} {'error':>6}"
+        )
+        for (name, *_), n, fit, error, cur, cur_error in zip(
+            CORPUS, placed, x @ coefficients, errors, current, current_errors
+        ):
+            print(
+                f"{name:>26} {n:7.0f} {fit:7.0f} {error:6.1%} "
+                f"{cur:7.0f} {cur_error:6.1%}"
+            )
+        print(
+            f"mean / max error: fitted {errors.mean():.1%} / {errors.max():.1%}, "
+            f"left out {loo_errors.mean():.1%} / {loo_errors.max():.1%}, "
+            f"current {current_errors.mean():.1%} / {current_errors.max():.1%}"
+        )
+
+    polygon, r, b = CORPUS[-1][1:]
+    n = 10000
+    start = time.perf_counter()
+    for _ in range(n):
+        estimate_capacity(polygon, r, b)
+    elapsed = time.perf_counter() - start
+    print(f"\nestimate_capacity: {elapsed / n * 1e6:.1f} us per call")
+    print("coefficients in use:", ESTIMATE_COEFFICIENTS)
+
+
+if __name__ == "__main__":
+    main()
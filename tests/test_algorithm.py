@@ -0,0 +1,138 @@
+import math
+
+import numpy as np
+import pytest
+from shapely.geometry import MultiPolygon, Point, box
+
+from web_app.algorithm import (
+    ALGORITHMS,
+    PolygonSampler,
+    calculate,
+    capacity_features,
+    clean_polygon,
+    estimate_capacity,
+    triangulate_polygon,
+)
+from web_app.exceptions import NotAPolygon
+
+
+def triangle_areas(triangles: np.ndarray) -> np.ndarray:
+    edge_a = triangles[:, 1] - triangles[:, 0]
+    edge_b = triangles[:, 2] - triangles[:, 0]
+    return np.abs(edge_a[:, 0] * edge_b[:, 1] - edge_a[:, 1] * edge_b[:, 0]) / 2
+
+
+@pytest.fixture
+def ring_with_island() -> MultiPolygon:
+    ring = box(0, 0, 100, 100).difference(box(20, 20, 80, 80))
+    return MultiPolygon([ring, box(30, 30, 70, 70)])
+
+
+def test_triangulation_covers_a_polygon_once(ring_with_island):
+    triangles, exact = triangulate_polygon(ring_with_island)
+    assert exact.all()
+    assert triangle_areas(triangles).sum() == pytest.approx(ring_with_island.area)
+
+
+def test_triangulation_of_a_concave_polygon():
+    polygon = box(0, 0, 100, 100).difference(box(0, 40, 60, 60))
+    triangles, _ = triangulate_polygon(polygon)
+    assert triangle_areas(triangles).sum() == pytest.approx(polygon.area)
+
+
+def test_sampler_is_uniform_over_parts(ring_with_island):
+    sampler = PolygonSampler(ring_with_island, np.random.default_rng(0))
+    points = sampler.sample(100000)
+    on_island = (
+        (points[:, 0] > 30)
+        & (points[:, 0] < 70)
+        & (points[:, 1] > 30)
+        & (points[:, 1] < 70)
+    ).mean()
+    assert on_island == pytest.approx(1600 / 8000, abs=0.01)
+
+
+@pytest.mark.parametrize("barrier", [1.0, 10.0, 30.0])
+def test_capacity_features_of_a_barrier(barrier):
+    disk = Point(0, 0).buffer(50, 256)
+    area, perimeter, n_rings = capacity_features(disk, barrier)
+    assert area == pytest.approx(math.pi * (50 - barrier) ** 2, rel=1e-3)
+    assert perimeter == pytest.approx(2 * math.pi * (50 - barrier), rel=1e-3)
+    assert n_rings == 1
+
+
+@pytest.mark.parametrize("barrier", [25.0, 40.0, 1000.0])
+def test_no_capacity_past_the_inradius(barrier):
+    assert capacity_features(box(0, 0, 100, 50), barrier)[0] == 0
+    assert estimate_capacity(box(0, 0, 100, 50), 1.5, barrier) == 0
+
+
+# drawn rings in meters, the area of the face to keep and a point inside it.
+DRAWINGS = {
+    "square": ([(0, 0), (100, 0), (100, 100), (0, 100)], 10000, (50, 50)),
+    "duplicate vertices": (
+        [(0, 0), (0, 0), (100, 0), (100, 0), (100, 100), (0, 100), (0, 100)],
+        10000,
+        (50, 50),
+    ),
+    "bowtie": ([(0, 0), (100, 100), (100, 0), (0, 100)], 2500, (25, 50)),
+    "spike": (
+        [(0, 0), (100, 0), (100, 50), (150, 50), (100, 50), (100, 100), (0, 100)],
+        10000,
+        (50, 50),
+    ),
+    "loop": (
+        [(0, 0), (100, 0), (100, 100), (110, 110), (110, 90), (90, 110), (0, 100)],
+        10500,
+        (50, 50),
+    ),
+    "overshoot": (
+        [(0, 0), (100, 0), (100, 100), (0, 100), (0, -5), (5, -5), (5, 5)],
+        9987.5,
+        (50, 50),
+    ),
+}
+
+
+@pytest.mark.parametrize("closed", [False, True])
+@pytest.mark.parametrize("name", DRAWINGS)
+def test_clean_polygon_keeps_the_main_face(name, closed):
+    ring, area, inside = DRAWINGS[name]
+    polygon = clean_polygon(ring + ring[:1] if closed else ring)
+    assert polygon.is_valid
+    assert polygon.area == pytest.approx(area)
+    assert polygon.contains(Point(inside))
+
+
+def test_clean_polygon_drops_a_spike():
+    ring, _, _ = DRAWINGS["spike"]
+    assert clean_polygon(ring).equals(box(0, 0, 100, 100))
+
+
+def test_clean_polygon_simplifies_to_a_valid_polygon():
+    ring, area, _ = DRAWINGS["loop"]
+    polygon = clean_polygon(ring, simplify_tolerance=0.015)
+    assert polygon.is_valid
+    assert polygon.area == pytest.approx(area, rel=1e-3)
+
+
+@pytest.mark.parametrize(
+    "ring",
+    [
+        [(0, 0), (50, 50), (100, 100)],
+        [(0, 0), (100, 100), (0, 0)],
+        [(0, 0), (100, 100)],
+    ],
+    ids=["collinear", "two points, closed", "two points"],
+)
+def test_clean_polygon_without_area(ring):
+    with pytest.raises(NotAPolygon):
+        clean_polygon(ring)
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_no_people_inside_a_covering_obstacle(algorithm):
+    result = calculate(
+        box(0, 0, 2, 2), 0.5, algorithm=algorithm, point_obstacles=[[1, 1, 3]]
+    )
+    assert result.n_humans == 0
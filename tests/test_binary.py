@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from web_app.binary import (
+    ALIGNMENT,
+    DELTA,
+    DELTA_SCALE,
+    ENCODINGS,
+    FLOAT32,
+    decode_result,
+    encode_result,
+    sort_for_delta,
+)
+
+HEADER = {"type": "FeatureCollection", "features": [], "properties": {"n_humans": 0}}
+# largest error of a coordinate, in degrees.
+TOLERANCES = {FLOAT32: 2e-5, DELTA: 0.5 / DELTA_SCALE + 1e-12}
+
+
+def round_trip(areas, encoding):
+    data = encode_result(HEADER, areas, encoding)
+    header, lonlat = decode_result(data)
+    assert header["encoding"] == encoding
+    assert header["properties"] == HEADER["properties"]
+    assert [marker["polygon_id"] for marker in header["markers"]] == [
+        polygon_id for polygon_id, _ in areas
+    ]
+    counts = [marker["count"] for marker in header["markers"]]
+    assert counts == [len(pts) for _, pts in areas]
+    return np.split(lonlat, np.cumsum(counts)[:-1]) if counts else []
+
+
+def markers_near(rng, lon, lat, n_markers):
+    return np.column_stack(
+        [rng.uniform(lon, lon + 0.1, n_markers), rng.uniform(lat, lat + 0.1, n_markers)]
+    )
+
+
+def expected(pts, encoding):
+    return pts[sort_for_delta(pts)] if encoding == DELTA else pts
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_round_trip_without_markers(encoding):
+    assert round_trip([], encoding) == []
+    (decoded,) = round_trip([("7", np.zeros((0, 2)))], encoding)
+    assert decoded.shape == (0, 2)
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_round_trip_of_several_polygons(encoding):
+    rng = np.random.default_rng(0)
+    areas = [
+        ("a", markers_near(rng, -16.8, 28.3, 50)),
+        ("b", np.zeros((0, 2))),
+        (3, markers_near(rng, 2.1, 41.3, 20)),
+    ]
+    for decoded, (_, pts) in zip(round_trip(areas, encoding), areas):
+        np.testing.assert_allclose(
+            decoded, expected(pts, encoding), rtol=0, atol=TOLERANCES.get(encoding, 0)
+        )
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_round_trip_of_negative_deltas_and_extreme_coordinates(encoding):
+    pts = np.array(
+        [
+            [179.9999999, 89.9999999],
+            [-180.0, -90.0],
+            [180.0, 90.0],
+            [-179.9999999, -89.9999999],
+            [0.0, 0.0],
+            [-0.0000001, -0.0000001],
+            [-120.5, 45.25],
+            [-120.6, 45.0],
+        ]
+    )
+    (decoded,) = round_trip([("7", pts)], encoding)
+    np.testing.assert_allclose(
+        decoded, expected(pts, encoding), rtol=0, atol=TOLERANCES.get(encoding, 0)
+    )
+
+
+def test_delta_encoding_of_identical_markers():
+    pts = np.full((5, 2), [-16.8, 28.4])
+    (decoded,) = round_trip([("7", pts)], DELTA)
+    np.testing.assert_allclose(decoded, pts, rtol=0, atol=TOLERANCES[DELTA])
+
+
+def test_marker_data_is_aligned():
+    for n_markers in range(4):
+        data = encode_result(HEADER, [("7", np.ones((n_markers, 2)))], FLOAT32)
+        assert (len(data) - 8 * n_markers) % ALIGNMENT == 0
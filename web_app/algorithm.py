@@ -1,73 +1,160 @@
 import dataclasses
-from typing import Any, Dict, List, Optional, Tuple
+import functools
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import numpy as np
-import pyproj
 import shapely.ops
 import shapely.speedups
 import shapely.vectorized
-from descartes import PolygonPatch
 from shapely.coords import CoordinateSequence
-from shapely.geometry import LineString, Point, Polygon, box
+from shapely.geometry import Point, Polygon, box
 from shapely.geometry import mapping as geojson_mapping
+from shapely.prepared import PreparedGeometry, prep
+from shapely.strtree import STRtree
 
-from .exceptions import CoordSystemInconsistency, NotAPolygon, OutsideSupportedArea
+from .crs import BOUNDING_BOX_MAP, TransformerMapping, select_coordinate_system
+from .exceptions import NotAPolygon, UnknownAlgorithm
 
 if shapely.speedups.available:
     shapely.speedups.enable()
 
 
-BLUE = "#6699cc"
-GRAY = "#999999"
-RED = "#8B0000"
-GREEN = "#32CD32"
-
-# all mappings are FROM WGS84, epsg:4326
-# all mappings are to coordinate systems measured in meters.
-global_proj = pyproj.Proj("epsg:4326")
-TRANSFORMER_MAPPING: Dict[str, pyproj.Transformer] = {
-    "epsg:3035": pyproj.Transformer.from_proj(
-        global_proj, pyproj.Proj("epsg:3035")
-    ),  # most of europe
-    "epsg:5634": pyproj.Transformer.from_proj(
-        global_proj, pyproj.Proj("epsg:5634")
-    ),  # canaries
-    "epsg:6269": pyproj.Transformer.from_proj(
-        global_proj, pyproj.Proj("epsg:8826")
-    ),  # contiguous usa and canada
+# all mappings are FROM WGS84, epsg:4326, to coordinate systems measured in
+#  meters, see `web_app.crs`.
+TRANSFORMER_MAPPING = TransformerMapping()
+REVERSE_TRANSFORMER_MAPPING = TransformerMapping(reverse=True)
+
+# areas of more than 15 hectares are tiled, smaller ones are placed in one piece.
+TILE_THRESHOLD = 1.5e5  # in m^2.
+TILE_SIZE = 150.0  # side of a square tile, in m.
+
+# random insertion draws candidates in chunks of this size.
+CHUNK_SIZE = 2048
+# it stops once less than this fraction of the candidates of the last
+#  SATURATION_WINDOW chunks was accepted.
+SATURATION_RATE = 0.001
+SATURATION_WINDOW = 8
+# at most this many candidates per r^2 of area, for polygons that never saturate.
+MAX_CANDIDATES_FACTOR = 100
+# random insertion samples polygons with this many holes in their outline and
+#  rejects candidates with an `ObstacleIndex` of the holes, which is cheaper
+#  than triangulating around them.
+OBSTACLE_INDEX_MIN_HOLES = 8
+# side of the grid cells of an `ObstacleIndex`, in m.
+OBSTACLE_CELL_SIZE = 2.0
+# near a batch of points, up to this many polygon obstacles are checked one by
+#  one, more are checked as a whole.
+OBSTACLE_PREPARED_MAX = 16
+# disks per r^2 of area that random insertion and Poisson sampling end up with,
+#  measured with benchmarks/bench_algorithms.py. Used to estimate progress.
+RANDOM_PACKING_DENSITY = 0.16
+
+# why placement stopped.
+STOP_SATURATED = "saturated"
+STOP_MAX_CANDIDATES = "max_candidates"
+STOP_EXHAUSTED = "exhausted"
+STOP_COMPLETE = "complete"
+STOP_DEADLINE = "deadline"
+# tiled placement reports the first of these reasons that any tile stopped for.
+STOP_REASON_PRIORITY = (
+    STOP_DEADLINE,
+    STOP_MAX_CANDIDATES,
+    STOP_SATURATED,
+    STOP_EXHAUSTED,
+    STOP_COMPLETE,
+)
+
+# placement algorithms understood by `calculate`.
+RANDOM_ALGORITHM = "random"
+POISSON_ALGORITHM = "poisson"
+HEXAGONAL_ALGORITHM = "hexagonal"
+ALGORITHMS = (RANDOM_ALGORITHM, POISSON_ALGORITHM, HEXAGONAL_ALGORITHM)
+# placements that draw random numbers, the others give the same result every run.
+RANDOMIZED_ALGORITHMS = (RANDOM_ALGORITHM, POISSON_ALGORITHM)
+
+# capacity ~ a * area / r^2 + b * perimeter / r + c * rings, per algorithm. Fitted
+#  with benchmarks/calibrate_estimate.py, which also reports the estimate's error.
+ESTIMATE_COEFFICIENTS: Dict[str, Tuple[float, float, float]] = {
+    RANDOM_ALGORITHM: (0.1565, 0.159, -2.599),
+    POISSON_ALGORITHM: (0.1537, 0.08525, -0.6077),
+    HEXAGONAL_ALGORITHM: (0.2859, 0.1403, -3.392),
 }
 
-REVERSE_TRANSFORMER_MAPPING: Dict[str, pyproj.Transformer] = {
-    "epsg:3035": pyproj.Transformer.from_proj(
-        pyproj.Proj("epsg:3035"), global_proj
-    ),  # most of europe
-    "epsg:5634": pyproj.Transformer.from_proj(
-        pyproj.Proj("epsg:5634"), global_proj
-    ),  # canaries
-    "epsg:6269": pyproj.Transformer.from_proj(
-        pyproj.Proj("epsg:8826"), global_proj
-    ),  # contiguous usa and canada
-}
-# BOUNDING BOXES IN WGS84
-BOUNDING_BOX_MAP = {
-    "epsg:3035": Polygon(
-        [(-16.1, 32.88), (-16.1, 84.17), (40.18, 84.17), (40.18, 32.88)]
-    ),
-    "epsg:5634": Polygon(
-        [(-21.73, 24.6), (-21.73, 32.76), (-11.75, 32.76), (-11.75, 24.6)]
-    ),
-}
-
-# maximum supported size is 15 hectares.
-MAX_SUPPORTED_SIZE = 1.5e5  # in m^2.
+# anything np.random.default_rng accepts, None draws fresh entropy.
+Seed = Union[None, int, np.random.SeedSequence]
 
 
 @dataclasses.dataclass
+class PlacementStats:
+    stop_reason: str
+    n_candidates: int
+    # estimated fraction of the planned work that was done.
+    completed: float = 1.0
+    # number of independently seeded placements the result is the best of, and
+    #  the spread of their n_humans.
+    n_runs: int = 1
+    min_humans: Optional[int] = None
+    mean_humans: Optional[float] = None
+    max_humans: Optional[int] = None
+    # m^2 placed again by an incremental recalculation, None for a full one.
+    refilled: Optional[float] = None
+
+    @property
+    def partial(self) -> bool:
+        return self.stop_reason == STOP_DEADLINE
+
+
 class CalculationResult:
-    n_humans: int
-    points: List[Point]
-    inner_polygon: Polygon
-    outer_polygon: Optional[Polygon] = None
+    """Outcome of `calculate`.
+
+    Disk centers are kept as a contiguous float64 nx2-array, shapely points
+    are only built when `points` is accessed.
+    """
+
+    __slots__ = ("centers", "inner_polygon", "outer_polygon", "placement", "_points")
+
+    def __init__(
+        self,
+        centers: np.ndarray,
+        inner_polygon: Polygon,
+        outer_polygon: Optional[Polygon] = None,
+        placement: Optional[PlacementStats] = None,
+    ):
+        self.centers = np.ascontiguousarray(centers, dtype=np.float64).reshape(-1, 2)
+        self.inner_polygon = inner_polygon
+        self.outer_polygon = outer_polygon
+        self.placement = placement
+        self._points: Optional[List[Point]] = None
+
+    def __repr__(self) -> str:
+        return f"CalculationResult(n_humans={self.n_humans})"
+
+    @property
+    def n_humans(self) -> int:
+        return self.centers.shape[0]
+
+    @property
+    def points(self) -> List[Point]:
+        if self._points is None:
+            self._points = [Point(x, y) for x, y in self.centers.tolist()]
+        return self._points
 
 
 def polygon_from_geosjon_feature(feature: Dict[str, Any]) -> Polygon:
@@ -105,56 +192,51 @@ def convert_wgs84_to_meter_system(polygon: Polygon) -> Tuple[str, Polygon]:
         coordinate system.
 
     :param polygon: the polygon to be converted
-
+    :raises: OutsideSupportedArea, when the polygon is not in WGS84.
     :return: name of coordinate system used, another polygon.
     """
-    # first check canaries
-    if polygon.within(BOUNDING_BOX_MAP["epsg:5634"]):
-        return (
-            "epsg:5634",
-            shapely.ops.transform(TRANSFORMER_MAPPING["epsg:5634"].transform, polygon),
-        )
-    # then europe as whole
-    if polygon.within(BOUNDING_BOX_MAP["epsg:3035"]):
-        return (
-            "epsg:3035",
-            shapely.ops.transform(TRANSFORMER_MAPPING["epsg:3035"].transform, polygon),
-        )
-
-    raise OutsideSupportedArea("Could not convert to a meter-based coordinate system")
+    coordinate_system, (converted,) = multi_convert_to_meter_system([polygon])
+    return coordinate_system, converted
 
 
 def multi_convert_to_meter_system(polygons: List[Polygon]) -> Tuple[str, List[Polygon]]:
     """Convert mutiple polygons to a meter based system
 
+    The coordinate system is picked once for all polygons, see
+    `web_app.crs.select_coordinate_system`.
+
     :param polygons: polygons to be converted
-    :raises: CoordSystemInconsistency: when the individually
-        detected coordinate systems are different.
+    :raises: CoordSystemInconsistency: when the polygons lie too far apart to
+        share a coordinate system.
     :raises: NotAPolygon, when items is < 1
-    :raises: OutsideSupportedArea, when any of the items is outside supported area.
+    :raises: OutsideSupportedArea, when any of the items is not in WGS84.
     :return: name of coordinate system used, converted polygons
     """
     if not polygons:
         raise NotAPolygon("Must supply at least 1 item")
 
-    first_coord, first_conv = convert_wgs84_to_meter_system(polygons[0])
-
-    if len(polygons) == 1:
-        return first_coord, [first_conv]
-
-    other_coords, other_conv = [], []
-
-    for other_polygon in polygons[1:]:
-        other_co, other_cv = convert_wgs84_to_meter_system(other_polygon)
-        other_coords.append(other_co)
-        other_conv.append(other_cv)
-
-    if not all(o == first_coord for o in other_coords):
-        raise CoordSystemInconsistency("Detected multiple coordinate systems.")
-
-    all_conv = [first_conv] + other_conv
-
-    return first_coord, all_conv
+    coordinate_system = select_coordinate_system(polygons)
+    # all rings are reprojected with a single transformer call.
+    rings = [
+        np.asarray(ring.coords)[:, :2]
+        for polygon in polygons
+        if not polygon.is_empty
+        for ring in [polygon.exterior, *polygon.interiors]
+    ]
+    xs, ys = TRANSFORMER_MAPPING[coordinate_system].transform(*np.concatenate(rings).T)
+    metered = np.split(
+        np.column_stack([xs, ys]), np.cumsum([ring.shape[0] for ring in rings])[:-1]
+    )
+    converted = []
+    for polygon in polygons:
+        if polygon.is_empty:
+            converted.append(Polygon())
+            continue
+        n_rings = 1 + len(polygon.interiors)
+        exterior, *interiors = metered[:n_rings]
+        metered = metered[n_rings:]
+        converted.append(Polygon(exterior, interiors))
+    return coordinate_system, converted
 
 
 def create_composite_polygon(polygons: List[Polygon]):
@@ -176,30 +258,79 @@ def create_composite_polygon(polygons: List[Polygon]):
     return bounding_poly
 
 
-def metered_points_to_geojson(
-    points: List[Point], coordinate_system: str, polygon_id: int
+def metered_centers_to_geojson(
+    centers: np.ndarray, coordinate_system: str, polygon_id: int
 ) -> List[Dict[str, Any]]:
-    """List of metered points to geojson object
+    """Array of metered points to geojson object
 
-    :param points: list of points
+    Reprojects all points with a single transformer call.
+
+    :param centers: numpy nx2-array of point coordinates
     :param coordinate_system: coordinate system
     :param: polygon id this point refers to.
     :return: geojson in WGS84.
     """
+    if not len(centers):
+        return []
+    lonlat = metered_centers_to_wgs84(centers, coordinate_system)
     return [
         {
             "type": "Feature",
-            "geometry": geojson_mapping(
-                shapely.ops.transform(
-                    REVERSE_TRANSFORMER_MAPPING[coordinate_system].transform, point
-                )
-            ),
+            "geometry": {"type": "Point", "coordinates": coordinates},
             "properties": {"polygon_id": polygon_id, "type": "marker"},
         }
-        for point in points
+        for coordinates in zip(lonlat[:, 0].tolist(), lonlat[:, 1].tolist())
     ]
 
 
+def metered_centers_to_wgs84(centers: np.ndarray, coordinate_system: str) -> np.ndarray:
+    """Reproject an array of metered points with a single transformer call.
+
+    :param centers: numpy nx2-array of point coordinates
+    :param coordinate_system: coordinate system
+    :return: numpy nx2-array of longitudes and latitudes.
+    """
+    if not len(centers):
+        return np.zeros(shape=(0, 2))
+    xs, ys = REVERSE_TRANSFORMER_MAPPING[coordinate_system].transform(
+        centers[:, 0], centers[:, 1]
+    )
+    return np.column_stack([np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)])
+
+
+def wgs84_circles_to_meter_system(
+    circles: np.ndarray, coordinate_system: str
+) -> np.ndarray:
+    """Reproject the centers of circles with a single transformer call.
+
+    :param circles: numpy nx3-array of longitudes, latitudes and radii in meters.
+    :param coordinate_system: coordinate system
+    :return: numpy nx3-array of x, y and radius.
+    """
+    if not len(circles):
+        return np.zeros(shape=(0, 3))
+    xs, ys = TRANSFORMER_MAPPING[coordinate_system].transform(
+        circles[:, 0], circles[:, 1]
+    )
+    return np.column_stack(
+        [np.asarray(xs, dtype=float), np.asarray(ys, dtype=float), circles[:, 2]]
+    )
+
+
+def metered_points_to_geojson(
+    points: List[Point], coordinate_system: str, polygon_id: int
+) -> List[Dict[str, Any]]:
+    """List of metered points to geojson object
+
+    :param points: list of points
+    :param coordinate_system: coordinate system
+    :param: polygon id this point refers to.
+    :return: geojson in WGS84.
+    """
+    centers = np.array([(point.x, point.y) for point in points], dtype=float)
+    return metered_centers_to_geojson(centers, coordinate_system, polygon_id)
+
+
 def polygon_to_geojson(
     polygon: Polygon, coordinate_system: str, polygon_id: int, inner=True
 ):
@@ -214,49 +345,36 @@ def polygon_to_geojson(
     }
 
 
-def plot_line(ax, ob, color=BLUE):
-    """Function to plot Shapely line object"""
-    # Get objects x and y boundary as line
-    x, y = ob.xy
-    ax.plot(x, y, color=color, linewidth=3, solid_capstyle="round", zorder=1, alpha=0.5)
-
-
-def plot_coords(ax, ob, color=GRAY):
-    """Function to plot Shapely object coordinates"""
-    # Get Shapely object point coords (e.g. polygon vertexes)
-    coords = np.asarray(ob)
-    #  If multiple points, scatter plot
-    if coords.size > 2:
-        ax.scatter(coords[:, 0], coords[:, 1], color=color)
-    # If single, point plot
-    else:
-        ax.scatter(coords[0], coords[1], color=color)
+def clean_polygon(
+    coords: CoordinateSequence, simplify_tolerance: Optional[float] = None
+) -> Polygon:
+    """Function that converts the ring of a drawing into a valid Polygon.
 
+    Coordinates are assumed to be in meters. Rings that are already valid are
+    taken as they are. Self-intersecting rings are noded and polygonized, and
+    the largest face is kept, so spikes, duplicate vertices and small loops of
+    a sloppy drawing are dropped.
 
-def correct_line_intersection(coords: CoordinateSequence) -> Polygon:
-    """Function that converts a list of 2D cartesian coordinates
-    (importable into Shapely) into a closed Polygon.
-
-     Coordinates are assumed to be in meters.
-     It accounts for lines that potentially intersects.
+    :param coords: coordinates of the ring, closed or not.
+    :param simplify_tolerance: when given, vertices closer than this to the
+        simplified outline are removed, keeping the polygon valid.
+    :raises: NotAPolygon, when the ring does not enclose any area.
+    :return: valid polygon.
     """
-    # Generate LineString obj from coordinates
-    polyline = LineString(coords)
-
-    # Create tiny buffer region around polyline
-    polyline_buffer = polyline.buffer(0.1)
-
-    # Create bounding box of polyline_buffer
-    bbox = box(*polyline_buffer.bounds)
-
-    # Obtain a list of unconnected polygons by difference of bbox and polyline_buffer
-    list_polygons = bbox.difference(polyline_buffer)
+    try:
+        polygon = Polygon(coords)
+    except ValueError:
+        raise NotAPolygon("Cannot construct a polygon with less than 3 tuples.")
 
-    # Valid polygon is the one with highest intersection area with original polygon
-    polygon = max(
-        list_polygons, key=lambda a: a.intersection(Polygon(polyline).buffer(0)).area
-    )
+    if not polygon.is_valid:
+        # unary_union nodes the ring at its self-intersections.
+        faces = list(shapely.ops.polygonize(shapely.ops.unary_union(polygon.exterior)))
+        if not faces:
+            raise NotAPolygon("The drawing does not enclose any area.")
+        polygon = max(faces, key=lambda face: face.area)
 
+    if simplify_tolerance:
+        polygon = polygon.simplify(simplify_tolerance, preserve_topology=True)
     return polygon
 
 
@@ -273,8 +391,8 @@ def random_disk_insertion(
     :param r:
     :return:
     """
-    accept = 1
-    r_square = r ** 2
+    accept = 0
+    r_square = r**2
     for i in range(min(n_iter, filtered.shape[0])):
         #  Generate random point inside ob
         pts_temp = filtered[i, :]
@@ -293,146 +411,1324 @@ def random_disk_insertion(
     return accept, pts
 
 
+class DiskGrid:
+    """Uniform grid (spatial hash) of accepted disk centers.
+
+    Cells are sized to the exclusion distance ``2 * r``, so any accepted point
+    that could conflict with a candidate lives in one of the 3x3 cells around
+    the candidate's own cell. This keeps the cost per candidate constant instead
+    of growing with the number of points accepted so far.
+
+    :param r: disk radius.
+    """
+
+    def __init__(self, r: float):
+        self.cell_size = 2 * r
+        self.min_dist_square = self.cell_size * self.cell_size
+        self.cells: Dict[Tuple[int, int], List[Tuple[float, float]]] = {}
+
+    def has_neighbour(self, x: float, y: float) -> bool:
+        """Check for an accepted point closer than the exclusion distance to (x, y)."""
+        cell_x = int(x // self.cell_size)
+        cell_y = int(y // self.cell_size)
+        for i in (cell_x - 1, cell_x, cell_x + 1):
+            for j in (cell_y - 1, cell_y, cell_y + 1):
+                for other_x, other_y in self.cells.get((i, j), ()):
+                    dx = other_x - x
+                    dy = other_y - y
+                    if dx * dx + dy * dy <= self.min_dist_square:
+                        return True
+        return False
+
+    def add(self, x: float, y: float) -> None:
+        key = (int(x // self.cell_size), int(y // self.cell_size))
+        self.cells.setdefault(key, []).append((x, y))
+
+    def insert(self, candidates: np.ndarray, pts: np.ndarray, accept: int) -> int:
+        """Try candidates in order, accepting those without a close neighbour.
+
+        :param candidates: nx2-array of candidate points.
+        :param pts: output array, accepted points are written from row accept on.
+        :param accept: number of rows of pts already in use.
+        :return: number of rows of pts in use afterwards.
+        """
+        for x, y in candidates.tolist():
+            if self.has_neighbour(x, y):
+                continue
+            self.add(x, y)
+            pts[accept, 0] = x
+            pts[accept, 1] = y
+            accept += 1
+        return accept
+
+
+def grid_disk_insertion(
+    n_iter: int, pts: np.ndarray, filtered: np.ndarray, r: float
+) -> Tuple[int, np.ndarray]:
+    """Random disk insertion backed by a `DiskGrid`.
+
+    Same contract as :func:`random_disk_insertion`.
+
+    :param n_iter: maximum number of candidates to try.
+    :param pts: output array, at least as long as the number of candidates.
+    :param filtered: nx2-array of candidate points, tried in order.
+    :param r: disk radius.
+    :return: number of accepted points, pts with the accepted points on top.
+    """
+    accept = DiskGrid(r).insert(filtered[:n_iter], pts, 0)
+    return accept, pts
+
+
+def _strtree_query(tree: STRtree, ids: Dict[int, int], geometry: Any) -> List[int]:
+    """Indices of the geometries of tree whose bounds meet those of geometry."""
+    # Shapely 1.7 returns the indexed geometries, later versions their indices.
+    return [
+        int(item) if isinstance(item, (int, np.integer)) else ids[id(item)]
+        for item in tree.query(geometry)
+    ]
+
+
+class ObstacleIndex:
+    """Obstacles of a venue, indexed for containment checks of many points.
+
+    Polygon obstacles, e.g. kiosks or fountains, are kept in an STRtree, and a
+    batch of points is only checked against the obstacles the tree finds
+    within its bounds: one by one with prepared geometries when there are few
+    of them, as a whole otherwise. Point obstacles, e.g. trees, stay circles.
+    They are registered in the cells of a uniform grid their bounds touch, and
+    every point is checked by distance against the circles of its own cell
+    only. Points in cells that no obstacle reaches are not checked at all.
+
+    :param polygons: polygon obstacles.
+    :param circles: nx3-array of x, y and radius of point obstacles.
+    :param cell_size: side of the grid cells, in meters.
+    """
+
+    def __init__(
+        self,
+        polygons: Sequence[Polygon] = (),
+        circles: Optional[np.ndarray] = None,
+        cell_size: float = OBSTACLE_CELL_SIZE,
+    ):
+        self.polygons = list(polygons)
+        self.circles = (
+            np.zeros(shape=(0, 3))
+            if circles is None
+            else np.asarray(circles, dtype=float).reshape(-1, 3)
+        )
+        self.cell_size = cell_size
+        self._prepared = [prep(polygon) for polygon in self.polygons]
+        self._polygon_bounds = np.array(
+            [polygon.bounds for polygon in self.polygons], dtype=float
+        ).reshape(-1, 4)
+        self._all_polygons: Optional[PreparedGeometry] = None
+        self._tree = STRtree(self.polygons) if self.polygons else None
+        self._ids = {id(polygon): i for i, polygon in enumerate(self.polygons)}
+
+        # grid cells touched by the bounds of any obstacle.
+        circle_bounds = self.circles[:, [0, 1, 0, 1]] + self.circles[
+            :, [2, 2, 2, 2]
+        ] * np.array([-1, -1, 1, 1])
+        bounds = np.concatenate([self._polygon_bounds, circle_bounds])
+        if not bounds.shape[0]:
+            self._origin = np.zeros(2, dtype=np.int64)
+            self._occupied = np.zeros(shape=(0, 0), dtype=bool)
+            return
+        lower = np.floor(bounds[:, :2] / cell_size).astype(np.int64)
+        upper = np.floor(bounds[:, 2:] / cell_size).astype(np.int64)
+        self._origin = lower.min(axis=0)
+        lower -= self._origin
+        upper -= self._origin
+        self._occupied = np.zeros(shape=tuple(upper.max(axis=0) + 1), dtype=bool)
+        cell_keys: List[int] = []
+        cell_circles: List[int] = []
+        n_polygons = len(self.polygons)
+        for index, ((x0, y0), (x1, y1)) in enumerate(
+            zip(lower.tolist(), upper.tolist())
+        ):
+            self._occupied[x0 : x1 + 1, y0 : y1 + 1] = True
+            if index >= n_polygons:
+                for i in range(x0, x1 + 1):
+                    for j in range(y0, y1 + 1):
+                        cell_keys.append(i * self._occupied.shape[1] + j)
+                        cell_circles.append(index - n_polygons)
+
+        # circles by cell, the circles of self._keys[k] are
+        #  self._circle_ids[self._starts[k]:self._starts[k + 1]].
+        keys = np.array(cell_keys, dtype=np.int64)
+        order = np.argsort(keys, kind="stable")
+        self._circle_ids = np.array(cell_circles, dtype=np.int64)[order]
+        self._keys, self._starts = np.unique(keys[order], return_index=True)
+        self._starts = np.append(self._starts, keys.shape[0])
+
+    def __len__(self) -> int:
+        return len(self.polygons) + self.circles.shape[0]
+
+    def _polygons_contain(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        hit = np.zeros(xs.shape[0], dtype=bool)
+        if self._tree is None:
+            return hit
+        batch = box(xs.min(), ys.min(), xs.max(), ys.max())
+        found = _strtree_query(self._tree, self._ids, batch)
+        if len(found) > OBSTACLE_PREPARED_MAX:
+            if self._all_polygons is None:
+                self._all_polygons = prep(shapely.ops.unary_union(self.polygons))
+            return shapely.vectorized.contains(self._all_polygons, xs, ys)
+        for i in found:
+            minx, miny, maxx, maxy = self._polygon_bounds[i]
+            near = np.flatnonzero(
+                (xs >= minx) & (xs <= maxx) & (ys >= miny) & (ys <= maxy)
+            )
+            if near.size:
+                hit[near] |= shapely.vectorized.contains(
+                    self._prepared[i], xs[near], ys[near]
+                )
+        return hit
+
+    def _circles_contain(self, xs: np.ndarray, ys: np.ndarray, keys: np.ndarray):
+        hit = np.zeros(xs.shape[0], dtype=bool)
+        if not self._keys.shape[0]:
+            return hit
+        position = np.minimum(
+            np.searchsorted(self._keys, keys), self._keys.shape[0] - 1
+        )
+        points = np.flatnonzero(self._keys[position] == keys)
+        starts = self._starts[position[points]]
+        counts = self._starts[position[points] + 1] - starts
+        # one row per point and circle of its cell.
+        pairs = np.repeat(points, counts)
+        offsets = np.arange(pairs.shape[0]) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        circles = self.circles[self._circle_ids[np.repeat(starts, counts) + offsets]]
+        dx = xs[pairs] - circles[:, 0]
+        dy = ys[pairs] - circles[:, 1]
+        hit[pairs[dx * dx + dy * dy < circles[:, 2] * circles[:, 2]]] = True
+        return hit
+
+    def blocked(self, pts: np.ndarray) -> np.ndarray:
+        """Check which points lie inside an obstacle.
+
+        :param pts: nx2-array of points.
+        :returns: n-array of booleans.
+        """
+        blocked = np.zeros(pts.shape[0], dtype=bool)
+        if not pts.shape[0] or not self._occupied.size:
+            return blocked
+        cells = np.floor(pts / self.cell_size).astype(np.int64) - self._origin
+        candidates = np.flatnonzero(
+            (cells >= 0).all(axis=1) & (cells < self._occupied.shape).all(axis=1)
+        )
+        candidates = candidates[
+            self._occupied[cells[candidates, 0], cells[candidates, 1]]
+        ]
+        if not candidates.size:
+            return blocked
+        xs = pts[candidates, 0]
+        ys = pts[candidates, 1]
+        keys = cells[candidates, 0] * self._occupied.shape[1] + cells[candidates, 1]
+        blocked[candidates] = self._polygons_contain(xs, ys) | self._circles_contain(
+            xs, ys, keys
+        )
+        return blocked
+
+
+def obstacle_region(
+    polygon: Polygon,
+    point_obstacles: Optional[np.ndarray] = None,
+    min_holes: float = OBSTACLE_INDEX_MIN_HOLES,
+) -> Tuple[Polygon, Optional[ObstacleIndex]]:
+    """Split a polygon into its outline and an `ObstacleIndex` of its holes.
+
+    :param polygon: polygon to populate, in meters.
+    :param point_obstacles: nx3-array of x, y and radius of point obstacles.
+    :param min_holes: polygons with fewer holes keep them, only their point
+        obstacles are indexed.
+    :returns: the polygon, without its holes when they are indexed, and the
+        index, None when there is nothing to index.
+    """
+    parts = getattr(polygon, "geoms", [polygon])
+    n_holes = sum(len(part.interiors) for part in parts)
+    if polygon.is_empty or n_holes < min_holes:
+        if point_obstacles is None or not len(point_obstacles):
+            return polygon, None
+        return polygon, ObstacleIndex((), point_obstacles)
+    if isinstance(polygon, Polygon):
+        outline = Polygon(polygon.exterior)
+        holes = [Polygon(interior) for interior in polygon.interiors]
+    else:
+        # parts may lie on islands inside the holes of other parts.
+        outline = shapely.ops.unary_union([Polygon(part.exterior) for part in parts])
+        difference = outline.difference(polygon)
+        holes = [
+            hole
+            for hole in getattr(difference, "geoms", [difference])
+            if isinstance(hole, Polygon) and not hole.is_empty
+        ]
+    return outline, ObstacleIndex(holes, point_obstacles)
+
+
+def triangulate_polygon(
+    polygon: Polygon, refinements: int = 2
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Cover a polygon with triangles.
+
+    The Delaunay triangulation of the vertices covers the convex hull, so
+    triangles outside the polygon are dropped and triangles crossing its
+    boundary are intersected with it and triangulated again, up to
+    refinements times. Whatever still crosses the boundary after that is kept
+    and flagged as inexact. The parts of a MultiPolygon are triangulated one by
+    one, so no triangle is counted for two parts.
+
+    :param polygon: polygon to triangulate.
+    :param refinements: how often boundary triangles are split again.
+    :return: mx3x2-array of triangle vertices, m-array of whether each
+        triangle lies completely inside the polygon.
+    """
+    triangles: List[List[Tuple[float, float]]] = []
+    exact: List[bool] = []
+    for part in getattr(polygon, "geoms", [polygon]):
+        # triangles are tested against their own part only, a triangle over the
+        #  hole of one part may lie on an island that is another part.
+        prepared = prep(part)
+        pending = [(part, refinements)]
+        while pending:
+            piece, depth = pending.pop()
+            for triangle in shapely.ops.triangulate(piece):
+                if prepared.contains(triangle):
+                    triangles.append(triangle.exterior.coords[:3])
+                    exact.append(True)
+                elif not prepared.intersects(triangle):
+                    continue
+                elif depth > 0:
+                    inside = triangle.intersection(part)
+                    pending.extend(
+                        (geom, depth - 1)
+                        for geom in getattr(inside, "geoms", [inside])
+                        if isinstance(geom, Polygon) and geom.area > 0
+                    )
+                else:
+                    triangles.append(triangle.exterior.coords[:3])
+                    exact.append(False)
+    return (
+        np.array(triangles, dtype=float).reshape(-1, 3, 2),
+        np.array(exact, dtype=bool),
+    )
+
+
+class PolygonSampler:
+    """Draw uniformly distributed points inside a polygon.
+
+    The polygon is triangulated once with `triangulate_polygon`. Triangles are
+    picked in proportion to their area and points are drawn uniformly inside
+    them, so only the few points that land in inexact boundary triangles need
+    a containment check.
+
+    :param polygon: polygon to sample.
+    :param rng: random generator to draw from, None for a freshly seeded one.
+    """
+
+    def __init__(self, polygon: Polygon, rng: Optional[np.random.Generator] = None):
+        self.polygon = polygon
+        self.rng = rng if rng is not None else np.random.default_rng()
+        if polygon.is_empty:
+            triangles, exact = np.zeros(shape=(0, 3, 2)), np.zeros(0, dtype=bool)
+        else:
+            triangles, exact = triangulate_polygon(polygon)
+        self.exact = exact
+        self.origin = triangles[:, 0, :]
+        self.edge_a = triangles[:, 1, :] - self.origin
+        self.edge_b = triangles[:, 2, :] - self.origin
+        areas = np.abs(
+            self.edge_a[:, 0] * self.edge_b[:, 1]
+            - self.edge_a[:, 1] * self.edge_b[:, 0]
+        )
+        total = areas.sum()
+        self.weights = areas / total if total > 0 else None
+
+    def sample(self, n: int) -> np.ndarray:
+        """Draw n points.
+
+        :returns: numpy nx2-array of floats, slightly fewer than n rows when
+            points in inexact triangles fell outside the polygon.
+        """
+        if self.weights is None or n <= 0:
+            return np.zeros(shape=(0, 2))
+
+        picked = self.rng.choice(self.weights.shape[0], n, p=self.weights)
+        u = self.rng.random(n)
+        v = self.rng.random(n)
+        # reflect draws from the other half of the parallelogram into the triangle.
+        outside = u + v > 1
+        u[outside] = 1 - u[outside]
+        v[outside] = 1 - v[outside]
+        pts = (
+            self.origin[picked]
+            + u[:, np.newaxis] * self.edge_a[picked]
+            + v[:, np.newaxis] * self.edge_b[picked]
+        )
+
+        check = np.flatnonzero(~self.exact[picked])
+        if check.size:
+            inside = shapely.vectorized.contains(
+                self.polygon, pts[check, 0], pts[check, 1]
+            )
+            keep = np.ones(n, dtype=bool)
+            keep[check[~inside]] = False
+            pts = pts[keep]
+        return pts
+
+
+def sample_in_polygon(polygon: Polygon, n: int, seed: Seed = None) -> np.ndarray:
+    """Draw n uniformly distributed points inside a polygon, see `PolygonSampler`.
+
+    :returns: numpy nx2-array of floats.
+    """
+    return PolygonSampler(polygon, np.random.default_rng(seed)).sample(n)
+
+
+def _max_accepted(polygon: Polygon, r: float) -> int:
+    """Cells with a diagonal of 2r hold at most one disk center each, which caps
+    the number of disks that fit in the bounds of a polygon.
+    """
+    minx, miny, maxx, maxy = polygon.bounds
+    cell_size = 2 * r / math.sqrt(2)
+    return (int((maxx - minx) / cell_size) + 1) * (int((maxy - miny) / cell_size) + 1)
+
+
+def _estimated_progress(polygon: Polygon, r: float, n_disks: int) -> float:
+    """Fraction of the disks expected to fit a polygon that n_disks amounts to."""
+    expected = RANDOM_PACKING_DENSITY * polygon.area / (r * r)
+    return min(1.0, n_disks / expected) if expected > 0 else 1.0
+
+
+# set from another thread to make the placements running in this process stop as
+#  at their deadline, e.g. when their background job is cancelled.
+placement_interrupt = threading.Event()
+
+
+def _past(deadline: Optional[float]) -> bool:
+    return placement_interrupt.is_set() or (
+        deadline is not None and time.monotonic() >= deadline
+    )
+
+
+def stream_disk_insertion(
+    polygon: Polygon,
+    r: float = 1.0,
+    max_candidates: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+    saturation_rate: float = SATURATION_RATE,
+    deadline: Optional[float] = None,
+    rng: Optional[np.random.Generator] = None,
+    fixed: Optional[np.ndarray] = None,
+    obstacles: Optional[ObstacleIndex] = None,
+) -> Tuple[np.ndarray, PlacementStats]:
+    """Populate a polygon with disks of radius "r" from a stream of candidates.
+
+    Candidates are drawn and tried chunk by chunk, so memory stays bounded by
+    the chunk size. Insertion stops once the acceptance rate over the last
+    `SATURATION_WINDOW` chunks drops below saturation_rate, after
+    max_candidates candidates, or at the deadline.
+
+    :param polygon: polygon to populate, in meters.
+    :param r: disk radius.
+    :param max_candidates: upper bound on the candidates tried, None for no bound.
+    :param chunk_size: candidates drawn at once.
+    :param saturation_rate: acceptance rate under which the polygon counts as full.
+    :param deadline: `time.monotonic` value at which to stop, None for no deadline.
+    :param rng: random generator to draw from, None for a freshly seeded one.
+    :param fixed: nx2-array of disk centers placed already, new disks keep their
+        distance to them. They are not part of the result.
+    :param obstacles: obstacles inside polygon, see `obstacle_region`.
+        Candidates inside them are rejected.
+    :returns: numpy nx2-array of floats, and why and after how many candidates
+        insertion stopped.
+    """
+    if polygon.is_empty:
+        return np.zeros(shape=(0, 2)), PlacementStats(STOP_SATURATED, 0)
+
+    sampler = PolygonSampler(polygon, rng)
+    grid = DiskGrid(r)
+    if fixed is not None:
+        for x, y in fixed.tolist():
+            grid.add(x, y)
+    pts = np.empty(shape=(_max_accepted(polygon, r), 2))
+    accept = 0
+    n_candidates = 0
+    window: Deque[Tuple[int, int]] = deque(maxlen=SATURATION_WINDOW)
+    stop_reason = STOP_MAX_CANDIDATES
+
+    while max_candidates is None or n_candidates < max_candidates:
+        n = chunk_size
+        if max_candidates is not None:
+            n = min(n, max_candidates - n_candidates)
+        chunk = sampler.sample(n)
+        if chunk.shape[0] == 0:
+            stop_reason = STOP_SATURATED
+            break
+        n_candidates += chunk.shape[0]
+        if obstacles is not None:
+            chunk = chunk[~obstacles.blocked(chunk)]
+        accepted_before = accept
+        accept = grid.insert(chunk, pts, accept)
+
+        window.append((chunk.shape[0], accept - accepted_before))
+        if len(window) == window.maxlen:
+            tried = sum(tried for tried, _ in window)
+            accepted = sum(accepted for _, accepted in window)
+            if accepted < saturation_rate * tried:
+                stop_reason = STOP_SATURATED
+                break
+
+        if _past(deadline):
+            return (
+                pts[:accept, :].copy(),
+                PlacementStats(
+                    STOP_DEADLINE, n_candidates, _estimated_progress(polygon, r, accept)
+                ),
+            )
+
+    return pts[:accept, :].copy(), PlacementStats(stop_reason, n_candidates)
+
+
 def populate_square(
-    polygon: Polygon, iters: int = 1000, r: float = 1.0, fudge_factor: int = 2,
+    polygon: Polygon, iters: int = 1000, r: float = 1.0, seed: Seed = None
 ) -> np.ndarray:
     """Function to populate a polygon "polygon" with disks of radius "r".
-    It performs "iters" attemps of disk insertion.
+    It performs at most "iters" attemps of disk insertion.
     It returns an array of the coordinates of the inserted disk centers.
+    The same seed gives the same disks.
 
     :returns: numpy nx2-array of floats.
     """
+    disk_centers, _ = stream_disk_insertion(
+        polygon, r=r, max_candidates=iters, rng=np.random.default_rng(seed)
+    )
+    return disk_centers
+
 
-    # Define array of points
+def _random_point_in(
+    polygon: Polygon,
+    rng: np.random.Generator,
+    attempts: int = 100,
+    obstacles: Optional[ObstacleIndex] = None,
+) -> Optional[Tuple[float, float]]:
+    """Draw a uniformly random point inside a polygon by rejection from its bounds.
+
+    Falls back to a representative point for very thin polygons, None when an
+    obstacle covers that point too.
+    """
     minx, miny, maxx, maxy = polygon.bounds
-    n_random = iters * fudge_factor
-    random_arr_x = np.random.uniform(minx, maxx, n_random)
-    random_arr_y = np.random.uniform(miny, maxy, n_random)
-    random_arr = np.stack([random_arr_x, random_arr_y], axis=1)
+    xs = rng.uniform(minx, maxx, attempts)
+    ys = rng.uniform(miny, maxy, attempts)
+    mask = shapely.vectorized.contains(polygon, xs, ys)
+    if obstacles is not None:
+        mask &= ~obstacles.blocked(np.column_stack([xs, ys]))
+    inside = np.flatnonzero(mask)
+    if inside.size:
+        return xs[inside[0]], ys[inside[0]]
+    point = polygon.representative_point()
+    if obstacles is not None and obstacles.blocked(np.array([[point.x, point.y]]))[0]:
+        return None
+    return point.x, point.y
+
+
+def poisson_disk_sampling(
+    polygon: Polygon,
+    r: float = 1.0,
+    k: int = 30,
+    deadline: Optional[float] = None,
+    rng: Optional[np.random.Generator] = None,
+    obstacles: Optional[ObstacleIndex] = None,
+) -> Tuple[np.ndarray, PlacementStats]:
+    """Populate a polygon with disks of radius "r" using Bridson's algorithm.
+
+    New samples are drawn in the annulus [2r, 4r] around a randomly chosen
+    active sample; a sample is retired once k draws around it fail. Sampling
+    stops when no active samples are left, so there is no need to guess the
+    number of iterations.
+
+    :param polygon: polygon to populate, in meters.
+    :param r: disk radius.
+    :param k: number of draws around an active sample before retiring it.
+    :param deadline: `time.monotonic` value at which to stop, None for no deadline.
+    :param rng: random generator to draw from, None for a freshly seeded one.
+    :param obstacles: obstacles inside polygon, see `obstacle_region`.
+    :returns: numpy nx2-array of floats, and how many candidates were drawn.
+    """
+    if polygon.is_empty:
+        return np.zeros(shape=(0, 2)), PlacementStats(STOP_EXHAUSTED, 0)
+    if rng is None:
+        rng = np.random.default_rng()
+
+    min_dist = 2 * r
+    min_dist_square = min_dist * min_dist
+    # with this cell size every cell holds at most one sample.
+    cell_size = min_dist / math.sqrt(2)
+    minx, miny, maxx, maxy = polygon.bounds
+    n_x = int((maxx - minx) / cell_size) + 1
+    n_y = int((maxy - miny) / cell_size) + 1
+    # flat cell -> sample index lookup, -1 marks an empty cell.
+    grid = [-1] * (n_x * n_y)
+    samples: List[Tuple[float, float]] = []
+    active: List[int] = []
+
+    def try_insert(x: float, y: float) -> bool:
+        cell_x = int((x - minx) / cell_size)
+        cell_y = int((y - miny) / cell_size)
+        for i in range(max(cell_x - 2, 0), min(cell_x + 3, n_x)):
+            for j in range(max(cell_y - 2, 0), min(cell_y + 3, n_y)):
+                neighbour = grid[i * n_y + j]
+                if neighbour >= 0:
+                    other_x, other_y = samples[neighbour]
+                    dx = other_x - x
+                    dy = other_y - y
+                    if dx * dx + dy * dy <= min_dist_square:
+                        return False
+        grid[cell_x * n_y + cell_y] = len(samples)
+        active.append(len(samples))
+        samples.append((x, y))
+        return True
+
+    # seed every component, growth cannot jump between disconnected parts.
+    components = getattr(polygon, "geoms", [polygon])
+    for component in components:
+        start = _random_point_in(component, rng, obstacles=obstacles)
+        if start is not None:
+            try_insert(*start)
+
+    prepared = prep(polygon)
+    n_candidates = 0
+    stop_reason = STOP_EXHAUSTED
+    completed = 1.0
+    while active:
+        if _past(deadline):
+            stop_reason = STOP_DEADLINE
+            completed = _estimated_progress(polygon, r, len(samples))
+            break
+        n_candidates += k
+        index = rng.integers(len(active))
+        origin_x, origin_y = samples[active[index]]
+        # sqrt makes the draws uniform over the annulus area.
+        radius = np.sqrt(rng.uniform(min_dist_square, 4 * min_dist_square, k))
+        angle = rng.uniform(0, 2 * np.pi, k)
+        cand_x = origin_x + radius * np.cos(angle)
+        cand_y = origin_y + radius * np.sin(angle)
+        inside = shapely.vectorized.contains(prepared, cand_x, cand_y)
+        if obstacles is not None:
+            inside &= ~obstacles.blocked(np.column_stack([cand_x, cand_y]))
+        for x, y in zip(cand_x[inside].tolist(), cand_y[inside].tolist()):
+            if try_insert(x, y):
+                break
+        else:
+            active[index] = active[-1]
+            active.pop()
+
+    return (
+        np.array(samples, dtype=float).reshape(-1, 2),
+        PlacementStats(stop_reason, n_candidates, completed),
+    )
+
 
-    mask = shapely.vectorized.contains(polygon, random_arr_x, random_arr_y)
+def hexagonal_lattice_packing(
+    polygon: Polygon,
+    r: float = 1.0,
+    n_rotations: int = 6,
+    n_offsets: int = 4,
+    deadline: Optional[float] = None,
+    obstacles: Optional[ObstacleIndex] = None,
+) -> Tuple[np.ndarray, PlacementStats]:
+    """Populate a polygon with disks of radius "r" on a hexagonal lattice.
+
+    The lattice has pitch 2r, i.e. neighbouring disks touch. It tries
+    n_rotations rotations over the 60 degree symmetry of the lattice and an
+    n_offsets x n_offsets grid of offsets within the unit cell, and keeps the
+    candidate lattice that puts the most centers inside the polygon. Each
+    candidate is clipped with a single vectorized containment check.
+
+    At the deadline the best lattice so far is returned, at least one lattice
+    is always tried.
+
+    :param polygon: polygon to populate, in meters.
+    :param r: disk radius.
+    :param n_rotations: number of lattice rotations to try.
+    :param n_offsets: number of offsets to try along each lattice vector.
+    :param deadline: `time.monotonic` value at which to stop, None for no deadline.
+    :param obstacles: obstacles inside polygon, see `obstacle_region`.
+    :returns: numpy nx2-array of floats, and how many lattice points were checked.
+    """
+    if polygon.is_empty:
+        return np.zeros(shape=(0, 2)), PlacementStats(STOP_COMPLETE, 0)
+
+    # nudge the pitch so rounding never puts neighbours closer than 2r.
+    pitch = 2 * r * (1 + 1e-9)
+    minx, miny, maxx, maxy = polygon.bounds
+    center = np.array([(minx + maxx) / 2, (miny + maxy) / 2])
+    # the lattice must cover the bounds under any rotation, and any offset.
+    reach = math.hypot(maxx - minx, maxy - miny) / 2 + 2 * pitch
+
+    # base lattice around the origin, in lattice coordinates.
+    row_height = pitch * math.sqrt(3) / 2
+    n_cols = int(reach / pitch) + 1
+    n_rows = int(reach / row_height) + 1
+    cols, rows = np.meshgrid(
+        np.arange(-n_cols, n_cols + 1), np.arange(-n_rows, n_rows + 1)
+    )
+    base_x = (cols + (rows % 2) / 2) * pitch
+    base_y = rows * row_height
+    keep = base_x * base_x + base_y * base_y <= reach * reach
+    base = np.stack([base_x[keep], base_y[keep]], axis=1)
+
+    prepared = prep(polygon)
+    unit_a = np.array([pitch, 0.0])
+    unit_b = np.array([pitch / 2, row_height])
+    best = np.zeros(shape=(0, 2))
+    n_candidates = 0
+    lattices = list(
+        itertools.product(
+            np.arange(n_rotations) * (np.pi / 3) / n_rotations,
+            range(n_offsets),
+            range(n_offsets),
+        )
+    )
+    for n_tried, (angle, i, j) in enumerate(lattices):
+        if n_tried and _past(deadline):
+            return (
+                best,
+                PlacementStats(STOP_DEADLINE, n_candidates, n_tried / len(lattices)),
+            )
+        cos, sin = np.cos(angle), np.sin(angle)
+        rotation = np.array([[cos, sin], [-sin, cos]])
+        offset = (i * unit_a + j * unit_b) / n_offsets
+        candidate = (base + offset) @ rotation + center
+        in_bounds = (
+            (candidate[:, 0] >= minx)
+            & (candidate[:, 0] <= maxx)
+            & (candidate[:, 1] >= miny)
+            & (candidate[:, 1] <= maxy)
+        )
+        candidate = candidate[in_bounds]
+        if candidate.shape[0] <= best.shape[0]:
+            continue
+        n_candidates += candidate.shape[0]
+        mask = shapely.vectorized.contains(prepared, candidate[:, 0], candidate[:, 1])
+        if obstacles is not None and np.count_nonzero(mask) > best.shape[0]:
+            mask[mask] = ~obstacles.blocked(candidate[mask])
+        if np.count_nonzero(mask) > best.shape[0]:
+            best = candidate[mask]
 
-    filtered = random_arr[mask, :]
-    pts = np.zeros(shape=filtered.shape)
-    accept, pts = random_disk_insertion(iters, pts, filtered, r)
-    return pts[:accept, :]
+    return best, PlacementStats(STOP_COMPLETE, n_candidates)
+
+
+def place_disks(
+    polygon: Polygon,
+    social_distance: float,
+    algorithm: str = RANDOM_ALGORITHM,
+    deadline: Optional[float] = None,
+    seed: Seed = None,
+    point_obstacles: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, PlacementStats]:
+    """Populate a polygon with disks using one of the placement algorithms.
+
+    Point obstacles, and for random insertion the holes of polygons with many
+    of them, are kept in an `ObstacleIndex`, see `obstacle_region`.
+
+    :param polygon: polygon to populate, in meters.
+    :param social_distance: disk radius in meters.
+    :param algorithm: placement algorithm, one of `ALGORITHMS`.
+    :param deadline: `time.monotonic` value at which to stop, None for no deadline.
+    :param seed: seed of the random generator, the same seed gives the same disks.
+    :param point_obstacles: nx3-array of x, y and radius of point obstacles.
+    :returns: numpy nx2-array of floats, and why and after how many candidates
+        placement stopped.
+    """
+    if _past(deadline):
+        return np.zeros(shape=(0, 2)), PlacementStats(STOP_DEADLINE, 0, 0.0)
+    rng = np.random.default_rng(seed)
+    if algorithm in (POISSON_ALGORITHM, HEXAGONAL_ALGORITHM):
+        # their containment checks are cheaper against the prepared polygon.
+        region, obstacles = obstacle_region(polygon, point_obstacles, math.inf)
+    else:
+        region, obstacles = obstacle_region(
+            polygon, point_obstacles, OBSTACLE_INDEX_MIN_HOLES
+        )
+    if algorithm == POISSON_ALGORITHM:
+        return poisson_disk_sampling(
+            region, r=social_distance, deadline=deadline, rng=rng, obstacles=obstacles
+        )
+    if algorithm == HEXAGONAL_ALGORITHM:
+        return hexagonal_lattice_packing(
+            region, r=social_distance, deadline=deadline, obstacles=obstacles
+        )
+
+    max_candidates = round(
+        MAX_CANDIDATES_FACTOR * polygon.area / (social_distance * social_distance)
+    )
+    # Random insertion of disks in polygon -- returns disks' centers coordinates
+    return stream_disk_insertion(
+        region,
+        r=social_distance,
+        max_candidates=max_candidates,
+        deadline=deadline,
+        rng=rng,
+        obstacles=obstacles,
+    )
+
+
+def merge_placement_stats(
+    stats: Iterable[PlacementStats], weights: Optional[Iterable[float]] = None
+) -> PlacementStats:
+    """Combine the placement stats of several parts of a polygon.
+
+    :param stats: stats of every part.
+    :param weights: weight of every part in the completed fraction, e.g. their
+        areas. None weighs all parts equally.
+    :return: the summed candidates, the weighted completed fraction and the
+        first reason of `STOP_REASON_PRIORITY` that any part stopped for.
+    """
+    stats = list(stats)
+    weights = [1.0] * len(stats) if weights is None else list(weights)
+    reasons = {part.stop_reason for part in stats}
+    stop_reason = next(
+        (reason for reason in STOP_REASON_PRIORITY if reason in reasons),
+        STOP_COMPLETE,
+    )
+    total_weight = sum(weights)
+    completed = (
+        sum(part.completed * weight for part, weight in zip(stats, weights))
+        / total_weight
+        if total_weight > 0
+        else 1.0
+    )
+    return PlacementStats(
+        stop_reason, sum(part.n_candidates for part in stats), completed
+    )
+
+
+def _spawn_seeds(seed: Seed, n: int) -> List[np.random.SeedSequence]:
+    """n independent seeds derived from seed."""
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return seed.spawn(n)
+
+
+def split_into_tiles(polygon: Polygon, tile_size: float) -> List[Polygon]:
+    """Cut a polygon along a square grid anchored at its lower left bound.
+
+    :param polygon: polygon to split, in meters.
+    :param tile_size: side of the grid cells, in meters.
+    :return: the non-empty parts of the polygon, one per grid cell.
+    """
+    if polygon.is_empty:
+        return []
+    minx, miny, maxx, maxy = polygon.bounds
+    tiles = []
+    for x in np.arange(minx, maxx, tile_size):
+        for y in np.arange(miny, maxy, tile_size):
+            tile = polygon.intersection(box(x, y, x + tile_size, y + tile_size))
+            if not tile.is_empty and tile.area > 0:
+                tiles.append(tile)
+    return tiles
+
+
+def reconcile_tile_seams(
+    tile_centers: Iterable[np.ndarray],
+    origin: Tuple[float, float],
+    tile_size: float,
+    r: float,
+) -> np.ndarray:
+    """Merge the disk centers of independently filled tiles.
+
+    Two disks from different tiles can only conflict when both lie within 2r
+    of a grid line, so only those seam disks are checked again. Earlier tiles
+    win conflicts.
+
+    :param tile_centers: nx2-arrays of disk centers, one per tile.
+    :param origin: anchor of the tile grid.
+    :param tile_size: side of the grid cells, in meters.
+    :param r: disk radius.
+    :returns: numpy nx2-array of floats.
+    """
+    centers = np.concatenate([np.zeros(shape=(0, 2))] + list(tile_centers))
+    offset = (centers - origin) % tile_size
+    near_seam = ((offset <= 2 * r) | (offset >= tile_size - 2 * r)).any(axis=1)
+    seam = centers[near_seam]
+    pts = np.empty(shape=seam.shape)
+    accept, pts = grid_disk_insertion(seam.shape[0], pts, seam, r)
+    return np.concatenate([centers[~near_seam], pts[:accept]])
+
+
+def tiled_placement(
+    polygon: Polygon,
+    social_distance: float,
+    algorithm: str = RANDOM_ALGORITHM,
+    tile_size: float = TILE_SIZE,
+    map_func: Callable[..., Iterator[Tuple[np.ndarray, PlacementStats]]] = map,
+    deadline: Optional[float] = None,
+    seed: Seed = None,
+    point_obstacles: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, PlacementStats]:
+    """Populate a large polygon tile by tile.
+
+    Tiles that start after the deadline stay empty. Every tile gets its own
+    seed spawned from seed, so the result does not depend on which process
+    fills which tile.
+
+    :param polygon: polygon to populate, in meters.
+    :param social_distance: disk radius in meters.
+    :param algorithm: placement algorithm used within each tile.
+    :param tile_size: side of a square tile, in meters.
+    :param map_func: map implementation used to fill the tiles, e.g. the
+        map of a process pool to fill them in parallel.
+    :param deadline: `time.monotonic` value at which to stop, None for no deadline.
+    :param seed: seed of the random generators.
+    :param point_obstacles: nx3-array of x, y and radius of point obstacles.
+    :returns: numpy nx2-array of floats, and the merged placement stats.
+    """
+    if polygon.is_empty:
+        return np.zeros(shape=(0, 2)), PlacementStats(STOP_COMPLETE, 0)
+    minx, miny, _, _ = polygon.bounds
+    tiles = split_into_tiles(polygon, tile_size)
+    tile_results = list(
+        map_func(
+            place_disks,
+            tiles,
+            itertools.repeat(social_distance),
+            itertools.repeat(algorithm),
+            itertools.repeat(deadline),
+            _spawn_seeds(seed, len(tiles)),
+            itertools.repeat(point_obstacles),
+        )
+    )
+    centers = reconcile_tile_seams(
+        [tile_centers for tile_centers, _ in tile_results],
+        (minx, miny),
+        tile_size,
+        social_distance,
+    )
+    return centers, merge_placement_stats(
+        (stats for _, stats in tile_results), (tile.area for tile in tiles)
+    )
+
+
+def _placement(
+    polygon: Polygon,
+    social_distance: float,
+    algorithm: str,
+    seed: Seed = None,
+    map_func: Callable[..., Iterator[Tuple[np.ndarray, PlacementStats]]] = map,
+    deadline: Optional[float] = None,
+    point_obstacles: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, PlacementStats]:
+    """One placement run, tiled when the polygon is larger than `TILE_THRESHOLD`."""
+    if polygon.area > TILE_THRESHOLD:
+        return tiled_placement(
+            polygon,
+            social_distance,
+            algorithm,
+            map_func=map_func,
+            deadline=deadline,
+            seed=seed,
+            point_obstacles=point_obstacles,
+        )
+    return place_disks(
+        polygon,
+        social_distance,
+        algorithm,
+        deadline=deadline,
+        seed=seed,
+        point_obstacles=point_obstacles,
+    )
+
+
+def best_of_placements(
+    polygon: Polygon,
+    social_distance: float,
+    algorithm: str = RANDOM_ALGORITHM,
+    n_runs: int = 1,
+    seed: Seed = None,
+    map_func: Callable[..., Iterator[Tuple[np.ndarray, PlacementStats]]] = map,
+    deadline: Optional[float] = None,
+    point_obstacles: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, PlacementStats]:
+    """Run n_runs independently seeded placements and keep the fullest.
+
+    The runs are distributed with map_func, the tiles of each run are then
+    filled one after the other. Algorithms that are not randomized give the
+    same result every run and only run once.
+
+    :param polygon: polygon to populate, in meters.
+    :param social_distance: disk radius in meters.
+    :param algorithm: placement algorithm, one of `ALGORITHMS`.
+    :param n_runs: number of placements to run.
+    :param seed: seed from which the seed of every run is spawned.
+    :param map_func: map implementation used to run the placements, e.g. the
+        map of a process pool to run them in parallel.
+    :param deadline: `time.monotonic` value at which to stop, None for no deadline.
+    :param point_obstacles: nx3-array of x, y and radius of point obstacles.
+    :returns: numpy nx2-array of floats of the run with the most disks, and its
+        placement stats with the min, mean and max number of disks over all runs.
+    """
+    if n_runs <= 1 or algorithm not in RANDOMIZED_ALGORITHMS:
+        return _placement(
+            polygon,
+            social_distance,
+            algorithm,
+            seed,
+            map_func,
+            deadline=deadline,
+            point_obstacles=point_obstacles,
+        )
+
+    runs = list(
+        map_func(
+            functools.partial(
+                _placement,
+                polygon,
+                social_distance,
+                algorithm,
+                deadline=deadline,
+                point_obstacles=point_obstacles,
+            ),
+            _spawn_seeds(seed, n_runs),
+        )
+    )
+    counts = [centers.shape[0] for centers, _ in runs]
+    disk_centers, placement = runs[int(np.argmax(counts))]
+    return disk_centers, dataclasses.replace(
+        placement,
+        n_runs=n_runs,
+        min_humans=min(counts),
+        mean_humans=float(np.mean(counts)),
+        max_humans=max(counts),
+    )
+
+
+def _split_buffer_zone(
+    polygon: Polygon, buffer_zone_size: Optional[float]
+) -> Tuple[Polygon, Optional[Polygon]]:
+    """The part of polygon people may stand in, and the buffer zone around it."""
+    # If buffer zone is activated, generate buffer zone and substract it
+    #  to initial polygon
+    if buffer_zone_size is None:
+        return polygon, None
+    outer_polygon = polygon.boundary.buffer(buffer_zone_size)
+    return polygon.difference(outer_polygon), outer_polygon
+
+
+def _grow_point_obstacles(
+    point_obstacles: Optional[np.ndarray], buffer_zone_size: Optional[float]
+) -> Optional[np.ndarray]:
+    if point_obstacles is None or buffer_zone_size is None:
+        return point_obstacles
+    grown = np.array(point_obstacles, dtype=float).reshape(-1, 3)
+    grown[:, 2] += buffer_zone_size
+    return grown
 
 
 def calculate(
     polygon: Polygon,
     social_distance: float = 1.5,
     buffer_zone_size: Optional[float] = None,
+    algorithm: str = RANDOM_ALGORITHM,
+    map_func: Callable[..., Iterator[Tuple[np.ndarray, PlacementStats]]] = map,
+    time_budget: Optional[float] = None,
+    seed: Seed = None,
+    n_runs: int = 1,
+    point_obstacles: Optional[np.ndarray] = None,
 ) -> CalculationResult:
     """Do the math
 
+    Areas larger than `TILE_THRESHOLD` are split into tiles. With a time
+    budget, placement stops when it runs out and the people placed so far are
+    returned, their placement stats are flagged partial. With several runs the
+    fullest of n_runs seeded placements is returned, see `best_of_placements`.
+
     :param polygon: Polygon with coordinates in meters.
     :param social_distance: social distance in meters
     :param buffer_zone_size: size of buffer zone in meters.
+    :param algorithm: placement algorithm, one of `ALGORITHMS`.
+    :param map_func: map implementation used to fill tiles, or to run the
+        placements when there are several.
+    :param time_budget: seconds placement may take, None for no limit.
+    :param seed: seed of the placement, the same seed gives the same result.
+    :param n_runs: number of placements to keep the best of.
+    :param point_obstacles: nx3-array of x, y and radius of point obstacles,
+        e.g. trees, which people keep clear of like holes of polygon. The
+        buffer zone grows their radius.
+    :raises: UnknownAlgorithm, when algorithm is not one of `ALGORITHMS`.
     :return: n_points, coordinates
     """
-    # If buffer zone is activated, generate buffer zone and substract it
-    #  to initial polygon
-    if buffer_zone_size is not None:
-        outer_polygon = polygon.boundary.buffer(buffer_zone_size)
-        inner_polygon = polygon.difference(outer_polygon)
-    else:
-        inner_polygon = polygon
-        outer_polygon = None
+    if algorithm not in ALGORITHMS:
+        raise UnknownAlgorithm(f"Unknown placement algorithm {algorithm!r}")
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    inner_polygon, outer_polygon = _split_buffer_zone(polygon, buffer_zone_size)
+
+    disk_centers, placement = best_of_placements(
+        inner_polygon,
+        social_distance,
+        algorithm,
+        n_runs=n_runs,
+        seed=seed,
+        map_func=map_func,
+        deadline=deadline,
+        point_obstacles=_grow_point_obstacles(point_obstacles, buffer_zone_size),
+    )
+
+    return CalculationResult(disk_centers, inner_polygon, outer_polygon, placement)
 
-    # Estimate n_iters
-    n_iters = round(
-        min(20 * (inner_polygon.area / (social_distance * social_distance)), 500000)
+
+def refill_placement(
+    centers: np.ndarray,
+    previous_polygon: Polygon,
+    polygon: Polygon,
+    r: float,
+    seed: Seed = None,
+    deadline: Optional[float] = None,
+    point_obstacles: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, PlacementStats]:
+    """Update the disks of a polygon after it was edited.
+
+    Only the disks in the part of previous_polygon that polygon lost are
+    dropped. The region polygon gained, and everything within 2r of a changed
+    boundary, is refilled by random insertion around the disks that were kept,
+    whichever algorithm placed them. The work scales with the size of the
+    edit rather than the size of the polygon.
+
+    :param centers: nx2-array of disk centers placed in previous_polygon.
+    :param previous_polygon: polygon centers were placed in, in meters.
+    :param polygon: the edited polygon, in meters.
+    :param r: disk radius.
+    :param seed: seed of the random generator used for the refill.
+    :param deadline: `time.monotonic` value at which to stop, None for no deadline.
+    :param point_obstacles: nx3-array of x, y and radius of point obstacles,
+        the same the centers were placed around.
+    :returns: numpy nx2-array of floats, and the placement stats of the refill.
+    """
+    removed = previous_polygon.difference(polygon)
+    kept = centers
+    if not removed.is_empty and centers.shape[0]:
+        minx, miny, maxx, maxy = removed.bounds
+        near = np.flatnonzero(
+            (centers[:, 0] >= minx)
+            & (centers[:, 0] <= maxx)
+            & (centers[:, 1] >= miny)
+            & (centers[:, 1] <= maxy)
+        )
+        inside = shapely.vectorized.contains(
+            polygon, centers[near, 0], centers[near, 1]
+        )
+        keep = np.ones(centers.shape[0], dtype=bool)
+        keep[near[~inside]] = False
+        kept = centers[keep]
+
+    changed = removed.union(polygon.difference(previous_polygon))
+    region = (
+        polygon.intersection(changed.buffer(2 * r))
+        if not changed.is_empty
+        else Polygon()
+    )
+    if region.is_empty or region.area == 0:
+        return kept, PlacementStats(STOP_COMPLETE, 0, refilled=0.0)
+
+    minx, miny, maxx, maxy = region.bounds
+    near_region = (
+        (kept[:, 0] >= minx - 2 * r)
+        & (kept[:, 0] <= maxx + 2 * r)
+        & (kept[:, 1] >= miny - 2 * r)
+        & (kept[:, 1] <= maxy + 2 * r)
+    )
+    max_candidates = round(MAX_CANDIDATES_FACTOR * region.area / (r * r))
+    region, obstacles = obstacle_region(
+        region, point_obstacles, OBSTACLE_INDEX_MIN_HOLES
+    )
+    added, placement = stream_disk_insertion(
+        region,
+        r=r,
+        max_candidates=max_candidates,
+        deadline=deadline,
+        rng=np.random.default_rng(seed),
+        fixed=kept[near_region],
+        obstacles=obstacles,
+    )
+    return (
+        np.concatenate([kept, added]),
+        dataclasses.replace(placement, refilled=region.area),
     )
-    # Random insertion of disks in polygon -- returns disks' centers coordinates
-    disk_centers = populate_square(inner_polygon, iters=n_iters, r=social_distance)
 
-    # Convert to disk polygons
-    disks = [Point(i[0], i[1]) for i in disk_centers]
 
-    return CalculationResult(len(disks), disks, inner_polygon, outer_polygon)
+def recalculate(
+    previous: CalculationResult,
+    polygon: Polygon,
+    social_distance: float = 1.5,
+    buffer_zone_size: Optional[float] = None,
+    time_budget: Optional[float] = None,
+    seed: Seed = None,
+    point_obstacles: Optional[np.ndarray] = None,
+) -> CalculationResult:
+    """Update a previous result of `calculate` after the polygon was edited.
 
+    The previous result must have been calculated with the same social
+    distance and point obstacles, see `refill_placement`.
 
-def calc_result_to_serializable(
-    calc_result: CalculationResult, coord_system: str, polygon_id: int
-) -> Dict[str, Any]:
-    points = metered_points_to_geojson(calc_result.points, coord_system, polygon_id)
-    inner_boundary = polygon_to_geojson(
-        calc_result.inner_polygon, coord_system, polygon_id
+    :param previous: result for the polygon before the edit.
+    :param polygon: Polygon with coordinates in meters.
+    :param social_distance: social distance in meters
+    :param buffer_zone_size: size of buffer zone in meters.
+    :param time_budget: seconds the refill may take, None for no limit.
+    :param seed: seed of the refill.
+    :param point_obstacles: nx3-array of x, y and radius of point obstacles.
+    :return: n_points, coordinates
+    """
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    inner_polygon, outer_polygon = _split_buffer_zone(polygon, buffer_zone_size)
+
+    disk_centers, placement = refill_placement(
+        previous.centers,
+        previous.inner_polygon,
+        inner_polygon,
+        social_distance,
+        seed=seed,
+        deadline=deadline,
+        point_obstacles=_grow_point_obstacles(point_obstacles, buffer_zone_size),
+    )
+
+    return CalculationResult(disk_centers, inner_polygon, outer_polygon, placement)
+
+
+def capacity_features(
+    polygon: Polygon,
+    buffer_zone_size: Optional[float] = None,
+    point_obstacles: Optional[np.ndarray] = None,
+    circle_holes: bool = True,
+) -> Tuple[float, float, int]:
+    """Area, perimeter and number of rings of the part of polygon people may
+    stand in, the inputs of `estimate_capacity`.
+
+    The buffer zone is usually not cut out, its effect follows from Steiner's
+    formula: every exterior ring moves inwards by buffer_zone_size and every
+    hole grows by as much. The formula only holds up to the inradius, beyond
+    which it grows again, so buffer zones of area / perimeter or more are cut
+    out of the polygon instead. Point obstacles count as circular holes,
+    overlaps are ignored. With circle_holes False they only take their area
+    away.
+    """
+    steiner_size = buffer_zone_size
+    if buffer_zone_size is not None and (
+        buffer_zone_size * polygon.length >= polygon.area
+    ):
+        polygon = polygon.buffer(-buffer_zone_size)
+        steiner_size = None
+    parts = getattr(polygon, "geoms", [polygon])
+    n_exteriors = sum(1 for part in parts if not part.is_empty)
+    n_holes = sum(len(part.interiors) for part in parts)
+    area = polygon.area
+    perimeter = polygon.length
+    if steiner_size is not None:
+        turns = 2 * math.pi * (n_exteriors - n_holes)
+        area = area - perimeter * steiner_size + turns * steiner_size**2 / 2
+        perimeter = perimeter - turns * steiner_size
+    grown = _grow_point_obstacles(point_obstacles, buffer_zone_size)
+    if grown is not None and len(grown):
+        radii = np.asarray(grown, dtype=float).reshape(-1, 3)[:, 2]
+        area -= math.pi * float(np.sum(radii * radii))
+        if circle_holes:
+            perimeter += 2 * math.pi * float(np.sum(radii))
+            n_holes += radii.shape[0]
+    return max(area, 0.0), max(perimeter, 0.0), n_exteriors + n_holes
+
+
+def estimate_capacity(
+    polygon: Polygon,
+    social_distance: float = 1.5,
+    buffer_zone_size: Optional[float] = None,
+    algorithm: str = RANDOM_ALGORITHM,
+    point_obstacles: Optional[np.ndarray] = None,
+) -> int:
+    """Estimate the n_humans `calculate` places, without placing anybody.
+
+    A packing density per area with corrections for the perimeter, where disk
+    centers pack more densely, and for every ring. The coefficients are in
+    `ESTIMATE_COEFFICIENTS`.
+
+    :param polygon: Polygon with coordinates in meters.
+    :param social_distance: social distance in meters
+    :param buffer_zone_size: size of buffer zone in meters.
+    :param algorithm: placement algorithm, one of `ALGORITHMS`.
+    :param point_obstacles: nx3-array of x, y and radius of point obstacles.
+    :raises: UnknownAlgorithm, when algorithm is not one of `ALGORITHMS`.
+    :return: estimated number of people.
+    """
+    if algorithm not in ALGORITHMS:
+        raise UnknownAlgorithm(f"Unknown placement algorithm {algorithm!r}")
+    # point obstacles are too small to shift a lattice, it only loses the
+    #  nodes they cover.
+    area, perimeter, rings = capacity_features(
+        polygon,
+        buffer_zone_size,
+        point_obstacles,
+        circle_holes=algorithm != HEXAGONAL_ALGORITHM,
     )
+    if area == 0:
+        return 0
+    a, b, c = ESTIMATE_COEFFICIENTS[algorithm]
+    r = social_distance
+    return max(0, round(a * area / (r * r) + b * perimeter / r + c * rings))
+
 
-    features = points + [inner_boundary]
+def calc_result_properties(calc_result: CalculationResult) -> Dict[str, Any]:
+    """n_humans and placement stats of a result, the properties of its
+    FeatureCollection.
+    """
+    properties: Dict[str, Any] = {"n_humans": calc_result.n_humans}
+    if calc_result.placement is not None:
+        properties["placement"] = dict(
+            dataclasses.asdict(calc_result.placement),
+            partial=calc_result.placement.partial,
+        )
+    return properties
 
+
+def calc_result_boundaries(
+    calc_result: CalculationResult, coord_system: str, polygon_id: int
+) -> List[Dict[str, Any]]:
+    """The inner boundary of a result and, with a buffer zone, its outer one."""
+    features = [polygon_to_geojson(calc_result.inner_polygon, coord_system, polygon_id)]
     if calc_result.outer_polygon is not None:
         features.append(
             polygon_to_geojson(
                 calc_result.outer_polygon, coord_system, polygon_id, inner=False
             )
         )
+    return features
+
+
+def calc_result_to_serializable(
+    calc_result: CalculationResult, coord_system: str, polygon_id: int
+) -> Dict[str, Any]:
+    points = metered_centers_to_geojson(calc_result.centers, coord_system, polygon_id)
+    features = points + calc_result_boundaries(calc_result, coord_system, polygon_id)
 
     return {
         "type": "FeatureCollection",
         "features": features,
-        "properties": {"n_humans": calc_result.n_humans},
+        "properties": calc_result_properties(calc_result),
     }
 
 
-if __name__ == "__main__":
-    import matplotlib.pyplot as plt
+def warm_up() -> None:
+    """Do the one-off work the first request would otherwise wait for.
 
-    # Generate polygon
-    pts_ext = [(0, 0), (0, 50), (50, 50), (50, 0), (0, 0)]
-    pts_int = [(25, 0), (12.5, 12.5), (25, 25), (37.5, 12.5), (25, 0)][::-1]
-    polygon = Polygon(pts_ext, [pts_int])
-
-    # Random insertion of disks in polygon -- returns disks' centers coordinates
-    disk_centers = populate_square(polygon, iters=30000)
-    # Convert to disk polygons
-    disks = [Point(i[0], i[1]).buffer(1) for i in disk_centers]
-
-    # Plotting
-    fig = plt.figure(1, figsize=(10, 4), dpi=180)
-    ax = fig.add_subplot(121, aspect="equal")
-
-    plot_coords(ax, polygon.interiors[0])
-    plot_coords(ax, polygon.exterior)
-    patch = PolygonPatch(polygon, facecolor=BLUE, edgecolor=GRAY, alpha=0.5, zorder=2)
-    ax.add_patch(patch)
-    ax.set_title("No boundary")
-
-    for i, disk in enumerate(disks):
-        # plot_coords(ax, disk_centers[i])
-        patch = PolygonPatch(disk, facecolor=RED, edgecolor=GRAY, alpha=0.5, zorder=2)
-        ax.add_patch(patch)
-
-    # Generate polygon boundary
-    boundary = polygon.boundary.buffer(5)
-
-    # Random insertion of disks in polygon with boundary zone substracted
-    #  -- returns disks' centers coordinates
-    disk_centers = populate_square(polygon.difference(boundary), iters=30000)
-    # Convert to disk polygons
-    disks = [Point(i[0], i[1]).buffer(1) for i in disk_centers]
-
-    # Plotting
-    fig = plt.figure(1, figsize=(10, 4), dpi=180)
-    ax = fig.add_subplot(122, aspect="equal")
-
-    plot_coords(ax, polygon.interiors[0])
-    plot_coords(ax, polygon.exterior)
-    patch = PolygonPatch(polygon, facecolor=BLUE, edgecolor=GRAY, alpha=0.5, zorder=2)
-    ax.add_patch(patch)
-    patch_b = PolygonPatch(
-        boundary.intersection(polygon),
-        facecolor=GREEN,
-        edgecolor=GRAY,
-        alpha=0.5,
-        zorder=2,
-    )
-    ax.add_patch(patch_b)
-
-    for i, disk in enumerate(disks):
-        # plot_coords(ax, disk_centers[i])
-        patch = PolygonPatch(disk, facecolor=RED, edgecolor=GRAY, alpha=0.5, zorder=2)
-        ax.add_patch(patch)
-    ax.set_title("With Boundary")
-    plt.show()
+    Builds every transformer and calculates a small square with every
+    algorithm. Called in the gunicorn master, see `web_app.gunicorn_conf`,
+    the workers forked from it share the result copy-on-write.
+    """
+    for mapping in (TRANSFORMER_MAPPING, REVERSE_TRANSFORMER_MAPPING):
+        list(mapping.values())
+    coordinate_system, region = next(iter(BOUNDING_BOX_MAP.items()))
+    origin = region.centroid
+    x, y = TRANSFORMER_MAPPING[coordinate_system].transform(origin.x, origin.y)
+    for algorithm in ALGORITHMS:
+        result = calculate(box(x, y, x + 10, y + 10), algorithm=algorithm, seed=0)
+        calc_result_to_serializable(result, coordinate_system, 0)
@@ -46,113 +46,279 @@ Example input to calculate endpoint:
 }
 """
 
+import json
+from typing import Optional
+
 import flask
 
-from .algorithm import (
-    MAX_SUPPORTED_SIZE,
-    calc_result_to_serializable,
-    calculate,
-    correct_line_intersection,
-    create_composite_polygon,
-    multi_convert_to_meter_system,
-    polygons_from_geojson_features,
+from .binary import MEDIA_TYPES
+from .cache import result_cache
+from .exceptions import InvalidRequest, QueueFull
+from .jobs import job_runner
+from .metrics import (
+    end_request,
+    finish_profiler,
+    metrics_store,
+    stage,
+    start_profiler,
+    start_request,
+)
+from .pipeline import (
+    MAX_BATCH_SIZE,
+    MAX_CALCULATION_TIME,
+    binary_calculation,
+    estimate_calculation,
+    prepare_calculation,
+    run_batch,
+    run_calculation,
+    stream_calculation,
 )
-from .exceptions import CoordSystemInconsistency, NotAPolygon, OutsideSupportedArea
 
 blueprint = flask.Blueprint("api", __name__)
 
+NDJSON = "application/x-ndjson"
+STREAM_FORMATS = ("geojson", "ndjson")
 
-@blueprint.route("/calculate", methods=["POST"])
-def calculate_endpoint():
-    """Endpoint that receives a GEOJSON encoded polygon (or list of polygons).
 
-    Returns a GeoJSON encoded list of points.
+@blueprint.before_request
+def _start_timing():
+    flask.g.timings = start_request()
+    flask.g.profiler = start_profiler()
 
-    We expect the geojson coordinates to be encoded in WGS84 format.
 
-    :return:
+@blueprint.after_request
+def _server_timing(response: flask.Response) -> flask.Response:
+    """Report the stages of the request in a Server-Timing header and count it.
+
+    Streamed responses are sent after this, their serialization is only
+    counted in the stage histogram.
     """
+    timings = flask.g.timings
+    end_request()
+    seconds = timings.total
+    rule = flask.request.url_rule
+    endpoint = rule.rule if rule is not None else "unknown"
+    response.headers["Server-Timing"] = timings.header()
+    metrics_store.observe(
+        "web_app_request_duration_seconds",
+        seconds,
+        endpoint=endpoint,
+        status=str(response.status_code),
+    )
+    metrics_store.flush()
+    profile = finish_profiler(flask.g.profiler, seconds, flask.request.endpoint)
+    if profile is not None:
+        flask.current_app.logger.warning(
+            "%s took %.3f s, profiled in %s", endpoint, seconds, profile
+        )
+    return response
+
+
+def _job_response(job_id: str) -> flask.Response:
+    # the app redirects 404s to the front end, API clients want to see them.
+    job = job_runner.store.get(job_id)
+    if job is None:
+        response = flask.jsonify({"message": "Unknown job."})
+        response.status_code = 404
+        return response
+    return flask.jsonify(job)
+
+
+def _json_body():
     try:
-        body = flask.request.get_json()
+        with stage("parse"):
+            body = flask.request.get_json()
     except (TypeError, ValueError):
         flask.abort(400, "Request payload was not proper JSON.")
 
     if body is None:
         flask.abort(400, "Request body was not proper JSON")
+    return body
 
-    if "features" not in body:
-        flask.abort(400, "There is no 'features' element inside the request payload.")
 
-    all_polygons = [
-        item
-        for item in body["features"]
-        if item.get("geometry", {}).get("type") == "Polygon"
-    ]
+def _prepare_from_request(time_limit: Optional[float] = None):
+    try:
+        return prepare_calculation(_json_body(), time_limit)
+    except InvalidRequest as err:
+        flask.abort(400, str(err))
+
 
-    barrier_size: float = float(body.get("properties", {}).get("barrierSize", 0))
-    social_distance_radius: float = float(
-        body.get("properties", {}).get("personRadius", 1.5)
+def _response_format():
+    """Response format asked for: a stream format, a binary encoding, or None
+    for a plain JSON response.
+    """
+    stream_format = flask.request.args.get("stream")
+    if stream_format is not None:
+        if stream_format not in STREAM_FORMATS:
+            flask.abort(400, f"'stream' must be one of: {', '.join(STREAM_FORMATS)}.")
+        return stream_format
+    accepted = flask.request.accept_mimetypes.best_match(
+        ["application/json", NDJSON, *MEDIA_TYPES.values()]
     )
+    if accepted == NDJSON:
+        return "ndjson"
+    for encoding, media_type in MEDIA_TYPES.items():
+        if accepted == media_type:
+            return encoding
+    return None
 
-    if not all_polygons:
-        return flask.jsonify(
-            {
-                "type": "FeatureCollection",
-                "features": [],
-                "properties": {"n_humans": 0},
-            }
+
+@blueprint.route("/calculate", methods=["POST"])
+def calculate_endpoint():
+    """Endpoint that receives a GEOJSON encoded polygon (or list of polygons).
+
+    Returns a GeoJSON encoded list of points.
+
+    We expect the geojson coordinates to be encoded in WGS84 format.
+
+    Obstacles are Polygon features with ``"hole": true`` in their properties.
+    Point features with ``"hole": true`` and a ``"radius"`` in meters are
+    round obstacles, e.g. trees.
+
+    With ``?stream=geojson`` the same GeoJSON is streamed, with
+    ``?stream=ndjson`` or ``Accept: application/x-ndjson`` a FeatureCollection
+    without features is followed by one feature per line. Either way the
+    boundaries come first and the markers follow in chunks.
+
+    With ``Accept: application/x-markers-float32``, ``-float64`` or ``-delta``
+    the result is returned in the compact binary format of `web_app.binary`.
+
+    Placement stops after `MAX_CALCULATION_TIME` seconds, or the request's
+    timeBudgetMs if shorter, the result then has "partial" set in its
+    properties.
+
+    The Server-Timing header of the response holds the milliseconds spent
+    parsing, converting to meters, cleaning and merging the drawings, placing
+    the people and, unless streamed, serializing them. See `web_app.metrics`.
+
+    :return:
+    """
+    response_format = _response_format()
+    request = _prepare_from_request(MAX_CALCULATION_TIME)
+    if response_format is None:
+        result = run_calculation(request)
+        with stage("serialize"):
+            return flask.jsonify(result)
+    if response_format in MEDIA_TYPES:
+        return flask.Response(
+            binary_calculation(request, response_format),
+            mimetype=MEDIA_TYPES[response_format],
         )
 
-    main_polygons = [
-        polygon
-        for polygon in all_polygons
-        if not polygon.get("properties", {}).get("hole", False)
-    ]
-    hole_polygons = [
-        polygon
-        for polygon in all_polygons
-        if polygon.get("properties", {}).get("hole", False)
-    ]
+    ndjson = response_format == "ndjson"
+    return flask.Response(
+        stream_calculation(request, ndjson=ndjson),
+        mimetype=NDJSON if ndjson else "application/json",
+    )
 
-    # FIXME: only taking first one for now
+
+def _batch_from_request() -> list:
+    if flask.request.mimetype == NDJSON:
+        bodies = []
+        with stage("parse"):
+            for line in flask.request.get_data(as_text=True).splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    bodies.append(json.loads(line))
+                except ValueError:
+                    # reported as the error of this item.
+                    bodies.append(None)
+    else:
+        bodies = _json_body()
+        if not isinstance(bodies, list):
+            flask.abort(400, "Batch payload must be a list of FeatureCollections.")
+
+    if len(bodies) > MAX_BATCH_SIZE:
+        flask.abort(400, f"At most {MAX_BATCH_SIZE} items per batch are supported.")
+    return bodies
+
+
+@blueprint.route("/batch", methods=["POST"])
+def batch_endpoint():
+    """Endpoint that calculates many independent payloads of `calculate_endpoint`.
+
+    Takes a JSON list of FeatureCollections, or one FeatureCollection per line
+    with Content-Type application/x-ndjson. The items are calculated in
+    parallel and streamed back in order, one JSON object per line, holding the
+    item's index and either its result or its error.
+
+    :return:
+    """
+    bodies = _batch_from_request()
+    lines = (json.dumps(item) + "\n" for item in run_batch(bodies))
+    return flask.Response(lines, mimetype=NDJSON)
+
+
+@blueprint.route("/estimate", methods=["POST"])
+def estimate_endpoint():
+    """Endpoint that estimates n_humans for the same payload as
+    `calculate_endpoint`, fast enough to call on every edit of a drawing.
+
+    :return: estimated n_humans in total and per polygon id.
+    """
     try:
-        shapely_polygons = polygons_from_geojson_features(
-            main_polygons[0], hole_polygons
-        )
-    except NotAPolygon:
-        flask.abort(400, "You have drawn too few points.")
+        return flask.jsonify(estimate_calculation(_json_body()))
+    except InvalidRequest as err:
+        flask.abort(400, str(err))
+
+
+@blueprint.route("/jobs", methods=["POST"])
+def submit_job_endpoint():
+    """Endpoint that queues the same payload as `calculate_endpoint`.
 
-    polygon_id: int = main_polygons[0].get("properties", {}).get("id", 0)
+    The payload is validated right away, the calculation runs in the background.
 
+    :return: job id and status, with status code 202.
+    """
+    request = _prepare_from_request()
     try:
-        coord_system, metered_polygons = multi_convert_to_meter_system(shapely_polygons)
-    except OutsideSupportedArea:
-        flask.abort(
-            400,
-            (
-                "Your location unfortunately resides outside "
-                "supported area (most of Europe & Canary Islands)."
-            ),
-        )
-    except CoordSystemInconsistency:
-        flask.abort(400, "Obstacles were too far from the main area.")
+        job_id = job_runner.submit(request)
+    except QueueFull:
+        flask.abort(503, "Too many calculations are queued, try again later.")
 
-    cleaned_polygons = [
-        correct_line_intersection(metered_polygon.exterior.coords)
-        for metered_polygon in metered_polygons
-    ]
-    composite_polygon = create_composite_polygon(cleaned_polygons)
-    if composite_polygon.area > MAX_SUPPORTED_SIZE:
-        flask.abort(
-            400, "Your submitted area is larger than the maximum supported area."
-        )
+    response = flask.jsonify({"id": job_id, "status": "queued"})
+    response.status_code = 202
+    response.headers["Location"] = flask.url_for(".job_endpoint", job_id=job_id)
+    return response
 
-    calc_result = calculate(
-        composite_polygon,
-        social_distance=social_distance_radius,
-        buffer_zone_size=barrier_size if not barrier_size <= 0 else None,
-    )
 
-    serializer = calc_result_to_serializable(calc_result, coord_system, polygon_id)
+@blueprint.route("/jobs/<job_id>", methods=["GET"])
+def job_endpoint(job_id: str):
+    """Endpoint that reports status, progress and, once done, the result of a job.
 
-    return flask.jsonify(serializer)
+    :return:
+    """
+    return _job_response(job_id)
+
+
+@blueprint.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job_endpoint(job_id: str):
+    """Endpoint that cancels a queued or running job.
+
+    :return:
+    """
+    job_runner.cancel(job_id)
+    return _job_response(job_id)
+
+
+@blueprint.route("/cache", methods=["GET"])
+def cache_endpoint():
+    """Endpoint that reports the hit and miss counters of the result cache.
+
+    :return:
+    """
+    return flask.jsonify(result_cache.stats())
+
+
+def metrics_endpoint() -> flask.Response:
+    """Endpoint that reports request and stage durations and placement counters
+    of all workers, in the Prometheus text format.
+
+    Registered by the app at /metrics, where Prometheus looks for it.
+
+    :return:
+    """
+    return flask.Response(
+        metrics_store.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
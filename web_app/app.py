@@ -1,12 +1,13 @@
 import flask
 from flask_cors import CORS
 
-from .api import blueprint
+from .api import blueprint, metrics_endpoint
 
 app = flask.Flask(__name__)
 CORS(app)
 
 app.register_blueprint(blueprint, url_prefix="/api")
+app.add_url_rule("/metrics", view_func=metrics_endpoint)
 
 
 @app.route("/")
@@ -28,6 +29,13 @@ def handle_400(err) -> flask.Response:
     return response
 
 
+@app.errorhandler(503)
+def handle_503(err) -> flask.Response:
+    response = flask.jsonify({"message": err.description})
+    response.status_code = 503
+    return response
+
+
 @app.errorhandler(500)
 def handle_500(err) -> flask.Response:
     response = flask.jsonify({"message": err.description})
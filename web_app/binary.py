@@ -0,0 +1,159 @@
+"""Compact binary encoding of calculation results.
+
+A result is encoded as, all integers little-endian:
+
+* 4 bytes magic ``MRKR``, 1 byte format version, 1 byte marker encoding (see
+  `ENCODINGS`), 2 reserved bytes.
+* uint32 length of the header, followed by the header: UTF-8 JSON holding a
+  FeatureCollection with the result's properties and boundary features, the
+  number of markers of every polygon in marker order under "markers", and the
+  encoding under "encoding". It is padded with spaces, so the marker data
+  starts at a multiple of 8 bytes.
+* uint32 number of markers, then the marker data:
+
+  * ``float32`` / ``float64``: longitude, latitude pairs.
+  * ``delta``: the coordinates as integers in units of 1 / `DELTA_SCALE`
+    degrees (about a centimeter). Markers are sorted by bands of latitude and
+    then by longitude. Each integer is stored as the difference to the same
+    coordinate of the previous marker, zigzag-encoded into a LEB128 varint,
+    interleaving longitude and latitude.
+"""
+import json
+import struct
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+MAGIC = b"MRKR"
+VERSION = 1
+FLOAT32 = "float32"
+FLOAT64 = "float64"
+DELTA = "delta"
+ENCODINGS = (FLOAT32, FLOAT64, DELTA)
+MEDIA_TYPES = {encoding: f"application/x-markers-{encoding}" for encoding in ENCODINGS}
+
+DELTA_SCALE = 1e7
+# latitude band of the delta encoding in 1 / DELTA_SCALE degrees, about 2 m.
+DELTA_BAND = 200
+ALIGNMENT = 8
+
+_PREFIX = struct.Struct("<4sBB2xI")
+_COUNT = struct.Struct("<I")
+
+
+def _zigzag_varints(values: np.ndarray) -> bytes:
+    """LEB128 varints of zigzag-encoded int64 values, vectorized."""
+    zigzag = ((values << 1) ^ (values >> 63)).astype(np.uint64)
+    n_bytes = np.ones(zigzag.shape, dtype=np.int64)
+    for shift in range(7, 64, 7):
+        n_bytes += zigzag >= (np.uint64(1) << np.uint64(shift))
+    width = int(n_bytes.max()) if zigzag.size else 1
+    groups = np.stack(
+        [(zigzag >> np.uint64(7 * i)) & np.uint64(0x7F) for i in range(width)],
+        axis=1,
+    ).astype(np.uint8)
+    positions = np.arange(width)
+    groups[positions < n_bytes[:, np.newaxis] - 1] |= 0x80
+    return groups[positions < n_bytes[:, np.newaxis]].tobytes()
+
+
+def _from_zigzag_varints(data: bytes, count: int) -> np.ndarray:
+    values = np.empty(count, dtype=np.int64)
+    value = shift = index = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            values[index] = (value >> 1) ^ -(value & 1)
+            index += 1
+            value = shift = 0
+            if index == count:
+                break
+    return values
+
+
+def sort_for_delta(lonlat: np.ndarray) -> np.ndarray:
+    """Order in which the delta encoding stores markers, as indices into lonlat."""
+    fixed = np.round(lonlat * DELTA_SCALE).astype(np.int64)
+    return np.lexsort((fixed[:, 0], fixed[:, 1] // DELTA_BAND))
+
+
+def encode_markers(lonlat: np.ndarray, encoding: str) -> bytes:
+    """Marker data of the binary format, see the module docstring.
+
+    Markers keep their order, sort them with `sort_for_delta` first for the
+    delta encoding to be compact.
+
+    :param lonlat: numpy nx2-array of longitudes and latitudes.
+    :param encoding: one of `ENCODINGS`.
+    """
+    if encoding == FLOAT32:
+        return lonlat.astype("<f4").tobytes()
+    if encoding == FLOAT64:
+        return lonlat.astype("<f8").tobytes()
+    fixed = np.round(lonlat * DELTA_SCALE).astype(np.int64)
+    deltas = np.diff(fixed, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+    return _zigzag_varints(deltas.ravel())
+
+
+def encode_result(
+    header: Dict[str, Any], areas: List[Tuple[Any, np.ndarray]], encoding: str
+) -> bytes:
+    """Encode a result in the binary format.
+
+    :param header: FeatureCollection with the properties and the boundaries.
+    :param areas: polygon id and nx2-array of longitudes and latitudes of the
+        markers of every area.
+    :param encoding: one of `ENCODINGS`.
+    :return: the encoded result.
+    """
+    if encoding == DELTA:
+        areas = [
+            (polygon_id, lonlat[sort_for_delta(lonlat)]) for polygon_id, lonlat in areas
+        ]
+    lonlat = np.concatenate([np.zeros(shape=(0, 2))] + [pts for _, pts in areas])
+    header = dict(
+        header,
+        encoding=encoding,
+        markers=[
+            {"polygon_id": polygon_id, "count": int(pts.shape[0])}
+            for polygon_id, pts in areas
+        ],
+    )
+    header_bytes = json.dumps(header).encode()
+    header_bytes += b" " * (
+        -(_PREFIX.size + len(header_bytes) + _COUNT.size) % ALIGNMENT
+    )
+    return b"".join(
+        [
+            _PREFIX.pack(MAGIC, VERSION, ENCODINGS.index(encoding), len(header_bytes)),
+            header_bytes,
+            _COUNT.pack(lonlat.shape[0]),
+            encode_markers(lonlat, encoding),
+        ]
+    )
+
+
+def decode_result(data: bytes) -> Tuple[Dict[str, Any], np.ndarray]:
+    """Decode a result of `encode_result`.
+
+    :return: the header, and a numpy nx2-array of longitudes and latitudes.
+    :raises: ValueError, when data is not in the binary format.
+    """
+    magic, version, encoding_index, header_length = _PREFIX.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a binary result of a supported version.")
+    offset = _PREFIX.size
+    header = json.loads(data[offset : offset + header_length])
+    offset += header_length
+    (count,) = _COUNT.unpack_from(data, offset)
+    offset += _COUNT.size
+    encoding = ENCODINGS[encoding_index]
+    if encoding == FLOAT32:
+        lonlat = np.frombuffer(data, dtype="<f4", count=2 * count, offset=offset)
+    elif encoding == FLOAT64:
+        lonlat = np.frombuffer(data, dtype="<f8", count=2 * count, offset=offset)
+    else:
+        deltas = _from_zigzag_varints(data[offset:], 2 * count)
+        lonlat = np.cumsum(deltas.reshape(-1, 2), axis=0) / DELTA_SCALE
+    return header, lonlat.astype(float).reshape(-1, 2)
@@ -0,0 +1,292 @@
+"""Result cache shared by all workers on a host.
+
+Results of `calculate` are stored in a SQLite database keyed on a canonical
+hash of the metered composite polygon and the calculation parameters, so every
+gunicorn worker sees the hits of the others. Identical requests that arrive
+while a result is being computed wait for that result instead of computing it
+again.
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import shapely.wkb
+from shapely.geometry import MultiPolygon, Polygon
+from shapely.geometry.polygon import orient
+
+from .algorithm import CalculationResult, PlacementStats
+
+# set WEB_APP_CACHE_PATH to an empty string to disable the cache.
+CACHE_PATH = os.environ.get(
+    "WEB_APP_CACHE_PATH", os.path.join(tempfile.gettempdir(), "web_app_cache.sqlite3")
+)
+CACHE_MAX_ENTRIES = int(os.environ.get("WEB_APP_CACHE_MAX_ENTRIES", 1000))
+CACHE_TTL = float(os.environ.get("WEB_APP_CACHE_TTL", 3600))  # in seconds.
+
+# how long a worker may hold a computation before others stop waiting for it.
+COMPUTE_LEASE = 60.0  # in seconds.
+POLL_INTERVAL = 0.05  # in seconds.
+# share of its remaining time budget a request waits for another one's lease.
+LEASE_WAIT_SHARE = 0.5
+# metered coordinates are rounded to this many decimals, i.e. millimeters.
+KEY_PRECISION = 3
+
+# bump when the tables change, older caches are dropped.
+SCHEMA_VERSION = 3
+SCHEMA = """
+DROP TABLE IF EXISTS results;
+DROP TABLE IF EXISTS leases;
+DROP TABLE IF EXISTS counters;
+CREATE TABLE results (
+    key TEXT PRIMARY KEY,
+    centers BLOB NOT NULL,
+    inner_polygon BLOB NOT NULL,
+    outer_polygon BLOB,
+    placement TEXT,
+    params TEXT,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX results_accessed ON results (accessed);
+CREATE TABLE leases (key TEXT PRIMARY KEY, expires REAL NOT NULL);
+CREATE TABLE counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+def _canonical_ring(coords) -> list:
+    """Rounded ring coordinates, starting at the smallest vertex."""
+    ring = [(round(x, KEY_PRECISION), round(y, KEY_PRECISION)) for x, y in coords[:-1]]
+    start = ring.index(min(ring))
+    return ring[start:] + ring[:start]
+
+
+def _canonical_polygon(polygon: Polygon) -> list:
+    polygon = orient(polygon)
+    return [_canonical_ring(polygon.exterior.coords)] + sorted(
+        _canonical_ring(interior.coords) for interior in polygon.interiors
+    )
+
+
+def cache_key(polygon: Polygon, **params: Any) -> str:
+    """Canonical hash of a metered (multi)polygon and calculation parameters.
+
+    Polygons that only differ in ring orientation, starting vertex, order of
+    holes or parts, or below-millimeter noise get the same key.
+
+    :param polygon: composite polygon in meters.
+    :param params: calculation parameters, must be JSON serializable.
+    :return: hex digest.
+    """
+    parts = polygon.geoms if isinstance(polygon, MultiPolygon) else [polygon]
+    canonical = sorted(_canonical_polygon(part) for part in parts if not part.is_empty)
+    payload = json.dumps([canonical, params], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """SQLite backed cache of `CalculationResult`s.
+
+    :param path: database file, None disables the cache.
+    :param max_entries: number of results kept, least recently used go first.
+    :param ttl: seconds a result stays valid after it was computed.
+    """
+
+    def __init__(
+        self, path: Optional[str], max_entries: int = 1000, ttl: float = 3600.0
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _connection(self) -> sqlite3.Connection:
+        # connections must not cross threads, nor a fork of the gunicorn master.
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("BEGIN IMMEDIATE")
+            (version,) = connection.execute("PRAGMA user_version").fetchone()
+            if version != SCHEMA_VERSION:
+                for statement in SCHEMA.split(";"):
+                    connection.execute(statement)
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            connection.execute("COMMIT")
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    def _count(self, name: str) -> None:
+        self._connection().execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def lookup(
+        self, key: str
+    ) -> Optional[Tuple[CalculationResult, Optional[Dict[str, Any]]]]:
+        """Look up a result and the parameters it was stored with, None when
+        missing or expired.
+        """
+        if not self.enabled:
+            return None
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute(
+            "SELECT centers, inner_polygon, outer_polygon, placement, params "
+            "FROM results WHERE key = ? AND created > ?",
+            (key, now - self.ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        connection.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        centers, inner_polygon, outer_polygon, placement, params = row
+        result = CalculationResult(
+            np.frombuffer(centers, dtype=np.float64),
+            shapely.wkb.loads(bytes(inner_polygon)),
+            shapely.wkb.loads(bytes(outer_polygon)) if outer_polygon else None,
+            PlacementStats(**json.loads(placement)) if placement else None,
+        )
+        return result, json.loads(params) if params else None
+
+    def get(self, key: str) -> Optional[CalculationResult]:
+        """Look up a result, None when missing or expired."""
+        found = self.lookup(key)
+        return found[0] if found is not None else None
+
+    def set(
+        self,
+        key: str,
+        result: CalculationResult,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Store a result and evict expired and least recently used entries.
+
+        :param params: calculation parameters, must be JSON serializable.
+        """
+        if not self.enabled:
+            return
+        connection = self._connection()
+        now = time.time()
+        outer = result.outer_polygon
+        placement = result.placement
+        connection.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                result.centers.tobytes(),
+                result.inner_polygon.wkb,
+                outer.wkb if outer is not None else None,
+                json.dumps(dataclasses.asdict(placement)) if placement else None,
+                json.dumps(params) if params is not None else None,
+                now,
+                now,
+            ),
+        )
+        connection.execute("DELETE FROM results WHERE created <= ?", (now - self.ttl,))
+        connection.execute(
+            "DELETE FROM results WHERE key IN ("
+            "SELECT key FROM results ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def _acquire_lease(self, key: str) -> bool:
+        """Claim the computation of key for this worker, across processes."""
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "DELETE FROM leases WHERE key = ? AND expires <= ?", (key, now)
+            )
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO leases VALUES (?, ?)", (key, now + COMPUTE_LEASE)
+            )
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    def _release_lease(self, key: str) -> None:
+        self._connection().execute("DELETE FROM leases WHERE key = ?", (key,))
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], CalculationResult],
+        params: Optional[Dict[str, Any]] = None,
+        deadline: Optional[float] = None,
+    ) -> CalculationResult:
+        """Return the cached result for key, computing it at most once.
+
+        Concurrent callers with the same key, in this worker or another one,
+        wait for the first one to finish instead of computing too. Partial
+        results, cut short by a time budget, are returned but not stored.
+
+        A caller with a deadline waits at most `LEASE_WAIT_SHARE` of the time
+        it has left, then computes with the rest of it, without a lease.
+
+        :param params: calculation parameters stored with the result.
+        :param deadline: `time.monotonic` value the result is due at, None for
+            no limit.
+        """
+        if not self.enabled:
+            return compute()
+
+        wait_until = (
+            time.monotonic() + LEASE_WAIT_SHARE * max(0.0, deadline - time.monotonic())
+            if deadline is not None
+            else None
+        )
+        leased = False
+        while True:
+            result = self.get(key)
+            if result is not None:
+                self._count("hits")
+                return result
+            if self._acquire_lease(key):
+                leased = True
+                break
+            if wait_until is not None and time.monotonic() >= wait_until:
+                break
+            time.sleep(POLL_INTERVAL)
+
+        self._count("misses")
+        try:
+            result = compute()
+            if result.placement is None or not result.placement.partial:
+                self.set(key, result, params)
+        finally:
+            if leased:
+                self._release_lease(key)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit and miss counters and number of entries, over all workers."""
+        if not self.enabled:
+            return {"enabled": False, "hits": 0, "misses": 0, "entries": 0}
+        connection = self._connection()
+        counters = dict(connection.execute("SELECT name, value FROM counters"))
+        (entries,) = connection.execute("SELECT COUNT(*) FROM results").fetchone()
+        return {
+            "enabled": True,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "entries": entries,
+        }
+
+
+result_cache = ResultCache(CACHE_PATH, CACHE_MAX_ENTRIES, CACHE_TTL)
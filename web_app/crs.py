@@ -0,0 +1,184 @@
+"""Selection of the meter-based coordinate system drawings are calculated in.
+
+Drawings inside one of the `BOUNDING_BOX_MAP` regions use its coordinate
+system. Anywhere else the UTM zone of the drawing is
+used, or, near the poles or across several zones, a Lambert azimuthal
+equal-area projection centred on it, named ``laea:<lat>:<lon>``. All features
+of a request are resolved together, by one lookup of their bounds in a grid
+index of the regions. Transformers are built on first use and kept in a
+bounded LRU cache.
+"""
+import functools
+import math
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+import pyproj
+from shapely.geometry import Polygon
+
+from .exceptions import OutsideSupportedArea, TooLargeExtent
+
+# BOUNDING BOXES IN WGS84, by the coordinate system used inside them, the first
+#  containing a drawing wins.
+BOUNDING_BOX_MAP: Dict[str, Polygon] = {
+    "epsg:4083": Polygon(
+        [(-21.73, 24.6), (-21.73, 32.76), (-11.75, 32.76), (-11.75, 24.6)]
+    ),  # canaries, REGCAN95 / UTM zone 28N
+    "epsg:3035": Polygon(
+        [(-16.1, 32.88), (-16.1, 84.17), (40.18, 84.17), (40.18, 32.88)]
+    ),  # most of europe
+}
+# side of the cells of the region index, in degrees.
+REGION_CELL_SIZE = 1.0
+# UTM zones reach up to this latitude, beyond it drawings are projected locally.
+UTM_MAX_LATITUDE = 84.0
+# drawings outside the regions may span up to this many degrees of latitude, or
+#  as far along their parallel, more than any calculation supports.
+MAX_EXTENT = 5.0
+# local projections are centred on a grid of this many degrees, so drawings
+#  close to each other share a transformer.
+LOCAL_CENTER_STEP = 0.01
+# transformers kept, in either direction.
+TRANSFORMER_CACHE_SIZE = 64
+
+Bounds = Tuple[float, float, float, float]
+
+
+class RegionIndex:
+    """Grid of the regions of `BOUNDING_BOX_MAP` whose bounds reach each cell.
+
+    :param regions: region polygons by coordinate system, in order of preference.
+    :param cell_size: side of the grid cells, in degrees.
+    """
+
+    def __init__(
+        self, regions: Mapping[str, Polygon], cell_size: float = REGION_CELL_SIZE
+    ):
+        self.regions = dict(regions)
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], List[str]] = {}
+        for name, region in self.regions.items():
+            minx, miny, maxx, maxy = region.bounds
+            for i in range(self._cell(minx), self._cell(maxx) + 1):
+                for j in range(self._cell(miny), self._cell(maxy) + 1):
+                    self._cells.setdefault((i, j), []).append(name)
+
+    def _cell(self, value: float) -> int:
+        return math.floor(value / self.cell_size)
+
+    def lookup(self, bounds: Bounds) -> Optional[str]:
+        """The first region containing bounds, None when there is none."""
+        minx, miny, maxx, maxy = bounds
+        for name in self._cells.get((self._cell(minx), self._cell(miny)), []):
+            region_minx, region_miny, region_maxx, region_maxy = self.regions[
+                name
+            ].bounds
+            if (
+                region_minx < minx
+                and maxx < region_maxx
+                and region_miny < miny
+                and maxy < region_maxy
+            ):
+                return name
+        return None
+
+
+REGION_INDEX = RegionIndex(BOUNDING_BOX_MAP)
+
+
+def _union_bounds(polygons: Iterable[Polygon]) -> Bounds:
+    all_bounds = [polygon.bounds for polygon in polygons if not polygon.is_empty]
+    if not all_bounds:
+        raise OutsideSupportedArea("Cannot locate empty drawings.")
+    minxs, minys, maxxs, maxys = zip(*all_bounds)
+    return min(minxs), min(minys), max(maxxs), max(maxys)
+
+
+def utm_zone(lon: float, lat: float) -> str:
+    """Coordinate system of the WGS84 UTM zone of a location."""
+    zone = min(int((lon + 180) // 6) + 1, 60)
+    return f"epsg:{32600 + zone if lat >= 0 else 32700 + zone}"
+
+
+def local_projection(lon: float, lat: float) -> str:
+    """Coordinate system of a Lambert azimuthal equal-area projection near a
+    location.
+    """
+    step = LOCAL_CENTER_STEP
+    return f"laea:{round(lat / step) * step:.2f}:{round(lon / step) * step:.2f}"
+
+
+def select_coordinate_system(polygons: List[Polygon]) -> str:
+    """Pick one meter-based coordinate system for all features of a request.
+
+    :param polygons: polygons in WGS84.
+    :raises: OutsideSupportedArea, when the polygons are not valid WGS84.
+    :raises: TooLargeExtent, when the polygons span more than `MAX_EXTENT`
+        outside the regions, too far to share a coordinate system.
+    :return: name of the coordinate system.
+    """
+    bounds = _union_bounds(polygons)
+    minx, miny, maxx, maxy = bounds
+    if minx < -180 or maxx > 180 or miny < -90 or maxy > 90:
+        raise OutsideSupportedArea("Coordinates are not longitudes and latitudes.")
+    name = REGION_INDEX.lookup(bounds)
+    if name is not None:
+        return name
+    lon, lat = (minx + maxx) / 2, (miny + maxy) / 2
+    if (
+        maxy - miny > MAX_EXTENT
+        or (maxx - minx) * math.cos(math.radians(lat)) > MAX_EXTENT
+    ):
+        raise TooLargeExtent("Drawings span too large an area.")
+    zone = utm_zone(lon, lat)
+    if (
+        abs(lat) <= UTM_MAX_LATITUDE
+        and utm_zone(minx, lat) == zone
+        and utm_zone(maxx, lat) == zone
+    ):
+        return zone
+    return local_projection(lon, lat)
+
+
+def projection(coordinate_system: str) -> pyproj.CRS:
+    """The projection of a coordinate system picked by `select_coordinate_system`."""
+    if coordinate_system.startswith("laea:"):
+        _, lat, lon = coordinate_system.split(":")
+        return pyproj.CRS.from_proj4(
+            f"+proj=laea +lat_0={lat} +lon_0={lon} +datum=WGS84 +units=m +no_defs"
+        )
+    return pyproj.CRS.from_user_input(coordinate_system)
+
+
+@functools.lru_cache(maxsize=TRANSFORMER_CACHE_SIZE)
+def transformer(coordinate_system: str, reverse: bool = False) -> pyproj.Transformer:
+    """Transformer from WGS84, epsg:4326, to a coordinate system, or back.
+
+    Both sides take and give x before y, i.e. longitude before latitude and
+    easting before northing, whatever the axis order of the coordinate system.
+    Building one takes tens of milliseconds, so they are cached.
+    """
+    wgs84 = pyproj.CRS.from_epsg(4326)
+    metered = projection(coordinate_system)
+    if reverse:
+        return pyproj.Transformer.from_crs(metered, wgs84, always_xy=True)
+    return pyproj.Transformer.from_crs(wgs84, metered, always_xy=True)
+
+
+class TransformerMapping(Mapping[str, pyproj.Transformer]):
+    """Transformers of `transformer` by coordinate system.
+
+    Any coordinate system can be looked up, iteration only covers the regions
+    of `BOUNDING_BOX_MAP`.
+    """
+
+    def __init__(self, reverse: bool = False):
+        self.reverse = reverse
+
+    def __getitem__(self, coordinate_system: str) -> pyproj.Transformer:
+        return transformer(coordinate_system, self.reverse)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(BOUNDING_BOX_MAP)
+
+    def __len__(self) -> int:
+        return len(BOUNDING_BOX_MAP)
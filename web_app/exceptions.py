@@ -2,6 +2,10 @@ class CoordSystemInconsistency(ValueError):
     pass
 
 
+class TooLargeExtent(CoordSystemInconsistency):
+    pass
+
+
 class TooLargeArea(OverflowError):
     pass
 
@@ -12,3 +16,19 @@ class OutsideSupportedArea(LookupError):
 
 class NotAPolygon(ValueError):
     pass
+
+
+class UnknownAlgorithm(ValueError):
+    pass
+
+
+class InvalidRequest(ValueError):
+    pass
+
+
+class QueueFull(OverflowError):
+    pass
+
+
+class JobCancelled(RuntimeError):
+    pass
@@ -0,0 +1,22 @@
+"""Gunicorn settings of the API::
+
+    gunicorn --config python:web_app.gunicorn_conf web_app.app:app
+
+The app is imported and warmed up once in the master, before the workers are
+forked, so they share its memory copy-on-write and take traffic right away.
+"""
+import gc
+
+from web_app.algorithm import warm_up
+
+preload_app = True
+# seconds a sync worker may spend on one request, batches stream for up to
+#  web_app.pipeline.MAX_BATCH_TIME.
+timeout = 120
+
+
+def when_ready(server):
+    warm_up()
+    # keep the warmed-up objects out of the collector, whose bookkeeping would
+    #  otherwise copy their pages into every worker.
+    gc.freeze()
@@ -0,0 +1,329 @@
+"""Background calculation jobs.
+
+Jobs run on a small process pool owned by each gunicorn worker, so long
+calculations no longer hold an HTTP worker. Job state lives in a SQLite
+database shared by all workers: any worker can report on or cancel any job.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from .algorithm import placement_interrupt
+from .exceptions import JobCancelled, QueueFull
+from .metrics import metrics_store
+from .pipeline import CalculationRequest, run_calculation
+
+JOBS_PATH = os.environ.get(
+    "WEB_APP_JOBS_PATH", os.path.join(tempfile.gettempdir(), "web_app_jobs.sqlite3")
+)
+# processes per gunicorn worker.
+JOB_WORKERS = int(os.environ.get("WEB_APP_JOB_WORKERS", 2))
+# queued and running jobs over all workers.
+MAX_PENDING_JOBS = int(os.environ.get("WEB_APP_MAX_PENDING_JOBS", 16))
+# finished jobs are forgotten after this many seconds.
+JOB_TTL = 24 * 3600.0
+# seconds between checks of a running job for its cancellation, each check
+#  also beats the job's heartbeat.
+CANCEL_POLL_INTERVAL = 0.5
+# running jobs without a heartbeat for this many seconds have lost their process.
+JOB_HEARTBEAT_TIMEOUT = 60.0
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+PENDING_STATUSES = (QUEUED, RUNNING)
+
+# bump when the table changes, older databases are dropped.
+SCHEMA_VERSION = 1
+SCHEMA = """
+DROP TABLE IF EXISTS jobs;
+CREATE TABLE jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    owner INTEGER NOT NULL
+);
+"""
+ABANDONED_ERROR = "The calculation stopped unexpectedly."
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _abandoned(status: str, updated: float, owner: int, now: float) -> bool:
+    """Whether a job will never finish: the gunicorn worker that queued it is
+    gone, or it is running without a heartbeat.
+    """
+    if status not in PENDING_STATUSES:
+        return False
+    if status == RUNNING and updated <= now - JOB_HEARTBEAT_TIMEOUT:
+        return True
+    return not _process_exists(owner)
+
+
+class JobStore:
+    """SQLite backed job states, shared between processes.
+
+    :param path: database file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # connections must not cross threads, nor a fork of the gunicorn master.
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("BEGIN IMMEDIATE")
+            (version,) = connection.execute("PRAGMA user_version").fetchone()
+            if version != SCHEMA_VERSION:
+                for statement in SCHEMA.split(";"):
+                    connection.execute(statement)
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            connection.execute("COMMIT")
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    def create(self, max_pending: int) -> str:
+        """Register a new queued job, owned by the current process.
+
+        Abandoned jobs, see `_abandoned`, fail first, so they do not count as
+        pending.
+
+        :raises: QueueFull, when max_pending jobs are queued or running already.
+        :return: job id.
+        """
+        connection = self._connection()
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "DELETE FROM jobs WHERE status NOT IN (?, ?) AND updated <= ?",
+                PENDING_STATUSES + (now - JOB_TTL,),
+            )
+            abandoned = [
+                (FAILED, now, ABANDONED_ERROR, pending_id)
+                for pending_id, *state in connection.execute(
+                    "SELECT id, status, updated, owner FROM jobs "
+                    "WHERE status IN (?, ?)",
+                    PENDING_STATUSES,
+                ).fetchall()
+                if _abandoned(*state, now)
+            ]
+            connection.executemany(
+                "UPDATE jobs SET status = ?, updated = ?, error = ? WHERE id = ?",
+                abandoned,
+            )
+            (pending,) = connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", PENDING_STATUSES
+            ).fetchone()
+            if pending >= max_pending:
+                raise QueueFull(f"{pending} jobs are pending already.")
+            connection.execute(
+                "INSERT INTO jobs VALUES (?, ?, 0, NULL, NULL, ?, ?, ?)",
+                (job_id, QUEUED, now, now, os.getpid()),
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """State of a job, None when it is unknown. Abandoned jobs fail."""
+        row = (
+            self._connection()
+            .execute(
+                "SELECT status, progress, result, error, updated, owner FROM jobs "
+                "WHERE id = ?",
+                (job_id,),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        status, progress, result, error, updated, owner = row
+        if _abandoned(status, updated, owner, time.time()):
+            try:
+                self.update(job_id, FAILED, error=ABANDONED_ERROR)
+                status, error = FAILED, ABANDONED_ERROR
+            except JobCancelled:
+                return self.get(job_id)
+        return {
+            "id": job_id,
+            "status": status,
+            "progress": progress,
+            "result": json.loads(result) if result is not None else None,
+            "error": error,
+        }
+
+    def update(self, job_id: str, status: str, **values: Any) -> None:
+        """Move a pending job to status, unless it was cancelled meanwhile.
+
+        :raises: JobCancelled, when the job was cancelled.
+        """
+        columns = "".join(f", {column} = ?" for column in values)
+        cursor = self._connection().execute(
+            f"UPDATE jobs SET status = ?, updated = ?{columns} "
+            "WHERE id = ? AND status IN (?, ?)",
+            (status, time.time(), *values.values(), job_id) + PENDING_STATUSES,
+        )
+        if cursor.rowcount == 0:
+            raise JobCancelled(job_id)
+
+    def beat(self, job_id: str) -> bool:
+        """Beat the heartbeat of a running job, False when it is not running."""
+        cursor = self._connection().execute(
+            "UPDATE jobs SET updated = ? WHERE id = ? AND status = ?",
+            (time.time(), job_id, RUNNING),
+        )
+        return cursor.rowcount == 1
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a pending job, False when it is unknown or finished already."""
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = ?, updated = ? WHERE id = ? AND status IN (?, ?)",
+            (CANCELLED, time.time(), job_id) + PENDING_STATUSES,
+        )
+        return cursor.rowcount == 1
+
+
+def _watch_cancellation(
+    store: JobStore, job_id: str, finished: threading.Event
+) -> None:
+    """Beat the heartbeat of a running job, and interrupt the placements of
+    this process once it is no longer running, e.g. cancelled.
+    """
+    while not finished.wait(CANCEL_POLL_INTERVAL):
+        if not store.beat(job_id):
+            placement_interrupt.set()
+            return
+
+
+def _run_job(path: str, job_id: str, request: Optional[CalculationRequest]) -> None:
+    """Job process entry point, every state change goes through the store.
+
+    The areas and tiles of a job are calculated one after the other in its
+    process, the job pool already takes the cores it is given. A cancelled job
+    stops placing people within `CANCEL_POLL_INTERVAL`.
+    """
+    store = JobStore(path)
+    finished = threading.Event()
+    watcher = threading.Thread(
+        target=_watch_cancellation, args=(store, job_id, finished), daemon=True
+    )
+    try:
+        store.update(job_id, RUNNING, progress=0.1)
+        watcher.start()
+        result = run_calculation(
+            request,
+            progress=lambda done: store.update(job_id, RUNNING, progress=done),
+            parallel=False,
+        )
+        store.update(job_id, DONE, progress=1.0, result=json.dumps(result))
+    except JobCancelled:
+        pass
+    except Exception:
+        store.update(job_id, FAILED, error="The calculation failed.")
+        raise
+    finally:
+        finished.set()
+        if watcher.is_alive():
+            watcher.join()
+        placement_interrupt.clear()
+        metrics_store.flush()
+
+
+class JobRunner:
+    """Submit calculations to the process pool of this worker.
+
+    :param path: job database file.
+    :param max_workers: size of the process pool.
+    :param max_pending: maximum number of queued and running jobs.
+    """
+
+    def __init__(self, path: str, max_workers: int, max_pending: int):
+        self.store = JobStore(path)
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # created lazily, so each gunicorn worker gets its own pool after forking.
+        #  A broken pool is replaced, the jobs it held are failed by _finish.
+        if self._executor_pid != os.getpid() or getattr(
+            self._executor, "_broken", False
+        ):
+            if self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=False)
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._executor_pid = os.getpid()
+            self._futures = {}
+        return self._executor
+
+    def submit(self, request: Optional[CalculationRequest]) -> str:
+        """Queue a prepared calculation.
+
+        :raises: QueueFull, when too many jobs are pending.
+        :return: job id.
+        """
+        job_id = self.store.create(self.max_pending)
+        with self._lock:
+            future = self._get_executor().submit(
+                _run_job, self.store.path, job_id, request
+            )
+            self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._finish(job_id, future))
+        return job_id
+
+    def _finish(self, job_id: str, future: Future) -> None:
+        with self._lock:
+            self._futures.pop(job_id, None)
+        if future.cancelled() or future.exception() is None:
+            return
+        # the job process died, e.g. killed for its memory, or failed already.
+        try:
+            self.store.update(job_id, FAILED, error="The calculation failed.")
+        except JobCancelled:
+            pass
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job. Queued jobs are dropped, running jobs stop placing people
+        within `CANCEL_POLL_INTERVAL` and store no result.
+        """
+        cancelled = self.store.cancel(job_id)
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.cancel()
+        return cancelled
+
+
+job_runner = JobRunner(JOBS_PATH, JOB_WORKERS, MAX_PENDING_JOBS)
@@ -0,0 +1,397 @@
+"""Timing of the stages of a request, and metrics shared by all workers.
+
+Stages are timed with `stage`. The time of every stage goes into a histogram.
+When a request is being timed in the current thread or process, see
+`start_request`, it also goes into that request's `Timings`, and the API
+returns them in a Server-Timing header. Histograms and counters are
+buffered in each process. `flush` adds the buffer to a SQLite database, so
+`render` reports the totals of every gunicorn worker and area process in the
+Prometheus text format.
+
+Requests slower than `PROFILE_THRESHOLD` can be profiled, see `SamplingProfiler`.
+"""
+import bisect
+import contextlib
+import contextvars
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+# set WEB_APP_METRICS_PATH to an empty string to disable the metrics endpoint.
+METRICS_PATH = os.environ.get(
+    "WEB_APP_METRICS_PATH",
+    os.path.join(tempfile.gettempdir(), "web_app_metrics.sqlite3"),
+)
+# set WEB_APP_PROFILE_PATH to a directory to profile slow requests.
+PROFILE_PATH = os.environ.get("WEB_APP_PROFILE_PATH", "")
+PROFILE_THRESHOLD = float(os.environ.get("WEB_APP_PROFILE_THRESHOLD", 1.0))
+PROFILE_INTERVAL = 0.005  # in seconds.
+
+# upper bounds of the duration histograms, in seconds.
+DURATION_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    25.0,
+)
+
+# name: type, help and, for histograms, bucket bounds.
+METRICS: Dict[str, Tuple[str, str, Tuple[float, ...]]] = {
+    "web_app_request_duration_seconds": (
+        "histogram",
+        "Time to answer API requests, by endpoint and status.",
+        DURATION_BUCKETS,
+    ),
+    "web_app_stage_duration_seconds": (
+        "histogram",
+        "Time spent in each stage of a calculation.",
+        DURATION_BUCKETS,
+    ),
+    "web_app_candidates_generated_total": (
+        "counter",
+        "Candidate positions tried by the placement engines, by algorithm.",
+        (),
+    ),
+    "web_app_candidates_accepted_total": (
+        "counter",
+        "People placed by the placement engines, by algorithm.",
+        (),
+    ),
+    "web_app_venue_area_square_meters_total": (
+        "counter",
+        "Area of the venues people were placed in, by algorithm.",
+        (),
+    ),
+}
+
+# bump when the tables change, older databases are dropped.
+SCHEMA_VERSION = 1
+SCHEMA = """
+DROP TABLE IF EXISTS series;
+CREATE TABLE series (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels, bucket)
+);
+"""
+# bucket of the sums of histograms and of the values of counters.
+TOTAL = -1
+
+T = TypeVar("T")
+SeriesKey = Tuple[str, str, int]
+
+
+class Timings:
+    """Seconds spent in each stage of one request, in order of first use."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.start
+
+    def header(self) -> str:
+        """The stages and the total, as the value of a Server-Timing header."""
+        return ", ".join(
+            f"{name};dur={seconds * 1e3:.2f}"
+            for name, seconds in [*self.stages.items(), ("total", self.total)]
+        )
+
+
+_timings: contextvars.ContextVar[Optional[Timings]] = contextvars.ContextVar(
+    "timings", default=None
+)
+
+
+def start_request() -> Timings:
+    """Time the stages that follow in this context as those of one request."""
+    timings = Timings()
+    _timings.set(timings)
+    return timings
+
+
+def end_request() -> None:
+    _timings.set(None)
+
+
+class MetricsStore:
+    """Histograms and counters buffered in memory and summed in SQLite.
+
+    :param path: database file, None or empty disables the store.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._buffer: Counter = Counter()
+        self._pid = os.getpid()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _connection(self) -> sqlite3.Connection:
+        # connections must not cross threads, nor a fork of the gunicorn master.
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("BEGIN IMMEDIATE")
+            (version,) = connection.execute("PRAGMA user_version").fetchone()
+            if version != SCHEMA_VERSION:
+                for statement in SCHEMA.split(";"):
+                    connection.execute(statement)
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            connection.execute("COMMIT")
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    def _check_fork(self) -> None:
+        # a forked area process starts with a copy of its worker's buffer, which
+        #  the worker flushes itself.
+        pid = os.getpid()
+        if self._pid != pid:
+            self._lock = threading.Lock()
+            self._buffer = Counter()
+            self._pid = pid
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Add a value to a histogram of `METRICS`."""
+        if not self.enabled:
+            return
+        self._check_fork()
+        _, _, buckets = METRICS[name]
+        key = json.dumps(sorted(labels.items()))
+        with self._lock:
+            self._buffer[name, key, bisect.bisect_left(buckets, value)] += 1
+            self._buffer[name, key, TOTAL] += value
+
+    def increment(self, name: str, amount: float = 1, **labels: str) -> None:
+        """Add to a counter of `METRICS`."""
+        if not self.enabled:
+            return
+        self._check_fork()
+        with self._lock:
+            self._buffer[name, json.dumps(sorted(labels.items())), TOTAL] += amount
+
+    def flush(self) -> None:
+        """Add what was buffered in this process to the totals of all workers."""
+        if not self.enabled:
+            return
+        self._check_fork()
+        with self._lock:
+            if not self._buffer:
+                return
+            buffered, self._buffer = self._buffer, Counter()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT INTO series VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name, labels, bucket) DO UPDATE "
+                "SET value = value + excluded.value",
+                [(*key, value) for key, value in buffered.items()],
+            )
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _totals(self) -> Dict[SeriesKey, float]:
+        if not self.enabled:
+            return {}
+        self.flush()
+        return {
+            (name, labels, bucket): value
+            for name, labels, bucket, value in self._connection().execute(
+                "SELECT name, labels, bucket, value FROM series"
+            )
+        }
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        totals = self._totals()
+        lines: List[str] = []
+        for name, (kind, description, buckets) in METRICS.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels in sorted({key[1] for key in totals if key[0] == name}):
+                pairs = json.loads(labels)
+                if kind == "counter":
+                    lines.append(
+                        f"{name}{_labels(pairs)} {_number(totals[name, labels, TOTAL])}"
+                    )
+                    continue
+                count = 0.0
+                for index, bound in enumerate([*buckets, float("inf")]):
+                    count += totals.get((name, labels, index), 0.0)
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(
+                        f"{name}_bucket{_labels(pairs + [['le', le]])} "
+                        f"{_number(count)}"
+                    )
+                lines.append(
+                    f"{name}_sum{_labels(pairs)} "
+                    f"{_number(totals.get((name, labels, TOTAL), 0.0))}"
+                )
+                lines.append(f"{name}_count{_labels(pairs)} {_number(count)}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(pairs: Iterable[Any]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+metrics_store = MetricsStore(METRICS_PATH)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """Count seconds towards a stage, see `stage`."""
+    metrics_store.observe("web_app_stage_duration_seconds", seconds, stage=name)
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block of code as a stage of the request being timed, if any, and
+    in the stage histogram.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def timed_iterator(name: str, iterator: Iterable[T]) -> Iterator[T]:
+    """Time producing the items of iterator, e.g. a streamed response, as a stage.
+
+    Only the time spent in the iterator counts, not the time the consumer
+    takes between items. The metrics are flushed once it is exhausted.
+    """
+    seconds = 0.0
+    iterator = iter(iterator)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                seconds += time.perf_counter() - start
+            yield item
+    finally:
+        record_stage(name, seconds)
+        metrics_store.flush()
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread until stopped.
+
+    A background thread records where the profiled thread is every interval.
+    `write` stores the samples as collapsed stacks, one ``frame;frame;...
+    count`` line per distinct stack, as read by flamegraph.pl and speedscope.
+    Work done in area processes shows as waiting for them.
+
+    :param interval: seconds between samples.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}"
+                    f":{frame.f_lineno})"
+                )
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._sampler.join()
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as handle:
+            for stack, count in self.samples.most_common():
+                handle.write(f"{stack} {count}\n")
+
+
+def start_profiler() -> Optional[SamplingProfiler]:
+    """Profile the current thread when `PROFILE_PATH` is set, None otherwise."""
+    return SamplingProfiler() if PROFILE_PATH else None
+
+
+def finish_profiler(
+    profiler: Optional[SamplingProfiler], seconds: float, name: str
+) -> Optional[str]:
+    """Stop a profiler and keep its samples when the request took at least
+    `PROFILE_THRESHOLD` seconds.
+
+    :param name: endpoint of the request, part of the file name.
+    :return: the file the samples were written to, if any.
+    """
+    if profiler is None:
+        return None
+    profiler.stop()
+    if seconds < PROFILE_THRESHOLD:
+        return None
+    os.makedirs(PROFILE_PATH, exist_ok=True)
+    now = time.time()
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(now))
+    path = os.path.join(
+        PROFILE_PATH,
+        f"{stamp}.{int(now * 1000) % 1000:03d}-{os.getpid()}-{name}.folded",
+    )
+    profiler.write(path)
+    return path
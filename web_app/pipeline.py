@@ -0,0 +1,923 @@
+"""Request to result pipeline shared by the synchronous and the job endpoints.
+
+`prepare_calculation` validates a decoded request body and builds one metered
+composite polygon per drawn area, `run_calculation` places the people in every
+area and serializes the merged result. Neither depends on flask, so the second
+half can run in a job process.
+"""
+import collections
+import dataclasses
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    as_completed,
+    wait,
+)
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import numpy as np
+from shapely.geometry import Polygon
+
+from .algorithm import (
+    ALGORITHMS,
+    RANDOM_ALGORITHM,
+    CalculationResult,
+    PlacementStats,
+    calc_result_boundaries,
+    calc_result_properties,
+    calc_result_to_serializable,
+    calculate,
+    clean_polygon,
+    create_composite_polygon,
+    estimate_capacity,
+    metered_centers_to_geojson,
+    metered_centers_to_wgs84,
+    multi_convert_to_meter_system,
+    polygon_from_geosjon_feature,
+    polygons_from_geojson_features,
+    recalculate,
+    wgs84_circles_to_meter_system,
+)
+from .binary import encode_result
+from .cache import cache_key, result_cache
+from .crs import MAX_EXTENT
+from .exceptions import (
+    CoordSystemInconsistency,
+    InvalidRequest,
+    NotAPolygon,
+    OutsideSupportedArea,
+    TooLargeExtent,
+)
+from .metrics import metrics_store, stage, timed_iterator
+
+logger = logging.getLogger(__name__)
+
+# processes per gunicorn worker used to calculate the areas or tiles of one request.
+AREA_WORKERS = int(os.environ.get("WEB_APP_AREA_WORKERS", os.cpu_count() or 1))
+# gunicorn workers sharing the cores of the host, gunicorn takes its default
+#  number of workers from the same variable.
+SERVER_WORKERS = int(os.environ.get("WEB_CONCURRENCY", 1))
+# cores one request can count on while every worker is busy.
+REQUEST_CORES = max(1, min(AREA_WORKERS, (os.cpu_count() or 1) // SERVER_WORKERS))
+# m^2 placed per second and core by the slowest algorithm, measure it with
+#  benchmarks/bench_tiling.py.
+PLACEMENT_THROUGHPUT = float(os.environ.get("WEB_APP_PLACEMENT_THROUGHPUT", 3e4))
+# seconds a synchronous calculation may take, the people placed by then are
+#  returned as a partial result. Keep it below the gunicorn worker timeout.
+MAX_CALCULATION_TIME = float(os.environ.get("WEB_APP_MAX_CALCULATION_TIME", 20))
+MAX_SUPPORTED_SIZE = float(
+    os.environ.get(
+        "WEB_APP_MAX_SUPPORTED_SIZE",
+        PLACEMENT_THROUGHPUT * MAX_CALCULATION_TIME * REQUEST_CORES,
+    )
+)  # in m^2.
+# placements a request may ask to keep the best of.
+MAX_RUNS = int(os.environ.get("WEB_APP_MAX_RUNS", 8))
+# markers serialized at once by streamed responses.
+STREAM_CHUNK_SIZE = 4096
+# items in one batch request.
+MAX_BATCH_SIZE = int(os.environ.get("WEB_APP_MAX_BATCH_SIZE", 1000))
+# items of a batch on the area pool at once, the others wait for their turn.
+MAX_BATCH_IN_FLIGHT = 2 * AREA_WORKERS
+# items of a batch submitted before the one streamed next, holding their results.
+MAX_BATCH_AHEAD = 4 * MAX_BATCH_IN_FLIGHT
+# time a whole batch may take, keep it below the gunicorn worker timeout.
+MAX_BATCH_TIME = float(os.environ.get("WEB_APP_MAX_BATCH_TIME", 90))
+# drawn outlines are simplified to this share of the person radius, 0 disables.
+SIMPLIFY_TOLERANCE = float(os.environ.get("WEB_APP_SIMPLIFY_TOLERANCE", 0.01))
+
+EMPTY_RESULT: Dict[str, Any] = {
+    "type": "FeatureCollection",
+    "features": [],
+    "properties": {
+        "n_humans": 0,
+        "polygons": {},
+        "placement": {},
+        "partial": False,
+        "tokens": {},
+    },
+}
+
+
+@dataclasses.dataclass
+class AreaCalculation:
+    polygon_id: int
+    coord_system: str
+    composite_polygon: Polygon
+    # x, y and radius of the point obstacles, in meters.
+    point_obstacles: np.ndarray = dataclasses.field(
+        default_factory=lambda: np.zeros(shape=(0, 3))
+    )
+
+
+@dataclasses.dataclass
+class CalculationRequest:
+    areas: List[AreaCalculation]
+    social_distance: float
+    buffer_zone_size: Optional[float]
+    algorithm: str
+    # seconds the whole calculation may take, None for no limit.
+    time_budget: Optional[float] = None
+    seed: Optional[int] = None
+    n_runs: int = 1
+    # token of the previous result of an area, by polygon id.
+    previous: Dict[str, str] = dataclasses.field(default_factory=dict)
+
+
+def _bounds_overlap(polygon: Polygon, other: Polygon) -> bool:
+    minx, miny, maxx, maxy = polygon.bounds
+    other_minx, other_miny, other_maxx, other_maxy = other.bounds
+    return (
+        minx <= other_maxx
+        and other_minx <= maxx
+        and miny <= other_maxy
+        and other_miny <= maxy
+    )
+
+
+def _points_in_bounds(polygon: Polygon, circles: np.ndarray) -> np.ndarray:
+    minx, miny, maxx, maxy = polygon.bounds
+    return circles[
+        (circles[:, 0] >= minx)
+        & (circles[:, 0] <= maxx)
+        & (circles[:, 1] >= miny)
+        & (circles[:, 1] <= maxy)
+    ]
+
+
+def _to_meter_system(polygons: List[Polygon]) -> Tuple[str, List[Polygon]]:
+    try:
+        return multi_convert_to_meter_system(polygons)
+    except OutsideSupportedArea:
+        raise InvalidRequest("Your drawing is not in longitudes and latitudes.")
+    except TooLargeExtent:
+        raise InvalidRequest(
+            f"Your drawing spans more than {MAX_EXTENT:g} degrees, "
+            "too large an area to calculate."
+        )
+    except CoordSystemInconsistency:
+        raise InvalidRequest("Obstacles were too far from the main area.")
+
+
+def _clean_polygons(
+    polygons: List[Polygon], simplify_tolerance: Optional[float] = None
+) -> List[Polygon]:
+    try:
+        return [
+            clean_polygon(polygon.exterior.coords, simplify_tolerance)
+            for polygon in polygons
+        ]
+    except NotAPolygon:
+        raise InvalidRequest("One of your drawings does not enclose any area.")
+
+
+def _prepare_area(
+    polygon_id: int,
+    main_polygon: Polygon,
+    hole_polygons: List[Polygon],
+    simplify_tolerance: Optional[float] = None,
+    point_obstacles: Optional[np.ndarray] = None,
+) -> AreaCalculation:
+    """Build the metered composite polygon of a drawn area and its holes."""
+    with stage("convert"):
+        coord_system, metered_polygons = _to_meter_system(
+            [main_polygon] + hole_polygons
+        )
+        metered_points = wgs84_circles_to_meter_system(
+            point_obstacles if point_obstacles is not None else np.zeros(shape=(0, 3)),
+            coord_system,
+        )
+    with stage("clean"):
+        cleaned_polygons = _clean_polygons(metered_polygons, simplify_tolerance)
+    with stage("composite"):
+        composite_polygon = create_composite_polygon(cleaned_polygons)
+    if composite_polygon.area > MAX_SUPPORTED_SIZE:
+        raise InvalidRequest(
+            "Your submitted area is larger than the maximum supported area."
+        )
+    return AreaCalculation(polygon_id, coord_system, composite_polygon, metered_points)
+
+
+def _split_features(body: Any) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """The main polygon and the hole features of a request body."""
+    if not isinstance(body, dict):
+        raise InvalidRequest("Request body was not proper JSON")
+
+    if "features" not in body:
+        raise InvalidRequest(
+            "There is no 'features' element inside the request payload."
+        )
+
+    all_polygons = [
+        item
+        for item in body["features"]
+        if item.get("geometry", {}).get("type") == "Polygon"
+    ]
+    main_polygons = [
+        polygon
+        for polygon in all_polygons
+        if not polygon.get("properties", {}).get("hole", False)
+    ]
+    hole_polygons = [
+        polygon
+        for polygon in all_polygons
+        if polygon.get("properties", {}).get("hole", False)
+    ]
+    return main_polygons, hole_polygons
+
+
+def _point_obstacles(body: Dict[str, Any]) -> np.ndarray:
+    """Longitude, latitude and radius of the point obstacles of a request body.
+
+    Point obstacles, e.g. trees, are Point features marked as a hole, with
+    their radius in meters in the "radius" property.
+    """
+    circles = []
+    for feature in body["features"]:
+        geometry = feature.get("geometry") or {}
+        properties = feature.get("properties") or {}
+        if geometry.get("type") != "Point" or not properties.get("hole", False):
+            continue
+        radius = properties.get("radius")
+        if (
+            isinstance(radius, bool)
+            or not isinstance(radius, (int, float))
+            or not radius > 0
+        ):
+            raise InvalidRequest(
+                "'radius' of a point obstacle must be a positive number."
+            )
+        coordinates = geometry.get("coordinates")
+        if not isinstance(coordinates, list) or len(coordinates) < 2:
+            raise InvalidRequest("A point obstacle has no coordinates.")
+        circles.append([coordinates[0], coordinates[1], radius])
+    try:
+        return np.array(circles, dtype=float).reshape(-1, 3)
+    except (TypeError, ValueError):
+        raise InvalidRequest("Coordinates of point obstacles must be numbers.")
+
+
+def _placement_properties(properties: Dict[str, Any]) -> Tuple[float, float, str]:
+    """Barrier size, person radius and algorithm of the request properties."""
+    try:
+        barrier_size: float = float(properties.get("barrierSize", 0))
+        social_distance_radius: float = float(properties.get("personRadius", 1.5))
+    except (TypeError, ValueError):
+        raise InvalidRequest("'barrierSize' and 'personRadius' must be numbers.")
+    if not math.isfinite(barrier_size) or barrier_size < 0:
+        raise InvalidRequest("'barrierSize' must be a non-negative number.")
+    if not math.isfinite(social_distance_radius) or not social_distance_radius > 0:
+        raise InvalidRequest("'personRadius' must be a positive number.")
+    algorithm: str = properties.get("algorithm", RANDOM_ALGORITHM)
+    if algorithm not in ALGORITHMS:
+        raise InvalidRequest(
+            f"Unknown algorithm, supported are: {', '.join(ALGORITHMS)}."
+        )
+    return barrier_size, social_distance_radius, algorithm
+
+
+def prepare_calculation(
+    body: Any, time_limit: Optional[float] = None
+) -> Optional[CalculationRequest]:
+    """Validate a decoded request body and build the metered composite polygons.
+
+    Every main polygon becomes an area of its own, together with the holes
+    whose bounds overlap it and the point obstacles within its bounds.
+
+    :param body: decoded JSON payload of a calculate request.
+    :param time_limit: seconds the calculation may take at most, e.g.
+        `MAX_CALCULATION_TIME` when answered synchronously. The request's
+        timeBudgetMs can only shorten it. None for no limit.
+    :raises: InvalidRequest, with a message for the user, when the payload
+        cannot be calculated.
+    :return: the calculation to run, None when there is nothing to place.
+    """
+    main_polygons, hole_polygons = _split_features(body)
+    point_obstacles = _point_obstacles(body)
+    properties = body.get("properties", {})
+    barrier_size, social_distance_radius, algorithm = _placement_properties(properties)
+    time_budget_ms = properties.get("timeBudgetMs")
+    if time_budget_ms is not None and (
+        isinstance(time_budget_ms, bool)
+        or not isinstance(time_budget_ms, (int, float))
+        or not time_budget_ms > 0
+    ):
+        raise InvalidRequest("'timeBudgetMs' must be a positive number.")
+    time_budget = time_budget_ms / 1000 if time_budget_ms is not None else None
+    if time_limit is not None:
+        time_budget = min(time_budget or time_limit, time_limit)
+    seed = properties.get("seed")
+    if seed is not None and (
+        isinstance(seed, bool) or not isinstance(seed, int) or seed < 0
+    ):
+        raise InvalidRequest("'seed' must be a non-negative integer.")
+    n_runs = properties.get("runs", 1)
+    if isinstance(n_runs, bool) or not isinstance(n_runs, int) or not 1 <= n_runs:
+        raise InvalidRequest("'runs' must be a positive integer.")
+    if n_runs > MAX_RUNS:
+        raise InvalidRequest(f"At most {MAX_RUNS} runs are supported.")
+    previous = properties.get("previous", {})
+    if not isinstance(previous, dict) or not all(
+        isinstance(token, str) for token in previous.values()
+    ):
+        raise InvalidRequest("'previous' must map polygon ids to result tokens.")
+
+    if not main_polygons:
+        return None
+
+    try:
+        main_shapes = [polygon_from_geosjon_feature(f) for f in main_polygons]
+        hole_shapes = [polygon_from_geosjon_feature(f) for f in hole_polygons]
+    except NotAPolygon:
+        raise InvalidRequest("You have drawn too few points.")
+
+    areas = [
+        _prepare_area(
+            feature.get("properties", {}).get("id", index),
+            main_shape,
+            [hole for hole in hole_shapes if _bounds_overlap(main_shape, hole)],
+            SIMPLIFY_TOLERANCE * social_distance_radius,
+            _points_in_bounds(main_shape, point_obstacles),
+        )
+        for index, (feature, main_shape) in enumerate(zip(main_polygons, main_shapes))
+    ]
+
+    return CalculationRequest(
+        areas=areas,
+        social_distance=social_distance_radius,
+        buffer_zone_size=barrier_size if not barrier_size <= 0 else None,
+        algorithm=algorithm,
+        time_budget=time_budget,
+        seed=seed,
+        n_runs=n_runs,
+        previous={str(polygon_id): token for polygon_id, token in previous.items()},
+    )
+
+
+def estimate_calculation(body: Any) -> Dict[str, Any]:
+    """Estimate the n_humans of a request body without placing anybody.
+
+    Takes the same payload as `prepare_calculation`, but skips the
+    simplification of drawings and the size limit, so it stays cheap enough
+    to run while the user is still drawing. See `estimate_capacity`.
+
+    :param body: decoded JSON payload of a calculate request.
+    :raises: InvalidRequest, with a message for the user, when the payload
+        cannot be estimated.
+    :return: the estimated total n_humans, and the n_humans per polygon id
+        under "polygons".
+    """
+    main_polygons, hole_polygons = _split_features(body)
+    point_obstacles = _point_obstacles(body)
+    barrier_size, social_distance, algorithm = _placement_properties(
+        body.get("properties", {})
+    )
+
+    per_polygon: Dict[str, int] = {}
+    for index, main_polygon in enumerate(main_polygons):
+        try:
+            polygons = polygons_from_geojson_features(main_polygon, hole_polygons)
+        except NotAPolygon:
+            raise InvalidRequest("You have drawn too few points.")
+        main_shape = polygons[0]
+        coord_system, metered_polygons = _to_meter_system(
+            [main_shape]
+            + [hole for hole in polygons[1:] if _bounds_overlap(main_shape, hole)]
+        )
+        composite_polygon = create_composite_polygon(_clean_polygons(metered_polygons))
+        polygon_key = str(main_polygon.get("properties", {}).get("id", index))
+        per_polygon[polygon_key] = per_polygon.get(polygon_key, 0) + estimate_capacity(
+            composite_polygon,
+            social_distance=social_distance,
+            buffer_zone_size=barrier_size if not barrier_size <= 0 else None,
+            algorithm=algorithm,
+            point_obstacles=_points_in_bounds(main_shape, point_obstacles),
+        )
+
+    return {"n_humans": sum(per_polygon.values()), "polygons": per_polygon}
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return max(0.0, deadline - time.monotonic()) if deadline is not None else None
+
+
+def _place_area(
+    area: AreaCalculation,
+    social_distance: float,
+    buffer_zone_size: Optional[float],
+    algorithm: str,
+    seed: Optional[int] = None,
+    n_runs: int = 1,
+    map_func: Callable[..., Iterator[Tuple[np.ndarray, PlacementStats]]] = map,
+    deadline: Optional[float] = None,
+    previous: Optional[str] = None,
+) -> Tuple[CalculationResult, Optional[str]]:
+    """Place the people of one area.
+
+    Runs in an area process when a request has several areas, in which case
+    the tiles or runs of an area are placed one after the other. The deadline is
+    a `time.monotonic` value, which is shared by the processes of a host.
+
+    When previous is the token of a cached result with the same coordinate
+    system, social distance, algorithm and point obstacles, that result is
+    updated with `recalculate` instead of placing everybody again. Unknown or
+    expired tokens fall back to a full calculation.
+
+    :return: the result, and its token when it is cached.
+    """
+    params = dict(
+        coord_system=area.coord_system,
+        social_distance=social_distance,
+        buffer_zone_size=buffer_zone_size,
+        algorithm=algorithm,
+        seed=seed,
+        n_runs=n_runs,
+        point_obstacles=sorted(
+            np.round(area.point_obstacles, 3).tolist()  # millimeters, like polygons.
+        ),
+    )
+    previous_result: Optional[CalculationResult] = None
+    found = result_cache.lookup(previous) if previous is not None else None
+    if found is not None:
+        cached, previous_params = found
+        if previous_params is not None and all(
+            previous_params.get(name) == params[name]
+            for name in (
+                "coord_system",
+                "social_distance",
+                "algorithm",
+                "point_obstacles",
+            )
+        ):
+            previous_result = cached
+
+    if previous_result is not None:
+        key = cache_key(area.composite_polygon, previous=previous, **params)
+    else:
+        key = cache_key(area.composite_polygon, **params)
+
+    def compute() -> CalculationResult:
+        if previous_result is not None:
+            calc_result = recalculate(
+                previous_result,
+                area.composite_polygon,
+                social_distance=social_distance,
+                buffer_zone_size=buffer_zone_size,
+                time_budget=_remaining(deadline),
+                seed=seed,
+                point_obstacles=area.point_obstacles,
+            )
+        else:
+            calc_result = calculate(
+                area.composite_polygon,
+                social_distance=social_distance,
+                buffer_zone_size=buffer_zone_size,
+                algorithm=algorithm,
+                map_func=map_func,
+                seed=seed,
+                n_runs=n_runs,
+                time_budget=_remaining(deadline),
+                point_obstacles=area.point_obstacles,
+            )
+        _count_placement(area, algorithm, calc_result)
+        return calc_result
+
+    calc_result = result_cache.get_or_compute(key, compute, params, deadline)
+    cached = result_cache.enabled and not (
+        calc_result.placement is not None and calc_result.placement.partial
+    )
+    return calc_result, key if cached else None
+
+
+def _count_placement(
+    area: AreaCalculation, algorithm: str, calc_result: CalculationResult
+) -> None:
+    """Add a placement that was not cached to the placement counters."""
+    placement = calc_result.placement
+    if placement is not None:
+        metrics_store.increment(
+            "web_app_candidates_generated_total",
+            placement.n_candidates,
+            algorithm=algorithm,
+        )
+    metrics_store.increment(
+        "web_app_candidates_accepted_total",
+        calc_result.centers.shape[0],
+        algorithm=algorithm,
+    )
+    metrics_store.increment(
+        "web_app_venue_area_square_meters_total",
+        area.composite_polygon.area,
+        algorithm=algorithm,
+    )
+
+
+def _area_properties(
+    calc_result: CalculationResult, token: Optional[str]
+) -> Dict[str, Any]:
+    properties = calc_result_properties(calc_result)
+    if token is not None:
+        properties["token"] = token
+    return properties
+
+
+def _calculate_area(area: AreaCalculation, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+    """Place the people of one area and serialize them, see `_place_area`."""
+    calc_result, token = _place_area(area, *args, **kwargs)
+    with stage("serialize"):
+        result = calc_result_to_serializable(
+            calc_result, area.coord_system, area.polygon_id
+        )
+    result["properties"] = _area_properties(calc_result, token)
+    return result
+
+
+def _in_area_process(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Call func in an area process and flush the metrics it recorded."""
+    try:
+        return func(*args, **kwargs)
+    finally:
+        metrics_store.flush()
+
+
+_area_executor: Optional[ProcessPoolExecutor] = None
+_area_executor_pid: Optional[int] = None
+
+
+def _pool_is_broken(executor: Optional[ProcessPoolExecutor]) -> bool:
+    # a pool whose process died fails every later submission, see BrokenProcessPool.
+    return bool(getattr(executor, "_broken", False))
+
+
+def _get_area_executor() -> ProcessPoolExecutor:
+    # created lazily, so each gunicorn worker gets its own pool after forking.
+    #  A broken pool is replaced, the requests it was running have failed.
+    global _area_executor, _area_executor_pid
+    if _area_executor_pid != os.getpid() or _pool_is_broken(_area_executor):
+        if _area_executor_pid == os.getpid():
+            _area_executor.shutdown(wait=False)
+        _area_executor = ProcessPoolExecutor(max_workers=AREA_WORKERS)
+        _area_executor_pid = os.getpid()
+    return _area_executor
+
+
+def _merge_properties(
+    areas: List[AreaCalculation], area_properties: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    per_polygon: Dict[str, int] = {}
+    placement: Dict[str, Dict[str, Any]] = {}
+    tokens: Dict[str, str] = {}
+    for area, properties in zip(areas, area_properties):
+        polygon_key = str(area.polygon_id)
+        per_polygon[polygon_key] = (
+            per_polygon.get(polygon_key, 0) + properties["n_humans"]
+        )
+        if "placement" in properties:
+            placement[polygon_key] = properties["placement"]
+        if "token" in properties:
+            tokens[polygon_key] = properties["token"]
+    return {
+        "n_humans": sum(per_polygon.values()),
+        "polygons": per_polygon,
+        "placement": placement,
+        "partial": any(stats.get("partial", False) for stats in placement.values()),
+        "tokens": tokens,
+    }
+
+
+def merge_area_results(
+    areas: List[AreaCalculation], results: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Merge the FeatureCollections of several areas into one.
+
+    :return: FeatureCollection with the total n_humans, the n_humans per
+        polygon id under "polygons", why placement stopped in each polygon
+        under "placement", whether any polygon ran out of time under
+        "partial" and the token to recalculate each polygon incrementally
+        under "tokens".
+    """
+    features: List[Dict[str, Any]] = []
+    for result in results:
+        features.extend(result["features"])
+    return {
+        "type": "FeatureCollection",
+        "features": features,
+        "properties": _merge_properties(
+            areas, [result["properties"] for result in results]
+        ),
+    }
+
+
+def _run_areas(
+    request: CalculationRequest,
+    area_func: Callable[..., Any],
+    progress: Optional[Callable[[float], None]] = None,
+    parallel: bool = True,
+) -> List[Any]:
+    """Apply area_func, `_place_area` or `_calculate_area`, to every area.
+
+    The time all areas take counts as the "place" stage.
+    """
+    with stage("place"):
+        return _apply_to_areas(request, area_func, progress, parallel)
+
+
+def _apply_to_areas(
+    request: CalculationRequest,
+    area_func: Callable[..., Any],
+    progress: Optional[Callable[[float], None]],
+    parallel: bool,
+) -> List[Any]:
+    deadline = (
+        time.monotonic() + request.time_budget
+        if request.time_budget is not None
+        else None
+    )
+    params = (
+        request.social_distance,
+        request.buffer_zone_size,
+        request.algorithm,
+        request.seed,
+        request.n_runs,
+    )
+    if not parallel:
+        results = []
+        for done, area in enumerate(request.areas, 1):
+            results.append(
+                area_func(
+                    area,
+                    *params,
+                    deadline=deadline,
+                    previous=request.previous.get(str(area.polygon_id)),
+                )
+            )
+            if progress is not None:
+                progress(0.1 + 0.8 * done / len(request.areas))
+        return results
+    if len(request.areas) == 1:
+        return [
+            area_func(
+                request.areas[0],
+                *params,
+                map_func=_get_area_executor().map,
+                deadline=deadline,
+                previous=request.previous.get(str(request.areas[0].polygon_id)),
+            )
+        ]
+
+    executor = _get_area_executor()
+    futures: List[Future] = [
+        executor.submit(
+            _in_area_process,
+            area_func,
+            area,
+            *params,
+            deadline=deadline,
+            previous=request.previous.get(str(area.polygon_id)),
+        )
+        for area in request.areas
+    ]
+    try:
+        for done, _ in enumerate(as_completed(futures), 1):
+            if progress is not None:
+                progress(0.1 + 0.8 * done / len(futures))
+        return [future.result() for future in futures]
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def run_calculation(
+    request: Optional[CalculationRequest],
+    progress: Optional[Callable[[float], None]] = None,
+    parallel: bool = True,
+) -> Dict[str, Any]:
+    """Place the people of a prepared calculation and serialize the result.
+
+    Multiple areas are calculated concurrently on a process pool. The time
+    budget of the request counts from here and is shared by all its areas.
+    Areas with a previous token are recalculated incrementally.
+
+    :param request: calculation from `prepare_calculation`.
+    :param progress: called with the fraction of work done as areas finish.
+    :param parallel: False calculates the areas one after the other in this
+        process, for callers that run on the process pool already.
+    :return: GeoJSON FeatureCollection in WGS84.
+    """
+    if request is None:
+        return EMPTY_RESULT
+
+    results = _run_areas(request, _calculate_area, progress, parallel)
+    if progress is not None:
+        progress(1.0)
+    return merge_area_results(request.areas, results)
+
+
+def _stream_features(
+    request: CalculationRequest,
+    placed: List[Tuple[CalculationResult, Optional[str]]],
+    ndjson: bool,
+) -> Iterator[str]:
+    header = json.dumps(
+        {
+            "type": "FeatureCollection",
+            "properties": _merge_properties(
+                request.areas,
+                [_area_properties(calc_result, token) for calc_result, token in placed],
+            ),
+        }
+    )
+    if ndjson:
+        yield header + "\n"
+        separator = "\n"
+    else:
+        yield header[:-1] + ', "features": ['
+        separator = ", "
+
+    first = True
+    for area, (calc_result, _) in zip(request.areas, placed):
+        features = calc_result_boundaries(
+            calc_result, area.coord_system, area.polygon_id
+        )
+        yield ("" if first else separator) + separator.join(map(json.dumps, features))
+        first = False
+    for area, (calc_result, _) in zip(request.areas, placed):
+        centers = calc_result.centers
+        for start in range(0, centers.shape[0], STREAM_CHUNK_SIZE):
+            features = metered_centers_to_geojson(
+                centers[start : start + STREAM_CHUNK_SIZE],
+                area.coord_system,
+                area.polygon_id,
+            )
+            yield separator + separator.join(map(json.dumps, features))
+
+    yield "\n" if ndjson else "]}"
+
+
+def stream_calculation(
+    request: Optional[CalculationRequest], ndjson: bool = False
+) -> Iterator[str]:
+    """Place the people of a prepared calculation and serialize the result
+    piece by piece.
+
+    Placement happens right away, so its errors surface before anything is
+    sent. The returned iterator then yields the boundaries of every area
+    first and the markers in chunks of `STREAM_CHUNK_SIZE`, reprojecting each
+    chunk only when it is due.
+
+    :param request: calculation from `prepare_calculation`.
+    :param ndjson: yield a FeatureCollection without features on the first
+        line and then one feature per line, instead of one GeoJSON document.
+    :return: iterator over the text of the response.
+    """
+    if request is None:
+        return iter([json.dumps(EMPTY_RESULT) + ("\n" if ndjson else "")])
+    placed = _run_areas(request, _place_area)
+    return timed_iterator("serialize", _stream_features(request, placed, ndjson))
+
+
+def binary_calculation(request: Optional[CalculationRequest], encoding: str) -> bytes:
+    """Place the people of a prepared calculation and encode the result in the
+    compact binary format of `web_app.binary`.
+
+    The header holds the properties and boundaries of `run_calculation`, the
+    markers follow as a coordinate buffer instead of GeoJSON features.
+
+    :param request: calculation from `prepare_calculation`.
+    :param encoding: one of `web_app.binary.ENCODINGS`.
+    :return: the encoded result.
+    """
+    if request is None:
+        return encode_result(EMPTY_RESULT, [], encoding)
+    placed = _run_areas(request, _place_area)
+    with stage("serialize"):
+        return _encode_placed(request, placed, encoding)
+
+
+def _encode_placed(
+    request: CalculationRequest,
+    placed: List[Tuple[CalculationResult, Optional[str]]],
+    encoding: str,
+) -> bytes:
+    header = {
+        "type": "FeatureCollection",
+        "properties": _merge_properties(
+            request.areas,
+            [_area_properties(calc_result, token) for calc_result, token in placed],
+        ),
+        "features": [
+            feature
+            for area, (calc_result, _) in zip(request.areas, placed)
+            for feature in calc_result_boundaries(
+                calc_result, area.coord_system, area.polygon_id
+            )
+        ],
+    }
+    areas = [
+        (
+            area.polygon_id,
+            metered_centers_to_wgs84(calc_result.centers, area.coord_system),
+        )
+        for area, (calc_result, _) in zip(request.areas, placed)
+    ]
+    return encode_result(header, areas, encoding)
+
+
+def _run_batch_item(body: Any, deadline: float) -> Dict[str, Any]:
+    """Prepare and calculate one item of a batch, in an area process.
+
+    :param deadline: `time.monotonic` time the batch must be done by, the
+        clock is shared by the processes of a host.
+    """
+    remaining = _remaining(deadline)
+    if not remaining:
+        return {"error": "The batch ran out of time, submit this item again."}
+    try:
+        request = prepare_calculation(
+            body, time_limit=min(MAX_CALCULATION_TIME, remaining)
+        )
+    except InvalidRequest as err:
+        return {"error": str(err)}
+    return {"result": run_calculation(request, parallel=False)}
+
+
+# end of the bodies of a batch, which may be None.
+_NO_ITEM = object()
+
+
+def run_batch(bodies: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+    """Calculate independent request bodies on the process pool.
+
+    Every item is validated, projected and calculated in an area process, so
+    the items of a batch run in parallel while the areas and tiles of each
+    item run one after the other. At most `MAX_BATCH_IN_FLIGHT` items are on
+    the pool at once, leaving room for other requests, the next one starts as
+    soon as any of them is done. Results wait to be streamed in order, at most
+    `MAX_BATCH_AHEAD` items are submitted past the next. The whole batch shares
+    `MAX_BATCH_TIME`: items placed late are partial, items not started by then
+    report an error.
+
+    :param bodies: decoded JSON payloads of calculate requests.
+    :return: per item and in order, its index and either its "result" or the
+        "error" that stopped it, as soon as it and all items before it are done.
+    """
+    deadline = time.monotonic() + MAX_BATCH_TIME
+    remaining = iter(bodies)
+
+    def submit(body: Any) -> Future:
+        return _get_area_executor().submit(
+            _in_area_process, _run_batch_item, body, deadline
+        )
+
+    # submitted items in order, and those of them not known to be done.
+    futures: Deque[Future] = collections.deque()
+    running: Set[Future] = set()
+
+    def fill() -> None:
+        while len(running) < MAX_BATCH_IN_FLIGHT and len(futures) < MAX_BATCH_AHEAD:
+            body = next(remaining, _NO_ITEM)
+            if body is _NO_ITEM:
+                return
+            future = submit(body)
+            futures.append(future)
+            running.add(future)
+
+    index = 0
+    try:
+        fill()
+        while futures:
+            future = futures[0]
+            while not future.done():
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                running.difference_update(done)
+                fill()
+            futures.popleft()
+            running.discard(future)
+            try:
+                item = future.result()
+            except Exception:
+                logger.exception("Item %d of a batch failed.", index)
+                item = {"error": "The calculation failed."}
+            fill()
+            yield {"index": index, **item}
+            index += 1
+    finally:
+        for future in futures:
+            future.cancel()
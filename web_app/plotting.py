@@ -0,0 +1,97 @@
+"""Plots of placements, for development only.
+
+Kept out of `web_app.algorithm`, matplotlib takes longer to import than the
+rest of the API. Run the demo with::
+
+    python -m web_app.plotting
+"""
+import matplotlib.pyplot as plt
+import numpy as np
+from descartes import PolygonPatch
+from shapely.geometry import Point, Polygon
+
+from .algorithm import populate_square
+
+BLUE = "#6699cc"
+GRAY = "#999999"
+RED = "#8B0000"
+GREEN = "#32CD32"
+
+
+def plot_line(ax, ob, color=BLUE):
+    """Function to plot Shapely line object"""
+    # Get objects x and y boundary as line
+    x, y = ob.xy
+    ax.plot(x, y, color=color, linewidth=3, solid_capstyle="round", zorder=1, alpha=0.5)
+
+
+def plot_coords(ax, ob, color=GRAY):
+    """Function to plot Shapely object coordinates"""
+    # Get Shapely object point coords (e.g. polygon vertexes)
+    coords = np.asarray(ob)
+    #  If multiple points, scatter plot
+    if coords.size > 2:
+        ax.scatter(coords[:, 0], coords[:, 1], color=color)
+    # If single, point plot
+    else:
+        ax.scatter(coords[0], coords[1], color=color)
+
+
+if __name__ == "__main__":
+    # Generate polygon
+    pts_ext = [(0, 0), (0, 50), (50, 50), (50, 0), (0, 0)]
+    pts_int = [(25, 0), (12.5, 12.5), (25, 25), (37.5, 12.5), (25, 0)][::-1]
+    polygon = Polygon(pts_ext, [pts_int])
+
+    # Random insertion of disks in polygon -- returns disks' centers coordinates
+    disk_centers = populate_square(polygon, iters=30000)
+    # Convert to disk polygons
+    disks = [Point(i[0], i[1]).buffer(1) for i in disk_centers]
+
+    # Plotting
+    fig = plt.figure(1, figsize=(10, 4), dpi=180)
+    ax = fig.add_subplot(121, aspect="equal")
+
+    plot_coords(ax, polygon.interiors[0])
+    plot_coords(ax, polygon.exterior)
+    patch = PolygonPatch(polygon, facecolor=BLUE, edgecolor=GRAY, alpha=0.5, zorder=2)
+    ax.add_patch(patch)
+    ax.set_title("No boundary")
+
+    for i, disk in enumerate(disks):
+        # plot_coords(ax, disk_centers[i])
+        patch = PolygonPatch(disk, facecolor=RED, edgecolor=GRAY, alpha=0.5, zorder=2)
+        ax.add_patch(patch)
+
+    # Generate polygon boundary
+    boundary = polygon.boundary.buffer(5)
+
+    # Random insertion of disks in polygon with boundary zone substracted
+    #  -- returns disks' centers coordinates
+    disk_centers = populate_square(polygon.difference(boundary), iters=30000)
+    # Convert to disk polygons
+    disks = [Point(i[0], i[1]).buffer(1) for i in disk_centers]
+
+    # Plotting
+    fig = plt.figure(1, figsize=(10, 4), dpi=180)
+    ax = fig.add_subplot(122, aspect="equal")
+
+    plot_coords(ax, polygon.interiors[0])
+    plot_coords(ax, polygon.exterior)
+    patch = PolygonPatch(polygon, facecolor=BLUE, edgecolor=GRAY, alpha=0.5, zorder=2)
+    ax.add_patch(patch)
+    patch_b = PolygonPatch(
+        boundary.intersection(polygon),
+        facecolor=GREEN,
+        edgecolor=GRAY,
+        alpha=0.5,
+        zorder=2,
+    )
+    ax.add_patch(patch_b)
+
+    for i, disk in enumerate(disks):
+        # plot_coords(ax, disk_centers[i])
+        patch = PolygonPatch(disk, facecolor=RED, edgecolor=GRAY, alpha=0.5, zorder=2)
+        ax.add_patch(patch)
+    ax.set_title("With Boundary")
+    plt.show()